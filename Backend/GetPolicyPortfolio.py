@@ -0,0 +1,2 @@
+# Entry point of the standalone GetPolicyPortfolio Lambda; the code lives in portfolio.py
+from portfolio import lambda_handler
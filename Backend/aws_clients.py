@@ -0,0 +1,95 @@
+import os
+import threading
+import metrics
+import retries
+
+# Shared AWS clients for the Backend handlers. Package this module with each function
+# (or in a layer). Clients are built on first use and reused for the lifetime of the container.
+#
+# boto3 and botocore.config are imported on first use rather than at module import, so
+# requests that never reach AWS (CORS preflight, validation errors) don't pay for loading them.
+
+_lock = threading.Lock()
+_session = None
+_client_config = None
+_clients = {}
+_resources = {}
+_tables = {}
+
+def get_client_config():
+    global _client_config
+    if _client_config is None:
+        from botocore.config import Config
+
+        _client_config = Config(
+            tcp_keepalive=True,
+            max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "25")),
+            connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", "2")),
+            read_timeout=float(os.getenv("AWS_READ_TIMEOUT", "5")),
+            # botocore makes a single attempt; retries.py decides on retrying (see register_retry_hooks).
+            # This replaced botocore's adaptive mode, whose retries took no account of the Lambda
+            # deadline: under sustained throttling its p99 reached about 9 s (benchmark.py --suites throttle)
+            retries={"mode": "standard", "total_max_attempts": 1},
+        )
+    return _client_config
+
+# boto3 sessions are not thread-safe to build from, so creation happens under a lock
+def _get_session():
+    global _session
+    if _session is None:
+        import boto3
+
+        _session = boto3.session.Session()
+    return _session
+
+# Time every call and ask DynamoDB to report the capacity it consumed (see metrics.py)
+def register_metrics_hooks(client):
+    if not metrics.METRICS_ENABLED:
+        return
+    events = client.meta.events
+    service = client.meta.service_model.service_id.hyphenize()
+    events.register(f"provide-client-params.{service}.*", metrics.start_call)
+    events.register(f"after-call.{service}.*", metrics.record_call)
+    events.register(f"after-call-error.{service}.*", metrics.record_call)
+
+# Backoff, deadline-bounded retries and client-side rate limiting (see retries.py)
+def register_retry_hooks(client):
+    events = client.meta.events
+    service = client.meta.service_model.service_id.hyphenize()
+    service_retries = retries.for_service(service)
+    events.register(f"before-send.{service}", service_retries.before_send)
+    events.register(f"needs-retry.{service}", service_retries.needs_retry)
+
+def get_client(service_name):
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _get_session().client(service_name, config=get_client_config())
+                register_metrics_hooks(client)
+                register_retry_hooks(client)
+                _clients[service_name] = client
+    return client
+
+def get_resource(service_name):
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = _get_session().resource(service_name, config=get_client_config())
+                register_metrics_hooks(resource.meta.client)
+                register_retry_hooks(resource.meta.client)
+                _resources[service_name] = resource
+    return resource
+
+def get_table(table_name):
+    table = _tables.get(table_name)
+    if table is None:
+        table = get_resource("dynamodb").Table(table_name)
+        _tables[table_name] = table
+    return table
+
+def get_cognito_client():
+    return get_client("cognito-idp")
@@ -0,0 +1,896 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+# Load test for the Backend handlers against the in-process DynamoDB/Cognito stand-in
+# (local_aws.py). Generates synthetic policy data, then drives every route of router.py with
+# API Gateway proxy events from concurrent threads and reports latency percentiles,
+# requests/s and consumed read/write units per endpoint (plus policies/s for the bulk creates and
+# cancels, to set against the single-policy endpoints, and Cognito list_users calls per password
+# reset request). Further suites cover the JSON
+# encoder, the expiry sweep, the table export, the summary projector, retries under
+# injected throttling (retries.py), write sharding of a single busy tenant (sharding.py) and the
+# overhead of the metrics (metrics.py), redacted debug logging (structured_log.py), local
+# token validation against Cognito get_user (cognito_jwt.py), sequential against concurrent
+# registration steps (user_auth.py), a cold container's first request against warm ones
+# (aws_clients.py) and status lookups by index against a scan as the table grows.
+#
+#   python benchmark.py                                  default scale (10k items per table)
+#   python benchmark.py --items 1000000 --requests 5000  larger run
+#   python benchmark.py --check                          fail on regressions against benchmark_baseline.json
+#   python benchmark.py --write-baseline                 record this run as the new baseline
+#
+# Timings depend on the machine; compare against a baseline recorded on the same one.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BACKEND_DIR, "benchmark_baseline.json")
+
+USER_POOL_ID = "us-east-1_benchmark"
+CLIENT_ID = "benchmark-client"
+PASSWORD = "Benchmark-passw0rd"
+
+# Handlers read these at import time, so they are set before anything imports them
+BENCHMARK_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "USER_POOL_ID": USER_POOL_ID,
+    "CLIENT_ID": CLIENT_ID,
+    "LOG_LEVEL": "WARNING",
+    "STATUS_CACHE_REDIS_URL": "",
+}
+
+SUITES = ["endpoints", "json", "sweep", "export", "summary", "throttle", "sharding", "metrics", "logging", "tokens", "register", "coldstart", "lookup"]
+
+# Email to username index of user_auth.py
+EMAIL_INDEX_TABLE = "UserEmailIndex"
+
+# Policies per bulk create and bulk cancel request
+BULK_SIZE = 25
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+# Data
+
+def create_tables(aws):
+    aws.create_table(
+        "VehicleInsuranceData", "userId", "insuranceId",
+        indexes={
+            "registrationNumber-index": ("registrationNumber", None, ["insuranceType", "expiryDate"]),
+            "expiryBucket-index": ("expiryBucket", "insuranceId", ["registrationNumber"]),
+        },
+        stream=True
+    )
+    aws.create_table("VehicleRegistrationLocks", "registrationNumber")
+    aws.create_table("TravelInsuranceData", "userId", "insuranceId", stream=True)
+    aws.create_table("IdempotencyKeys", "idempotencyKey")
+    aws.create_table("PolicySummaries", "userId", "kind")
+    # Used when user_auth.EMAIL_INDEX_TABLE is set, as the register suite does
+    aws.create_table(EMAIL_INDEX_TABLE, "email")
+
+# Synthetic policies, policies_per_user per user. A few percent of vehicle policies are past
+# their expiry date so the sweep has work to do.
+def populate(aws, vehicle_items, travel_items, policies_per_user, seed):
+    rng = random.Random(seed)
+    today = datetime.utcnow().date()
+    insurance_types = ["Standard", "Comprehensive", "Third Party"]
+
+    vehicles, locks = [], []
+    for index in range(vehicle_items):
+        expiry = (today + timedelta(days=rng.randint(-7, 365))).isoformat()
+        policy = {
+            "userId": f"user-{index // policies_per_user:08d}",
+            "insuranceId": f"veh-{index:012d}",
+            "registrationNumber": f"REG{index:09d}",
+            "make": rng.choice(["Toyota", "Ford", "BMW", "Honda"]),
+            "model": rng.choice(["A", "B", "C"]),
+            "serviceDate": "2026-01-01",
+            "insuranceType": rng.choice(insurance_types),
+            "price": Decimal(rng.randint(100, 900)),
+            "expiryDate": expiry,
+            "expiryBucket": expiry,
+            "version": Decimal(1),
+        }
+        vehicles.append(policy)
+        locks.append({key: policy[key] for key in ("registrationNumber", "userId", "insuranceId")})
+    aws.table("VehicleInsuranceData").load(vehicles)
+    aws.table("VehicleRegistrationLocks").load(locks)
+
+    travel = []
+    for index in range(travel_items):
+        start = today + timedelta(days=rng.randint(0, 90))
+        travel.append({
+            "userId": f"user-{index // policies_per_user:08d}",
+            "insuranceId": f"trv-{index:012d}",
+            "customer_name": f"Customer {index}",
+            "title": f"Trip {index}",
+            "insuranceType": "Short Term",
+            "price": Decimal(f"{rng.randint(50, 500)}.99"),
+            "startDate": start.isoformat(),
+            "endDate": (start + timedelta(days=rng.randint(1, 30))).isoformat(),
+            "createdAt": str(datetime.utcnow()),
+            "version": Decimal(1),
+        })
+    aws.table("TravelInsuranceData").load(travel)
+
+    return {
+        "vehicle_users": max(1, vehicle_items // policies_per_user),
+        "travel_users": max(1, travel_items // policies_per_user),
+        "vehicles": [(policy["userId"], policy["insuranceId"]) for policy in vehicles],
+        "travel": [(policy["userId"], policy["insuranceId"]) for policy in travel],
+    }
+
+# Events
+
+def api_event(method, path, query=None, body=None, headers=None):
+    return {
+        "httpMethod": method,
+        "path": path,
+        "resource": path,
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "queryStringParameters": query,
+        "body": None if body is None else json.dumps(body),
+        "requestContext": {"stage": "benchmark"},
+    }
+
+class Workload:
+    def __init__(self, aws, data, seed):
+        self.aws = aws
+        self.data = data
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.seed = seed
+        # Distinct policies for the cancel endpoints, so every DELETE finds its policy
+        self.vehicle_cancels = list(data["vehicles"])
+        self.travel_cancels = list(data["travel"])
+        random.Random(seed).shuffle(self.vehicle_cancels)
+        random.Random(seed + 1).shuffle(self.travel_cancels)
+        self.replay_key = f"replay-{seed}"
+        self.tokens = []
+        # Users filled by the bulk creates, each emptied by one bulk cancel
+        self.bulk_users = {"vehicle": [], "travel": []}
+
+    @property
+    def rng(self):
+        if not hasattr(self.local, "rng"):
+            self.local.rng = random.Random(self.seed + threading.get_ident())
+        return self.local.rng
+
+    def vehicle_user(self):
+        return f"user-{self.rng.randrange(self.data['vehicle_users']):08d}"
+
+    def travel_user(self):
+        return f"user-{self.rng.randrange(self.data['travel_users']):08d}"
+
+    def pop(self, items):
+        with self.lock:
+            return items.pop()
+
+    def bulk_user(self, kind):
+        user_id = f"bulk-{kind}-{next(self.counter):08d}"
+        with self.lock:
+            self.bulk_users[kind].append(user_id)
+        return user_id
+
+    def bulk_vehicles(self):
+        user_id = self.bulk_user("vehicle")
+        return [{"userId": user_id, "registrationNumber": f"BULK{next(self.counter):09d}", "make": "Toyota",
+                 "model": "Corolla", "insuranceType": "Standard", "price": 300} for _ in range(BULK_SIZE)]
+
+    def bulk_trips(self):
+        user_id = self.bulk_user("travel")
+        return [{"userId": user_id, "username": "Customer", "tripTitle": "Trip", "startDate": "2026-12-01",
+                 "endDate": "2026-12-10", "price": 120} for _ in range(BULK_SIZE)]
+
+    def current_version(self, table_name, key):
+        item = self.aws.table(table_name).items.get(key)
+        return int(item.get("version", 0)) if item else 0
+
+    def patch_body(self, table_name, policies, fields):
+        user_id, insurance_id = self.rng.choice(policies)
+        return {"userId": user_id, "insuranceId": insurance_id,
+                "version": self.current_version(table_name, (user_id, insurance_id)), **fields}
+
+    def endpoints(self):
+        vehicles, travel = self.data["vehicles"], self.data["travel"]
+        return {
+            "GET /vehicle": lambda: api_event("GET", "/vehicle", {"userId": self.vehicle_user()}),
+            "POST /vehicle": lambda: api_event("POST", "/vehicle", body={
+                "userId": self.vehicle_user(), "registrationNumber": f"NEW{next(self.counter):09d}",
+                "make": "Toyota", "model": "Corolla", "insuranceType": "Standard", "price": 300}),
+            "PATCH /vehicle": lambda: api_event("PATCH", "/vehicle", body=self.patch_body(
+                "VehicleInsuranceData", vehicles, {"price": self.rng.randint(100, 900)})),
+            "GET /vehicle-status": lambda: api_event("GET", "/vehicle-status", {
+                "registrationNumber": f"REG{self.rng.randrange(len(vehicles)):09d}"}),
+            "DELETE /delete-car-insurance": lambda: api_event("DELETE", "/delete-car-insurance", dict(zip(
+                ("userId", "insuranceId"), self.pop(self.vehicle_cancels)))),
+            f"POST /vehicle (bulk {BULK_SIZE})": lambda: api_event("POST", "/vehicle", body=self.bulk_vehicles()),
+            f"DELETE /delete-car-insurance (bulk {BULK_SIZE})": lambda: api_event("DELETE", "/delete-car-insurance", body={
+                "userId": self.pop(self.bulk_users["vehicle"]), "all": True}),
+            "POST /travel": lambda: api_event("POST", "/travel", body={
+                "userId": self.travel_user(), "username": "Customer", "tripTitle": "Trip",
+                "startDate": "2026-12-01", "endDate": "2026-12-10", "price": 120}),
+            "POST /travel (idempotent replay)": lambda: api_event("POST", "/travel", body={
+                "userId": "user-replay", "username": "Customer", "tripTitle": "Trip"},
+                headers={"Idempotency-Key": self.replay_key}),
+            "GET /travel-policies": lambda: api_event("GET", "/travel-policies", {"userId": self.travel_user()}),
+            "PATCH /travel": lambda: api_event("PATCH", "/travel", body=self.patch_body(
+                "TravelInsuranceData", travel, {"endDate": "2027-01-31"})),
+            "DELETE /cancel-insurance-api": lambda: api_event("DELETE", "/cancel-insurance-api", dict(zip(
+                ("userId", "insuranceId"), self.pop(self.travel_cancels)))),
+            f"POST /travel (bulk {BULK_SIZE})": lambda: api_event("POST", "/travel", body=self.bulk_trips()),
+            f"DELETE /cancel-insurance-api (bulk {BULK_SIZE})": lambda: api_event("DELETE", "/cancel-insurance-api", body={
+                "userId": self.pop(self.bulk_users["travel"]), "all": True}),
+            "GET /portfolio": lambda: api_event("GET", "/portfolio", {"userId": self.vehicle_user()}),
+            "POST /auth login": lambda: api_event("POST", "/auth", body={
+                "action": "login", "username": f"member-{self.rng.randrange(100)}", "password": PASSWORD}),
+            "POST /auth validate": lambda: api_event("POST", "/auth", body={
+                "action": "validate", "access_token": self.rng.choice(self.tokens)}),
+            "POST /auth register": lambda: api_event("POST", "/auth", body={
+                "action": "register", "username": f"new-{next(self.counter)}", "password": PASSWORD,
+                "email": f"new-{next(self.counter)}@example.com"}),
+            "POST /auth forgot_password": lambda: api_event("POST", "/auth", body={
+                "action": "forgot_password", "email": f"member-{self.rng.randrange(100)}@example.com"}),
+            # The stand-in's reset code is always 123456; members without a pending reset get a 400
+            "POST /auth reset_password": lambda: api_event("POST", "/auth", body={
+                "action": "reset_password", "email": f"member-{self.rng.randrange(100)}@example.com",
+                "otp": "123456", "new_password": PASSWORD}),
+        }
+
+# Suites
+
+def capacity_total(aws):
+    totals = aws.capacity().values()
+    return sum(read for read, _ in totals), sum(write for _, write in totals)
+
+def run_endpoint(aws, router, make_event, requests, concurrency, warmup, repeats):
+    import status_cache
+
+    def call(_):
+        event = make_event()
+        start = time.perf_counter()
+        response = router.lambda_handler(event, None)
+        return (time.perf_counter() - start) * 1000, response["statusCode"]
+
+    # Untimed calls first, so lazy imports and first-use setup are not measured
+    for index in range(warmup):
+        call(index)
+
+    # A short run can be dominated by one scheduling hiccup of the machine; keep the best of a few
+    runs = []
+    for _ in range(repeats):
+        # Every run starts with a cold in-process status cache
+        status_cache.set_status_cache(status_cache.LocalCache(
+            max_entries=status_cache.DEFAULT_MAX_ENTRIES, ttl=status_cache.DEFAULT_TTL,
+            negative_ttl=status_cache.DEFAULT_NEGATIVE_TTL))
+        reads_before, writes_before = capacity_total(aws)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(call, range(requests)))
+        elapsed = time.perf_counter() - start
+        reads_after, writes_after = capacity_total(aws)
+
+        latencies = sorted(latency for latency, _ in results)
+        runs.append({
+            "requests": requests,
+            "errors": sum(1 for _, status in results if status >= 500),
+            "rps": requests / elapsed,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "rcu_per_request": (reads_after - reads_before) / requests,
+            "wcu_per_request": (writes_after - writes_before) / requests,
+        })
+    return min(runs, key=lambda run: run["p95_ms"])
+
+# Accounts for the auth endpoints, and tokens to validate
+def add_members(aws, workload):
+    if workload.tokens:
+        return
+    for index in range(100):
+        aws.cognito.add_user(f"member-{index}", PASSWORD, f"member-{index}@example.com")
+    workload.tokens = [
+        aws.cognito.initiate_auth(ClientId=CLIENT_ID, AuthFlow="USER_PASSWORD_AUTH",
+                                  AuthParameters={"USERNAME": f"member-{index}", "PASSWORD": PASSWORD}
+                                  )["AuthenticationResult"]["AccessToken"]
+        for index in range(10)
+    ]
+
+def endpoints_suite(aws, workload, args):
+    import router
+
+    add_members(aws, workload)
+
+    results = {}
+    for name, make_event in workload.endpoints().items():
+        if args.endpoints and not any(selected in name for selected in args.endpoints):
+            continue
+        requests = args.requests
+        bulk = "(bulk" in name
+        if name.startswith("DELETE /delete-car-insurance"):
+            cancels = workload.bulk_users["vehicle"] if bulk else workload.vehicle_cancels
+            requests = min(requests, (len(cancels) - args.warmup) // args.repeats)
+        if name.startswith("DELETE /cancel-insurance-api"):
+            cancels = workload.bulk_users["travel"] if bulk else workload.travel_cancels
+            requests = min(requests, (len(cancels) - args.warmup) // args.repeats)
+        # Bulk cancels need the policies of the bulk creates
+        if requests < 1:
+            continue
+        list_users_before = aws.cognito.list_users_calls
+        results[name] = run_endpoint(aws, router, make_event, requests, args.concurrency, args.warmup, args.repeats)
+        # Password resets look usernames up by email; list_users is the fallback the cache should spare
+        if name.startswith(("POST /auth forgot_password", "POST /auth reset_password")):
+            calls = args.warmup + requests * args.repeats
+            results[name]["list_users_per_request"] = (aws.cognito.list_users_calls - list_users_before) / calls
+        # Policies per second, to compare with the single-policy endpoints' rps
+        if bulk:
+            results[name]["items_per_s"] = results[name]["rps"] * BULK_SIZE
+    return results
+
+def json_suite(aws, workload, args):
+    import json_encoding
+
+    sample = {
+        "userId": "user-00000001", "insuranceId": "veh-000000000001", "registrationNumber": "REG000000001",
+        "make": "Toyota", "model": "Corolla", "insuranceType": "Standard", "price": Decimal("129.99"),
+        "expiryDate": "2027-01-01", "version": Decimal(3), "tags": {"fleet", "ev"},
+    }
+    results = {}
+    for count in (1000, 10000, 100000):
+        items = [dict(sample, insuranceId=f"veh-{index:012d}") for index in range(count)]
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            json_encoding.dumps(items)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[f"json encode {count} items"] = {"ms": min(timings)}
+    return results
+
+def sweep_suite(aws, workload, args):
+    import expiry_sweep
+
+    table = aws.table("VehicleInsuranceData")
+    reads_before, writes_before = capacity_total(aws)
+    start = time.perf_counter()
+    summary = expiry_sweep.lambda_handler({}, None)
+    elapsed = time.perf_counter() - start
+    reads_after, writes_after = capacity_total(aws)
+    return {"expiry sweep": {
+        "ms": elapsed * 1000,
+        "table_items": len(table.items),
+        "expired": summary["expired"],
+        "rcu": reads_after - reads_before,
+        "wcu": writes_after - writes_before,
+    }}
+
+def export_suite(aws, workload, args):
+    import table_export
+
+    results = {}
+    out_dir = tempfile.mkdtemp(prefix="benchmark-export-")
+    try:
+        for segments in (1, 4, 16):
+            start = time.perf_counter()
+            count = table_export.export_table("TravelInsuranceData", out_dir, segments, page_size=500, restart=True)
+            elapsed = time.perf_counter() - start
+            results[f"export {segments} segments"] = {"items": count, "items_per_s": count / elapsed}
+            shutil.rmtree(os.path.join(out_dir, "TravelInsuranceData"))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+# Feeds the stream records produced by the earlier suites (or a batch of fresh writes) to the projector
+def summary_suite(aws, workload, args):
+    import policy_summary
+
+    records = aws.table("VehicleInsuranceData").drain_stream() + aws.table("TravelInsuranceData").drain_stream()
+    if not records:
+        table = aws.table("TravelInsuranceData")
+        for index in range(min(args.requests, 1000)):
+            table.put_item(Item={"userId": workload.travel_user(), "insuranceId": f"stream-{index:06d}",
+                                 "title": "Trip", "endDate": "2026-12-31"})
+        records = table.drain_stream()
+
+    start = time.perf_counter()
+    # Lambda delivers stream records in batches of up to 100
+    failures = 0
+    for offset in range(0, len(records), 100):
+        failures += len(policy_summary.process_stream_records(records[offset:offset + 100])["batchItemFailures"])
+    elapsed = time.perf_counter() - start
+    return {"summary projection": {"records": len(records), "records_per_s": len(records) / max(elapsed, 1e-9),
+                                   "failed_batches": failures}}
+
+# A DynamoDB table that serves `rate` requests per second (with one second of burst) and
+# throttles the rest. It answers the botocore client's before-send event, so requests go through
+# botocore's real retry loop without leaving the process.
+class ThrottlingTable:
+    def __init__(self, rate, latency):
+        self.rate = rate
+        self.latency = latency
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.sends = 0
+
+    def before_send(self, request, **kwargs):
+        from botocore.awsrequest import AWSResponse
+
+        time.sleep(self.latency)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(float(self.rate), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.sends += 1
+            throttled = self.tokens < 1
+            if not throttled:
+                self.tokens -= 1
+        if throttled:
+            status, body = 400, {"__type": "com.amazonaws.dynamodb.v20120810#ProvisionedThroughputExceededException",
+                                 "message": "The level of configured provisioned throughput for the table was exceeded."}
+        else:
+            status, body = 200, {"Item": {"userId": {"S": "user-00000001"}, "insuranceId": {"S": "veh-000000000001"}}}
+        raw = SimpleNamespace(stream=lambda **_: iter([json.dumps(body).encode()]))
+        return AWSResponse(request.url, status, {"Content-Type": "application/x-amz-json-1.0"}, raw)
+
+def throttling_client(mode, table):
+    import aws_clients
+    import retries
+
+    client = aws_clients._get_session().client(
+        "dynamodb", region_name="us-east-1", config=aws_clients.get_client_config(),
+        aws_access_key_id="benchmark", aws_secret_access_key="benchmark"
+    )
+    if mode == "retries":
+        service_retries = retries.ServiceRetries("dynamodb")
+        client.meta.events.register("before-send.dynamodb", service_retries.before_send)
+        client.meta.events.register("needs-retry.dynamodb", service_retries.needs_retry)
+    client.meta.events.register("before-send.dynamodb", table.before_send)
+    return client
+
+def get_item_burst(client, requests, concurrency):
+    from botocore.exceptions import ClientError
+
+    def call(_):
+        start = time.perf_counter()
+        try:
+            client.get_item(TableName="VehicleInsuranceData",
+                            Key={"userId": {"S": "user-00000001"}, "insuranceId": {"S": "veh-000000000001"}})
+            failed = False
+        except ClientError:
+            failed = True
+        return (time.perf_counter() - start) * 1000, failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(call, range(requests)))
+    return outcomes, time.perf_counter() - start
+
+# GetItem bursts against a table that serves a quarter of what the client can send, with botocore
+# making one attempt per call and with retries.py installed
+def throttle_suite(aws, workload, args):
+    requests = args.requests * 4
+    latency = args.latency_ms / 1000
+
+    # How fast the client sends when nothing is throttled
+    calibration = ThrottlingTable(rate=10 ** 9, latency=latency)
+    _, elapsed = get_item_burst(throttling_client("no retries", calibration), args.requests, args.concurrency)
+    rate = max(1, int(args.requests / elapsed / 4))
+
+    results = {}
+    for mode in ("no retries", "retries"):
+        table = ThrottlingTable(rate=rate, latency=latency)
+        outcomes, elapsed = get_item_burst(throttling_client(mode, table), requests, args.concurrency)
+        latencies = sorted(latency for latency, _ in outcomes)
+        results[f"throttled GetItem, {mode}"] = {
+            "requests": requests,
+            # How many calls the table throttles depends on timing, so this is compared like a timing
+            "failed_pct": 100 * sum(1 for _, failed in outcomes if failed) / requests,
+            "rps": requests / elapsed,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "attempts_per_request": table.sends / requests,
+            "table_rate": rate,
+        }
+    return results
+
+# Sustained policy creation by one tenant against a per-partition write limit, stored under a
+# single userId and spread over SHARD_COUNT shards, and the cost of reading a page back. The limit
+# is scaled down from DynamoDB's 1000 WCU/s to a quarter of what an unthrottled run sends here, so
+# the unsharded tenant is held to it and the shards have room to spare.
+SHARDED_TENANT = "fleet-benchmark"
+SHARD_COUNT = 8
+
+def sharding_suite(aws, workload, args):
+    import logging
+    import router
+    import sharding
+
+    table = aws.table("TravelInsuranceData")
+    write = lambda: api_event("POST", "/travel", body={
+        "userId": SHARDED_TENANT, "username": "Fleet", "tripTitle": "Trip",
+        "startDate": "2026-12-01", "endDate": "2026-12-10", "price": 120})
+    # A limit keeps the page out of the status cache, so every request queries
+    read = lambda: api_event("GET", "/travel-policies", {"userId": SHARDED_TENANT, "limit": "20"})
+
+    calibration = run_endpoint(aws, router, write, args.requests, args.concurrency, args.warmup, 1)
+    limit = max(1.0, calibration["rps"] / 4)
+
+    results = {}
+    try:
+        table.partition_write_limit = limit
+        # Every throttled write logs an error
+        logging.disable(logging.ERROR)
+        for shards in (0, SHARD_COUNT):
+            if shards:
+                sharding.SHARDED_USERS[SHARDED_TENANT] = shards
+            # Start with empty partitions, so their one second of burst is not counted as throughput
+            table.partition_tokens = {partition: (0.0, time.monotonic()) for partition in sharding.user_partitions(SHARDED_TENANT)}
+            name = f"single tenant, {shards} shards" if shards else "single tenant, unsharded"
+            writes = run_endpoint(aws, router, write, args.requests * 4, args.concurrency, 0, args.repeats)
+            reads = run_endpoint(aws, router, read, args.requests, args.concurrency, args.warmup, args.repeats)
+            # Throttled writes fail (and consume nothing), so how many there are depends on timing
+            # like a latency does
+            failed = writes.pop("errors") / writes["requests"]
+            del writes["rcu_per_request"], writes["wcu_per_request"]
+            results[f"POST /travel, {name}"] = dict(
+                writes, failed_pct=100 * failed, writes_per_s=writes["rps"] * (1 - failed), partition_limit=limit)
+            results[f"GET /travel-policies, {name}"] = reads
+    finally:
+        logging.disable(logging.NOTSET)
+        table.partition_write_limit = None
+        sharding.SHARDED_USERS.pop(SHARDED_TENANT, None)
+    return results
+
+# Per-request cost of metrics.py: the same GET /vehicle requests, one at a time and without
+# simulated AWS latency, with METRICS_ENABLED on and off. The modes alternate and each keeps its
+# best run, so a slow stretch of the machine does not land on one of them only.
+def metrics_suite(aws, workload, args):
+    import metrics
+    import router
+
+    make_event = workload.endpoints()["GET /vehicle"]
+    enabled, latency = metrics.METRICS_ENABLED, aws.latency
+    runs = {"on": [], "off": []}
+    try:
+        aws.latency = 0
+        for _ in range(args.repeats):
+            for mode in runs:
+                metrics.METRICS_ENABLED = mode == "on"
+                # Requests take a fraction of a millisecond here; ten times as many keep a run measurable
+                runs[mode].append(run_endpoint(aws, router, make_event, args.requests * 10, 1, args.warmup, 1))
+    finally:
+        metrics.METRICS_ENABLED, aws.latency = enabled, latency
+
+    results = {}
+    for mode, mode_runs in runs.items():
+        best = max(mode_runs, key=lambda run: run["rps"])
+        results[f"GET /vehicle, metrics {mode}"] = {
+            metric: best[metric] for metric in ("requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms")}
+    on, off = results["GET /vehicle, metrics on"], results["GET /vehicle, metrics off"]
+    results["metrics overhead"] = {"overhead_pct": 100 * (off["rps"] / on["rps"] - 1)}
+    return results
+
+# Writing debug records of API Gateway events whose body carries a password, as the handlers log
+# them: the body is parsed and redacted before the record is encoded
+def logging_suite(aws, workload, args):
+    import logging
+    import structured_log
+
+    log = structured_log.get_logger("benchmark")
+    log.logger.setLevel(logging.DEBUG)
+    log.logger.propagate = False
+    event = api_event("POST", "/auth", body={
+        "action": "register", "username": "member-1", "password": PASSWORD, "email": "member-1@example.com"},
+        headers={"Authorization": "Bearer token"})
+    count = args.requests * 20
+    sample_rates = structured_log.SAMPLE_RATES
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        handler = logging.StreamHandler(devnull)
+        log.logger.addHandler(handler)
+        try:
+            for name, rates in (("debug event", {}), ("debug event, 1% sampled", {logging.DEBUG: 0.01})):
+                structured_log.SAMPLE_RATES = rates
+                timings = []
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        log.debug("event", event=event)
+                    timings.append(time.perf_counter() - start)
+                results[f"log {name}"] = {"records": count, "records_per_s": count / min(timings)}
+        finally:
+            structured_log.SAMPLE_RATES = sample_rates
+            log.logger.removeHandler(handler)
+    return results
+
+# POST /auth validate with the token verified locally against the cached JWKS, and with the
+# Cognito get_user call that "full_attributes" asks for. A Lambda instance serves one request at a
+# time, so requests run one after another: validations_per_s is what one instance sustains.
+# (Concurrent threads would measure the GIL, as local validation is CPU-bound.)
+def tokens_suite(aws, workload, args):
+    import router
+
+    add_members(aws, workload)
+    results = {}
+    for name, extra in (("local JWT", {}), ("Cognito get_user", {"full_attributes": True})):
+        make_event = lambda: api_event("POST", "/auth", body=dict(
+            extra, action="validate", access_token=workload.rng.choice(workload.tokens)))
+        run = run_endpoint(aws, router, make_event, args.requests, 1, args.warmup, args.repeats)
+        del run["rcu_per_request"], run["wcu_per_request"]
+        results[f"token validation, {name}"] = dict(run, validations_per_s=run["rps"] * (1 - run["errors"] / run["requests"]))
+    return results
+
+# POST /auth register, one request at a time, with the post-sign-up steps (email_verified, the
+# email index write and the confirmation) run one after another on a single worker and
+# concurrently on the handler's own executor
+def register_suite(aws, workload, args):
+    import router
+    import user_auth
+
+    make_event = lambda: api_event("POST", "/auth", body={
+        "action": "register", "username": f"reg-{next(workload.counter)}", "password": PASSWORD,
+        "email": f"reg-{next(workload.counter)}@example.com"})
+    executor, index_table = user_auth.registration_executor, user_auth.EMAIL_INDEX_TABLE
+    results = {}
+    try:
+        user_auth.EMAIL_INDEX_TABLE = EMAIL_INDEX_TABLE
+        for name, workers in (("sequential", 1), ("concurrent", user_auth.REGISTRATION_WORKERS)):
+            user_auth.registration_executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                run = run_endpoint(aws, router, make_event, args.requests, 1, args.warmup, args.repeats)
+            finally:
+                user_auth.registration_executor.shutdown()
+            results[f"POST /auth register, {name}"] = run
+    finally:
+        user_auth.registration_executor, user_auth.EMAIL_INDEX_TABLE = executor, index_table
+    return results
+
+# One container's life: a fresh interpreter loads the GetVehicleInsuranceStatus handler the way the
+# Lambda runtime does, serves a first (cold) request, then warm ones. The handler runs against
+# real boto3 clients; a before-send hook answers each DynamoDB request after the simulated round
+# trip, so the cold numbers include building the session and clients in aws_clients.py.
+CONTAINER_SCRIPT = """
+import importlib.util, json, os, sys, time
+sys.path.insert(0, {backend_dir!r})
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("handler", os.path.join({backend_dir!r}, "GetVehicleInsuranceStatus.py"))
+handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(handler)
+import_ms = (time.perf_counter() - start) * 1000
+
+import aws_clients
+from types import SimpleNamespace
+
+def answer(request, **kwargs):
+    from botocore.awsrequest import AWSResponse
+    time.sleep({latency!r})
+    number = json.loads(request.body)["ExpressionAttributeValues"][":reg_num"]["S"]
+    body = {{"Count": 1, "ScannedCount": 1, "Items": [{{
+        "insuranceId": {{"S": "veh-" + number}}, "registrationNumber": {{"S": number}},
+        "insuranceType": {{"S": "Standard"}}, "expiryDate": {{"S": "2099-01-01"}}}}]}}
+    raw = SimpleNamespace(stream=lambda **_: iter([json.dumps(body).encode()]))
+    return AWSResponse(request.url, 200, {{"Content-Type": "application/x-amz-json-1.0"}}, raw)
+
+get_session = aws_clients._get_session
+def local_session():
+    session = get_session()
+    session.events.register("before-send.dynamodb", answer, unique_id="benchmark-answer")
+    return session
+aws_clients._get_session = local_session
+
+def invoke(index):
+    event = {{"httpMethod": "GET", "path": "/vehicle-status", "resource": "/vehicle-status",
+              "queryStringParameters": {{"registrationNumber": f"REG{{index:09d}}"}}}}
+    start = time.perf_counter()
+    response = handler.lambda_handler(event, None)
+    assert response["statusCode"] == 200, response
+    return (time.perf_counter() - start) * 1000
+
+first_ms = invoke(0)
+warm_ms = [invoke(index) for index in range(1, {requests!r} + 1)]
+print(json.dumps({{"import_ms": import_ms, "first_request_ms": first_ms, "warm_ms": warm_ms}}))
+"""
+
+def coldstart_suite(aws, workload, args):
+    env = dict(os.environ, AWS_ACCESS_KEY_ID="benchmark", AWS_SECRET_ACCESS_KEY="benchmark", **BENCHMARK_ENV)
+    script = CONTAINER_SCRIPT.format(backend_dir=BACKEND_DIR, latency=args.latency_ms / 1000,
+                                     requests=min(args.requests, 200))
+    containers = []
+    for _ in range(args.repeats):
+        result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+        # The handler's metrics lines come first
+        containers.append(json.loads(result.stdout.splitlines()[-1]))
+
+    best = min(containers, key=lambda container: container["import_ms"] + container["first_request_ms"])
+    warm = sorted(min(containers, key=lambda container: percentile(sorted(container["warm_ms"]), 0.95))["warm_ms"])
+    return {
+        "GET /vehicle-status, cold start": {
+            "import_ms": best["import_ms"], "first_request_ms": best["first_request_ms"],
+            "ms": best["import_ms"] + best["first_request_ms"],
+        },
+        "GET /vehicle-status, warm": {
+            "requests": len(warm), "p50_ms": percentile(warm, 0.50), "p95_ms": percentile(warm, 0.95),
+            "p99_ms": percentile(warm, 0.99),
+        },
+    }
+
+# Finding a policy by registration number through the registrationNumber index and with the
+# fallback scan of unmigrated tables (vehicle_status.py), as the table grows. Each size gets its
+# own stand-in; the suite's one is installed again afterwards.
+LOOKUP_TABLE_SIZES = (1000, 10000, 100000)
+
+def lookup_suite(aws, workload, args):
+    import vehicle_status
+    from local_aws import LocalAWS
+
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        for size in LOOKUP_TABLE_SIZES:
+            sized = LocalAWS(latency=aws.latency)
+            create_tables(sized)
+            populate(sized, size, 0, args.policies_per_user, args.seed)
+            sized.install()
+            for name, find, lookups in (("index", vehicle_status.find_by_registration_number, args.requests),
+                                        ("scan", vehicle_status.scan_by_registration_number, 20)):
+                numbers = [f"REG{rng.randrange(size):09d}" for _ in range(lookups)]
+                reads_before, _ = capacity_total(sized)
+                timings = []
+                for number in numbers:
+                    start = time.perf_counter()
+                    assert find(number)["registrationNumber"] == number
+                    timings.append((time.perf_counter() - start) * 1000)
+                reads_after, _ = capacity_total(sized)
+                timings.sort()
+                results[f"status lookup, {name}, {size} items"] = {
+                    "requests": lookups, "p50_ms": percentile(timings, 0.50), "p95_ms": percentile(timings, 0.95),
+                    "rcu_per_request": (reads_after - reads_before) / lookups,
+                }
+    finally:
+        aws.install()
+    return results
+
+SUITE_FUNCTIONS = {
+    "endpoints": endpoints_suite,
+    "json": json_suite,
+    "sweep": sweep_suite,
+    "export": export_suite,
+    "summary": summary_suite,
+    "throttle": throttle_suite,
+    "sharding": sharding_suite,
+    "metrics": metrics_suite,
+    "logging": logging_suite,
+    "tokens": tokens_suite,
+    "register": register_suite,
+    "coldstart": coldstart_suite,
+    "lookup": lookup_suite,
+}
+
+# Baseline
+
+# Compared metrics. Timings vary a lot between runs on a shared machine, so only p95 and
+# throughput are checked: a timing regresses when it gets more than (1 + tolerance) times worse,
+# plus an absolute slack for very short ones. The default tolerance of 1.0 flags a doubling,
+# about the run-to-run noise of a single-CPU machine; lower it on quieter ones. Consumed
+# capacity and error counts do not depend on the machine and get a tight fixed bound. The
+# metrics overhead is a difference of two timings and gets 10 points of slack on top.
+TIMING_LOWER_IS_BETTER = {"p95_ms": 1.0, "ms": 5.0, "failed_pct": 1.0, "overhead_pct": 10.0}
+TIMING_HIGHER_IS_BETTER = ("rps", "items_per_s", "records_per_s", "writes_per_s", "validations_per_s")
+CAPACITY = ("rcu_per_request", "wcu_per_request", "rcu", "wcu", "errors", "failed_batches", "list_users_per_request")
+CAPACITY_TOLERANCE = 0.1
+
+def check_baseline(results, baseline, tolerance):
+    violations = []
+    for name, metrics in results.items():
+        expected = baseline.get("results", {}).get(name)
+        if expected is None:
+            continue
+        for metric, value in metrics.items():
+            if metric not in expected:
+                continue
+            reference = expected[metric]
+            if metric in TIMING_LOWER_IS_BETTER:
+                limit = reference * (1 + tolerance) + TIMING_LOWER_IS_BETTER[metric]
+            elif metric in CAPACITY:
+                limit = reference * (1 + CAPACITY_TOLERANCE) + 0.05
+            elif metric in TIMING_HIGHER_IS_BETTER:
+                limit = reference / (1 + tolerance)
+                if value < limit:
+                    violations.append(f"{name}: {metric} {value:.2f} < {limit:.2f} (baseline {reference:.2f})")
+                continue
+            else:
+                continue
+            if value > limit:
+                violations.append(f"{name}: {metric} {value:.2f} > {limit:.2f} (baseline {reference:.2f})")
+    return violations
+
+def print_report(results):
+    for name, metrics in results.items():
+        values = ", ".join(
+            f"{metric}={value:.2f}" if isinstance(value, float) else f"{metric}={value}"
+            for metric, value in metrics.items()
+        )
+        print(f"{name:<34} {values}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Backend handlers against a local AWS stand-in")
+    parser.add_argument("--items", type=int, default=10000, help="policies per table")
+    parser.add_argument("--policies-per-user", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent requests")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per endpoint")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per endpoint; the best one is reported")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated round trip per AWS call")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"comma-separated subset of {','.join(SUITES)}")
+    parser.add_argument("--endpoints", nargs="*", help="only endpoints whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--check", action="store_true", help="exit non-zero on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, help="allowed timing regression factor minus one (default: baseline's, or 1.0)")
+    parser.add_argument("--write-baseline", action="store_true", help="save this run as the baseline")
+    args = parser.parse_args()
+
+    for name, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, BACKEND_DIR)
+    from local_aws import LocalAWS
+
+    aws = LocalAWS(latency=args.latency_ms / 1000)
+    create_tables(aws)
+    # Token signing happens inside the stand-in on the benchmark's own CPU; a 1024-bit key keeps it
+    # from dominating the login numbers (real Cognito signs on its side of the round trip)
+    aws.create_user_pool(USER_POOL_ID, CLIENT_ID, key_seed=args.seed, key_bits=1024)
+    start = time.perf_counter()
+    data = populate(aws, args.items, args.items, args.policies_per_user, args.seed)
+    print(f"Loaded {args.items} policies per table in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    aws.install()
+    workload = Workload(aws, data, args.seed)
+
+    results = {}
+    # Handlers print one metrics line per invocation; keep them out of the report
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for suite in args.suites.split(","):
+            results.update(SUITE_FUNCTIONS[suite](aws, workload, args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    settings = {"items": args.items, "requests": args.requests, "concurrency": args.concurrency,
+                "latency_ms": args.latency_ms}
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "tolerance": args.tolerance or 1.0, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.baseline}", file=sys.stderr)
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print(f"WARN baseline was recorded with {baseline.get('settings')}, this run used {settings}")
+        violations = check_baseline(results, baseline, args.tolerance or baseline.get("tolerance", 1.0))
+        for violation in violations:
+            print(f"FAIL {violation}")
+        sys.exit(1 if violations else 0)
+
+if __name__ == "__main__":
+    main()
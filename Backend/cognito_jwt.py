@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+# Local verification of Cognito access/ID tokens (RS256) against the user pool's cached JWKS.
+# Uses only the standard library so it adds nothing to the deployment package.
+#
+# Unlike cognito-idp get_user, this cannot see tokens revoked by a global sign-out before
+# they expire; callers that need that guarantee should keep using get_user.
+
+USER_POOL_ID = os.getenv("USER_POOL_ID")
+CLIENT_ID = os.getenv("CLIENT_ID")
+
+# Accepted clock skew for exp/iat, and minimum time between JWKS refreshes on unknown kids
+LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "60"))
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "60"))
+
+# DER prefix of the DigestInfo structure for SHA-256 (RFC 8017, section 9.2)
+SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+class TokenValidationError(ValueError):
+    pass
+
+def get_issuer(user_pool_id=None):
+    user_pool_id = user_pool_id or USER_POOL_ID
+    region = user_pool_id.split("_", 1)[0]
+    return f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+
+def b64url_decode(value):
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+def b64url_to_int(value):
+    return int.from_bytes(b64url_decode(value), "big")
+
+# Public keys by kid, fetched on first use and re-fetched when a token names an unknown kid
+class JWKSCache:
+    def __init__(self, jwks_url, fetch=None):
+        self.jwks_url = jwks_url
+        self.fetch = fetch or self._fetch
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _fetch(self, url):
+        import urllib.request
+
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return json.loads(response.read())
+
+    def refresh(self):
+        jwks = self.fetch(self.jwks_url)
+        self._keys = {
+            key["kid"]: (b64url_to_int(key["n"]), b64url_to_int(key["e"]))
+            for key in jwks.get("keys", [])
+            if key.get("kty") == "RSA"
+        }
+        self._fetched_at = time.monotonic()
+
+    def get_key(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._lock:
+            key = self._keys.get(kid)
+            # Throttle refreshes so tokens with made-up kids can't hammer the JWKS endpoint
+            recently_fetched = self._fetched_at is not None and time.monotonic() - self._fetched_at < JWKS_REFRESH_INTERVAL
+            if key is None and not recently_fetched:
+                self.refresh()
+                key = self._keys.get(kid)
+        if key is None:
+            raise TokenValidationError("Unknown signing key")
+        return key
+
+# RSASSA-PKCS1-v1_5 with SHA-256
+def verify_rs256(signing_input, signature, public_key):
+    n, e = public_key
+    key_length = (n.bit_length() + 7) // 8
+    if len(signature) != key_length:
+        return False
+
+    decrypted = pow(int.from_bytes(signature, "big"), e, n).to_bytes(key_length, "big")
+    digest_info = SHA256_DIGEST_INFO + hashlib.sha256(signing_input).digest()
+    expected = b"\x00\x01" + b"\xff" * (key_length - len(digest_info) - 3) + b"\x00" + digest_info
+    return hmac.compare_digest(decrypted, expected)
+
+# Verify signature, expiry, issuer, token_use and audience; returns the token's claims.
+# Access tokens carry the app client in "client_id", ID tokens in "aud".
+def verify_token(token, jwks, issuer, client_id, token_use="access", now=None):
+    if not isinstance(token, str):
+        raise TokenValidationError("Malformed token")
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(b64url_decode(header_b64))
+        claims = json.loads(b64url_decode(payload_b64))
+        signature = b64url_decode(signature_b64)
+    except ValueError:
+        raise TokenValidationError("Malformed token")
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise TokenValidationError("Malformed token")
+
+    if header.get("alg") != "RS256":
+        raise TokenValidationError("Unsupported signing algorithm")
+    if not isinstance(header.get("kid"), str):
+        raise TokenValidationError("Unknown signing key")
+
+    public_key = jwks.get_key(header["kid"])
+    if not verify_rs256(f"{header_b64}.{payload_b64}".encode(), signature, public_key):
+        raise TokenValidationError("Invalid signature")
+
+    now = time.time() if now is None else now
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] + LEEWAY_SECONDS < now:
+        raise TokenValidationError("Token has expired")
+    if not isinstance(claims.get("iat", 0), (int, float)) or claims.get("iat", 0) - LEEWAY_SECONDS > now:
+        raise TokenValidationError("Token issued in the future")
+    if claims.get("iss") != issuer:
+        raise TokenValidationError("Invalid issuer")
+    if claims.get("token_use") != token_use:
+        raise TokenValidationError("Invalid token_use")
+
+    audience = claims.get("client_id") if token_use == "access" else claims.get("aud")
+    if audience != client_id:
+        raise TokenValidationError("Invalid audience")
+
+    return claims
+
+_jwks = None
+
+def get_jwks():
+    global _jwks
+    if _jwks is None:
+        _jwks = JWKSCache(f"{get_issuer()}/.well-known/jwks.json")
+    return _jwks
+
+# Verify a token issued by this function's user pool and app client
+def verify_pool_token(token, token_use="access"):
+    return verify_token(token, get_jwks(), get_issuer(), CLIENT_ID, token_use)
@@ -0,0 +1,129 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_resource
+from sharding import policy_keys, query_user_items
+
+# Chunked BatchWriteItem/BatchGetItem helpers shared by the bulk create and cancel endpoints.
+# Calls go through the resource's client, which is thread-safe and still accepts plain Python values.
+
+# Request limits of BatchWriteItem and BatchGetItem
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# The first attribute DynamoDB cannot store (floats, numbers beyond 38 significant digits), or
+# None. Bulk creates check every item this way before writing any of them.
+def unstorable_field(item):
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    for name, value in item.items():
+        try:
+            serializer.serialize(value)
+        except (TypeError, ValueError, ArithmeticError):
+            return name
+    return None
+
+def _backoff(attempt, base_delay):
+    time.sleep(random.uniform(0, base_delay * (2 ** attempt)))
+
+# Run fn over chunks, on a thread pool when max_workers > 1, and concatenate the results
+def _map_chunks(fn, chunks, max_workers):
+    if max_workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(fn, chunks))
+    else:
+        results = [fn(chunk) for chunk in chunks]
+    return [entry for result in results for entry in result]
+
+# Write PutRequest/DeleteRequest entries for one table in chunks of 25, resubmitting
+# UnprocessedItems with jittered exponential backoff. Returns the requests that were
+# still unprocessed after max_attempts.
+def batch_write(table_name, requests, max_attempts=5, base_delay=0.05, max_workers=1):
+    client = get_resource("dynamodb").meta.client
+
+    def write_chunk(chunk):
+        pending = chunk
+        for attempt in range(max_attempts):
+            response = client.batch_write_item(RequestItems={table_name: pending})
+            pending = response.get("UnprocessedItems", {}).get(table_name, [])
+            if not pending:
+                break
+            if attempt < max_attempts - 1:
+                _backoff(attempt, base_delay)
+        return pending
+
+    return _map_chunks(write_chunk, list(chunked(requests, BATCH_WRITE_LIMIT)), max_workers)
+
+# Fetch items by key in chunks of 100, retrying UnprocessedKeys. Keys that do not exist
+# are simply absent from the result.
+def batch_get(table_name, keys, projection=None, max_attempts=5, base_delay=0.05, max_workers=1):
+    client = get_resource("dynamodb").meta.client
+
+    def get_chunk(chunk):
+        request = {"Keys": chunk}
+        if projection:
+            request["ProjectionExpression"] = ", ".join(f"#{name}" for name in projection)
+            request["ExpressionAttributeNames"] = {f"#{name}": name for name in projection}
+
+        items = []
+        for attempt in range(max_attempts):
+            response = client.batch_get_item(RequestItems={table_name: request})
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            unprocessed = response.get("UnprocessedKeys", {}).get(table_name)
+            if not unprocessed:
+                break
+            request = unprocessed
+            if attempt < max_attempts - 1:
+                _backoff(attempt, base_delay)
+        return items
+
+    return _map_chunks(get_chunk, list(chunked(keys, BATCH_GET_LIMIT)), max_workers)
+
+# Delete a user's policies by insuranceId, or all of them when insurance_ids is None.
+# Existing policies are looked up first so the caller learns what was really deleted.
+# Returns (deleted items with the projected attributes, missing ids, failed ids).
+def bulk_delete_policies(table_name, user_id, insurance_ids=None, projection=("userId", "insuranceId"), max_workers=1):
+    projection = tuple(dict.fromkeys(("userId", "insuranceId") + tuple(projection)))
+
+    if insurance_ids is None:
+        existing = query_user_items(table_name, user_id, projection)
+        missing = []
+    else:
+        insurance_ids = list(dict.fromkeys(insurance_ids))
+        # A sharded user's policy may be in its shard or, until migrated, in the plain userId partition
+        keys = [key for insurance_id in insurance_ids for key in policy_keys(user_id, insurance_id)]
+        existing = batch_get(table_name, keys, projection, max_workers=max_workers)
+        found = {item["insuranceId"] for item in existing}
+        missing = [insurance_id for insurance_id in insurance_ids if insurance_id not in found]
+
+    requests = [
+        {"DeleteRequest": {"Key": {"userId": item["userId"], "insuranceId": item["insuranceId"]}}}
+        for item in existing
+    ]
+    unprocessed = batch_write(table_name, requests, max_workers=max_workers)
+    failed = {request["DeleteRequest"]["Key"]["insuranceId"] for request in unprocessed}
+
+    deleted = [item for item in existing if item["insuranceId"] not in failed]
+    return deleted, missing, sorted(failed)
+
+# Most insuranceIds one bulk cancel request may list
+MAX_BULK_CANCEL = 1000
+
+# Bulk cancel body: {"userId": ..., "insuranceIds": [...]} or {"userId": ..., "all": true}.
+# Returns (user_id, insurance_ids), with insurance_ids None for "all".
+def parse_bulk_cancel_request(body):
+    if not isinstance(body, dict) or not isinstance(body.get("userId"), str) or not body["userId"]:
+        raise ValueError("userId is required")
+    if body.get("all") is True:
+        return body["userId"], None
+    insurance_ids = body.get("insuranceIds")
+    if not isinstance(insurance_ids, list) or not insurance_ids or not all(isinstance(i, str) and i for i in insurance_ids):
+        raise ValueError('insuranceIds must be a non-empty list, or set "all": true')
+    if len(insurance_ids) > MAX_BULK_CANCEL:
+        raise ValueError(f"At most {MAX_BULK_CANCEL} insuranceIds per request")
+    return body["userId"], insurance_ids
@@ -0,0 +1,119 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+from aws_clients import get_resource, get_table
+from metrics import instrumented, record
+from retries import with_deadline
+from status_cache import get_status_cache, vehicle_status_key
+from structured_log import get_logger
+from vehicle_cancel import release_registration_locks
+
+# Scheduled job (e.g. an EventBridge rule once a day) that marks vehicle policies past their
+# expiryDate as expired. Policies are found through a sparse index on expiryBucket (the
+# expiryDate day, see vehicle_policies.build_vehicle_data); the sweep removes the attribute, so
+# every bucket only ever holds policies still to be swept and the job reads nothing else.
+# Created by migrate-vehicle-table.py.
+
+TABLE_NAME = 'VehicleInsuranceData'
+EXPIRY_INDEX_NAME = os.getenv('EXPIRY_INDEX_NAME', 'expiryBucket-index')
+
+# Buckets before today still holding policies are swept too, to catch up after missed runs
+SWEEP_LOOKBACK_DAYS = int(os.getenv('SWEEP_LOOKBACK_DAYS', '7'))
+SWEEP_PAGE_SIZE = int(os.getenv('SWEEP_PAGE_SIZE', '100'))
+SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', '8'))
+
+# If set, expired policies also get an expiresAt attribute for DynamoDB TTL to delete them
+EXPIRED_POLICY_RETENTION_DAYS = os.getenv('EXPIRED_POLICY_RETENTION_DAYS')
+
+# Stop starting new pages when the invocation is this close to its timeout
+SWEEP_TIME_RESERVE_MS = 10000
+
+log = get_logger('expiry_sweep')
+
+# event may contain {"from": "YYYY-MM-DD"} to sweep further back than the lookback window.
+# Returns a summary; if time ran out, "resumeFrom" can be passed back as "from".
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    today = datetime.utcnow().date()
+    start = (event or {}).get('from')
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else today - timedelta(days=SWEEP_LOOKBACK_DAYS)
+
+    expired = 0
+    bucket = start
+    # A policy is valid through its expiryDate, so the newest due bucket is yesterday's
+    while bucket < today:
+        expired += sweep_bucket(bucket.isoformat(), context)
+        # The bucket may have been left part-way; resuming from it only reads what is left
+        if context is not None and context.get_remaining_time_in_millis() < SWEEP_TIME_RESERVE_MS:
+            log.warning('sweep_out_of_time', resumeFrom=bucket.isoformat(), expired=expired)
+            record('ExpirySweep.Expired', expired, unit='Count')
+            return {'expired': expired, 'resumeFrom': bucket.isoformat()}
+        bucket += timedelta(days=1)
+
+    log.info('sweep_finished', start=start.isoformat(), expired=expired)
+    record('ExpirySweep.Expired', expired, unit='Count')
+    return {'expired': expired}
+
+# Expire every policy left in one day bucket, a page at a time
+def sweep_bucket(bucket, context=None):
+    table = get_table(TABLE_NAME)
+    query_kwargs = {
+        'IndexName': EXPIRY_INDEX_NAME,
+        'KeyConditionExpression': 'expiryBucket = :bucket',
+        'ExpressionAttributeValues': {':bucket': bucket},
+        'Limit': SWEEP_PAGE_SIZE
+    }
+    expired = 0
+
+    while True:
+        response = table.query(**query_kwargs)
+        if response['Items']:
+            expired += expire_policies(response['Items'], bucket)
+
+        # Expired items leave the sparse index, but paging on is still correct for the rest
+        if 'LastEvaluatedKey' not in response:
+            break
+        if context is not None and context.get_remaining_time_in_millis() < SWEEP_TIME_RESERVE_MS:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return expired
+
+# Mark a page of policies expired, free their registration numbers and drop cached statuses.
+# Returns how many policies this run expired.
+def expire_policies(items, bucket):
+    with ThreadPoolExecutor(max_workers=SWEEP_WORKERS) as executor:
+        outcomes = list(executor.map(lambda item: expire_policy(item, bucket), items))
+
+    expired = [item for item, done in zip(items, outcomes) if done]
+    release_registration_locks(expired)
+    get_status_cache().delete(*[
+        vehicle_status_key(item['registrationNumber']) for item in expired if item.get('registrationNumber')
+    ])
+    return len(expired)
+
+# Conditional on the bucket so a policy cancelled or already swept by another run is skipped
+def expire_policy(item, bucket):
+    update_expression = 'SET policyStatus = :expired REMOVE expiryBucket'
+    values = {':expired': 'expired', ':bucket': bucket}
+    if EXPIRED_POLICY_RETENTION_DAYS:
+        update_expression = 'SET policyStatus = :expired, expiresAt = :expires_at REMOVE expiryBucket'
+        values[':expires_at'] = int(time.time()) + int(EXPIRED_POLICY_RETENTION_DAYS) * 86400
+
+    try:
+        # Called from the sweep's worker threads: boto3 resources are not thread-safe, clients are
+        get_resource('dynamodb').meta.client.update_item(
+            TableName=TABLE_NAME,
+            Key={'userId': item['userId'], 'insuranceId': item['insuranceId']},
+            UpdateExpression=update_expression,
+            ConditionExpression='expiryBucket = :bucket',
+            ExpressionAttributeValues=values
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
@@ -0,0 +1,24 @@
+from json_encoding import dumps
+from metrics import timed
+
+# Headers and response builders shared by every Backend endpoint. All endpoints send the same
+# CORS headers so that one router (and one warm container) can serve any of them.
+
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PATCH, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, Idempotency-Key",
+}
+
+PREFLIGHT_RESPONSE = {"statusCode": 200, "headers": CORS_HEADERS, "body": ""}
+
+# body may be a value read from DynamoDB (see json_encoding.py) or an already encoded JSON string
+def json_response(status_code, body):
+    if not isinstance(body, str):
+        with timed("JsonEncode"):
+            body = dumps(body)
+    return {"statusCode": status_code, "headers": CORS_HEADERS, "body": body}
+
+def error_response(status_code, message):
+    return json_response(status_code, {"error": message})
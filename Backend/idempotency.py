@@ -0,0 +1,121 @@
+import hashlib
+import os
+import time
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from http_responses import CORS_HEADERS, error_response
+from structured_log import get_logger
+
+# Idempotency-Key support for the create endpoints. The first request with a key claims it with
+# a conditional put and stores the response once the handler has run; a retry with the same key
+# gets that response back from the failed put itself, without running the handler again.
+# Records expire through DynamoDB TTL on expiresAt (see migrate-idempotency-table.py).
+#
+# Any response below 500 is stored, including a bulk create whose results mark some policies
+# "failed" (throttled). Replaying the request would create the other policies a second time, so
+# the key keeps returning that response: clients retry the failed policies in a new request
+# with a new Idempotency-Key.
+
+IDEMPOTENCY_TABLE = os.getenv('IDEMPOTENCY_TABLE', 'IdempotencyKeys')
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+
+# A claim older than this is treated as abandoned (e.g. the function timed out) and can be taken over
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '60'))
+
+MAX_KEY_LENGTH = 255
+
+log = get_logger('idempotency')
+
+def get_idempotency_key(event):
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'idempotency-key':
+            return value
+    return None
+
+# Run handler(event) at most once per Idempotency-Key within scope (one scope per endpoint).
+# Requests without the header run as before.
+def with_idempotency(event, scope, handler):
+    key = get_idempotency_key(event)
+    if key is None:
+        return handler(event)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return error_response(400, f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters')
+
+    record_key = f'{scope}#{key}'
+    # A key reused with a different body is a client bug, not a retry
+    fingerprint = hashlib.sha256((event.get('body') or '').encode()).hexdigest()
+
+    existing = claim_key(record_key, fingerprint)
+    if existing is not None:
+        if existing.get('fingerprint') != fingerprint:
+            return error_response(422, 'Idempotency-Key was already used with a different request')
+        if existing['status'] == 'completed':
+            log.info('idempotent_replay', scope=scope)
+            return {
+                'statusCode': int(existing['statusCode']),
+                'headers': CORS_HEADERS,
+                'body': existing['responseBody']
+            }
+        return error_response(409, 'A request with this Idempotency-Key is still in progress')
+
+    try:
+        response = handler(event)
+    except Exception:
+        release_key(record_key)
+        raise
+
+    # Server errors are not stored so the client can retry them with the same key
+    if response['statusCode'] >= 500:
+        release_key(record_key)
+    else:
+        complete_key(record_key, response)
+    return response
+
+# Returns None if the key was claimed, otherwise the record already holding it
+def claim_key(record_key, fingerprint):
+    now = int(time.time())
+    try:
+        get_table(IDEMPOTENCY_TABLE).put_item(
+            Item={
+                'idempotencyKey': record_key,
+                'status': 'in_progress',
+                'fingerprint': fingerprint,
+                'lockedUntil': now + IDEMPOTENCY_LOCK_SECONDS,
+                'expiresAt': now + IDEMPOTENCY_TTL_SECONDS
+            },
+            ConditionExpression='attribute_not_exists(idempotencyKey) OR (#status = :in_progress AND lockedUntil < :now)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':in_progress': 'in_progress', ':now': now},
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+        return None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return from_dynamodb_item(e.response.get('Item', {}))
+
+def complete_key(record_key, response):
+    get_table(IDEMPOTENCY_TABLE).update_item(
+        Key={'idempotencyKey': record_key},
+        UpdateExpression='SET #status = :completed, statusCode = :status_code, responseBody = :body REMOVE lockedUntil',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':completed': 'completed',
+            ':status_code': response['statusCode'],
+            ':body': response['body']
+        }
+    )
+
+def release_key(record_key):
+    try:
+        get_table(IDEMPOTENCY_TABLE).delete_item(Key={'idempotencyKey': record_key})
+    except ClientError as e:
+        # The claim times out on its own, so a failed release only delays the retry
+        log.error('idempotency_release_failed', error=e.response['Error']['Message'])
+
+# Items returned with a failed condition are in the low-level attribute-value format
+def from_dynamodb_item(item):
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    return {key: deserializer.deserialize(value) for key, value in item.items()}
@@ -0,0 +1,49 @@
+import base64
+import json
+import os
+from decimal import Decimal
+
+# JSON encoding for values read from DynamoDB. boto3 returns numbers as Decimal, string/number
+# sets as set and binary attributes as bytes (or boto3's Binary wrapper), none of which the
+# stdlib encoder accepts. orjson is used when it is packaged with the function; set
+# JSON_BACKEND=stdlib to force the standard library encoder.
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+
+orjson = None
+if JSON_BACKEND != "stdlib":
+    try:
+        import orjson
+    except ImportError:
+        pass
+
+def to_json_value(value):
+    if isinstance(value, Decimal):
+        # Whole numbers (quantities, timestamps) stay integers, everything else becomes a float
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    # boto3.dynamodb.types.Binary, checked by attribute to avoid importing boto3 here
+    if hasattr(value, "value") and isinstance(value.value, (bytes, bytearray)):
+        return base64.b64encode(value.value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=to_json_value).decode()
+    return json.dumps(value, default=to_json_value, separators=(",", ":"))
+
+# Encode a large list of items in slices, so a failure names the item and callers can stream
+# the pieces (e.g. to S3) instead of holding one huge string
+def iter_dumps_list(items, chunk_size=1000):
+    yield "["
+    for start in range(0, len(items), chunk_size):
+        chunk = dumps(items[start:start + chunk_size])[1:-1]
+        if chunk:
+            yield chunk if start == 0 else "," + chunk
+    yield "]"
+
+def dumps_list(items, chunk_size=1000):
+    return "".join(iter_dumps_list(items, chunk_size))
@@ -0,0 +1,1058 @@
+import base64
+import bisect
+import copy
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from botocore.exceptions import ClientError
+
+# In-process stand-ins for the DynamoDB and Cognito APIs the Backend handlers call, used by
+# benchmark.py to run every handler without AWS. install() puts them into aws_clients' caches,
+# so handler code runs unchanged.
+#
+# Covered: the resource Table calls (get/put/update/delete_item, query, scan), BatchGetItem,
+# BatchWriteItem, Query, Scan and UpdateItem on the resource's client, TransactWriteItems on the
+# low-level client, the condition/update/key expressions the handlers use, global secondary
+# indexes, streams (NEW_IMAGE), approximate consumed capacity and an optional per-partition
+# write limit.
+# Cognito covers the user_auth flows and issues RS256 tokens that cognito_jwt verifies against
+# the stand-in's JWKS. LocalRedis covers the redis-py calls status_cache.RedisCache makes.
+#
+# Not covered: nested attribute paths, IN, size(), list_append, index projections (indexes
+# return whole items), DynamoDB's 100-item transaction and 16 MB batch limits, read and
+# table-level throttling.
+
+MISSING = object()
+
+def client_error(code, message, operation, **extra):
+    return ClientError({'Error': {'Code': code, 'Message': message}, **extra}, operation)
+
+# Successful responses carry ResponseMetadata like real ones; travel_cancel checks the status code
+def ok(response):
+    return {**response, 'ResponseMetadata': {'HTTPStatusCode': 200}}
+
+# boto3's own (de)serializers, so stored values follow the same rules as real calls:
+# ints become Decimal, floats are rejected, sets must not be empty
+def _serializers():
+    from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+    return TypeSerializer(), TypeDeserializer()
+
+def normalize(value):
+    serializer, deserializer = _serializers()
+    return deserializer.deserialize(serializer.serialize(value))
+
+def normalize_item(item):
+    serializer, deserializer = _serializers()
+    return {key: deserializer.deserialize(serializer.serialize(value)) for key, value in item.items()}
+
+def to_typed(item):
+    serializer, _ = _serializers()
+    return {key: serializer.serialize(value) for key, value in item.items()}
+
+def from_typed(item):
+    _, deserializer = _serializers()
+    return {key: deserializer.deserialize(value) for key, value in item.items()}
+
+def copy_item(item):
+    if any(isinstance(value, (dict, list, set)) for value in item.values()):
+        return copy.deepcopy(item)
+    return dict(item)
+
+# Approximate DynamoDB item size: attribute names plus values
+def value_size(value):
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, dict):
+        return 3 + sum(len(key) + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, set)):
+        return 3 + sum(value_size(item) + 1 for item in value)
+    return len(str(value)) // 2 + 1
+
+def item_size(item):
+    return sum(len(name) + value_size(value) for name, value in item.items())
+
+def read_units(size, consistent=False):
+    units = max(1, math.ceil(size / 4096))
+    return units if consistent else units / 2
+
+def write_units(size):
+    return max(1, math.ceil(size / 1024))
+
+# Expressions
+
+TOKEN_RE = re.compile(r'\s*(<>|<=|>=|[=<>(),+\-]|[#:]?[A-Za-z_][A-Za-z0-9_]*)')
+COMPARATORS = {'=', '<>', '<', '<=', '>', '>='}
+
+def tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if not match:
+            raise client_error('ValidationException', f'Invalid expression: {expression!r}', 'Expression')
+        tokens.append(match.group(1))
+        position = match.end()
+    return tokens
+
+# Recursive-descent parser producing tuples:
+#   ('and'|'or', a, b), ('not', a), ('cmp', op, a, b), ('between', a, low, high),
+#   ('call', name, [args]), ('path', name), ('value', v), ('+'|'-', a, b)
+class Parser:
+    def __init__(self, expression, names=None, values=None):
+        self.tokens = tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise client_error('ValidationException', f'Expected {expected or "token"}, got {token!r}', 'Expression')
+        self.position += 1
+        return token
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    def condition(self):
+        node = self.conjunction()
+        while self.peek() and self.peek().upper() == 'OR':
+            self.take()
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.peek() and self.peek().upper() == 'AND':
+            self.take()
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.peek() and self.peek().upper() == 'NOT':
+            self.take()
+            return ('not', self.negation())
+        if self.peek() == '(':
+            self.take()
+            node = self.condition()
+            self.take(')')
+            return node
+        left = self.operand()
+        token = self.peek()
+        if token in COMPARATORS:
+            self.take()
+            return ('cmp', token, left, self.operand())
+        if token and token.upper() == 'BETWEEN':
+            self.take()
+            low = self.operand()
+            self.take('AND')
+            return ('between', left, low, self.operand())
+        if left[0] == 'call':
+            return left
+        raise client_error('ValidationException', f'Expected a condition at {token!r}', 'Expression')
+
+    def operand(self):
+        node = self.atom()
+        while self.peek() in ('+', '-'):
+            node = (self.take(), node, self.atom())
+        return node
+
+    def atom(self):
+        token = self.take()
+        if token.startswith(':'):
+            if token not in self.values:
+                raise client_error('ValidationException', f'Value {token} not defined', 'Expression')
+            return ('value', self.values[token])
+        name = self.names.get(token, token) if token.startswith('#') else token
+        if self.peek() == '(' and not token.startswith('#'):
+            self.take()
+            args = [self.operand()]
+            while self.peek() == ',':
+                self.take()
+                args.append(self.operand())
+            self.take(')')
+            return ('call', token, args)
+        return ('path', name)
+
+    # SET a = x, b = y REMOVE c, d ADD e :n
+    def update(self):
+        actions = []
+        while not self.done():
+            clause = self.take().upper()
+            while True:
+                if clause == 'SET':
+                    path = self.atom()
+                    self.take('=')
+                    actions.append(('set', path[1], self.operand()))
+                elif clause == 'REMOVE':
+                    actions.append(('remove', self.atom()[1], None))
+                elif clause in ('ADD', 'DELETE'):
+                    path = self.atom()
+                    actions.append((clause.lower(), path[1], self.atom()))
+                else:
+                    raise client_error('ValidationException', f'Unknown update clause {clause}', 'UpdateExpression')
+                if self.peek() != ',':
+                    break
+                self.take()
+        return actions
+
+def evaluate(node, item):
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return item.get(node[1], MISSING)
+    if kind in ('+', '-'):
+        left, right = evaluate(node[1], item), evaluate(node[2], item)
+        if left is MISSING or right is MISSING:
+            raise client_error('ValidationException', 'An operand in the update expression is missing', 'UpdateItem')
+        return left + right if kind == '+' else left - right
+    if kind == 'call':
+        name, args = node[1], node[2]
+        if name == 'if_not_exists':
+            value = evaluate(args[0], item)
+            return evaluate(args[1], item) if value is MISSING else value
+        if name == 'attribute_exists':
+            return evaluate(args[0], item) is not MISSING
+        if name == 'attribute_not_exists':
+            return evaluate(args[0], item) is MISSING
+        if name == 'begins_with':
+            value = evaluate(args[0], item)
+            return isinstance(value, str) and value.startswith(evaluate(args[1], item))
+        if name == 'contains':
+            value = evaluate(args[0], item)
+            return value is not MISSING and evaluate(args[1], item) in value
+        raise client_error('ValidationException', f'Unsupported function {name}', 'Expression')
+    if kind == 'and':
+        return evaluate(node[1], item) and evaluate(node[2], item)
+    if kind == 'or':
+        return evaluate(node[1], item) or evaluate(node[2], item)
+    if kind == 'not':
+        return not evaluate(node[1], item)
+    if kind == 'between':
+        value, low, high = (evaluate(part, item) for part in node[1:])
+        return MISSING not in (value, low, high) and compare('>=', value, low) and compare('<=', value, high)
+    if kind == 'cmp':
+        return compare(node[1], evaluate(node[2], item), evaluate(node[3], item))
+    raise ValueError(f'Unknown expression node {node!r}')
+
+def compare(operator, left, right):
+    if left is MISSING or right is MISSING:
+        return operator == '<>' and left is not right
+    try:
+        return {
+            '=': lambda: left == right,
+            '<>': lambda: left != right,
+            '<': lambda: left < right,
+            '<=': lambda: left <= right,
+            '>': lambda: left > right,
+            '>=': lambda: left >= right,
+        }[operator]()
+    except TypeError:
+        return False
+
+def parse_condition(expression, names, values):
+    if not expression:
+        return None
+    parser = Parser(expression, names, values)
+    node = parser.condition()
+    if not parser.done():
+        raise client_error('ValidationException', f'Unexpected {parser.peek()!r} in {expression!r}', 'Expression')
+    return node
+
+def parse_projection(expression, names):
+    if not expression:
+        return None
+    return [names.get(part.strip(), part.strip()) for part in expression.split(',')]
+
+def project(item, attributes):
+    if attributes is None:
+        return copy_item(item)
+    return {name: copy.deepcopy(item[name]) for name in attributes if name in item}
+
+# The partition key value and the remaining range condition of a key condition
+def split_key_condition(node, hash_key):
+    if node[0] == 'cmp' and node[1] == '=' and node[2] == ('path', hash_key) and node[3][0] == 'value':
+        return node[3][1], None
+    if node[0] == 'and':
+        for first, second in ((node[1], node[2]), (node[2], node[1])):
+            try:
+                value, rest = split_key_condition(first, hash_key)
+            except ValueError:
+                continue
+            return value, second if rest is None else ('and', rest, second)
+    raise ValueError(f'Key condition must test {hash_key} for equality')
+
+# Tables
+
+class LocalTable:
+    # indexes: {name: (hash_key, range_key or None, projected attributes or None for ALL)}
+    # partition_write_limit: write units per second one partition key value accepts before
+    # writes to it are throttled, like a DynamoDB partition (1000 WCU/s); None for no limit
+    def __init__(self, aws, name, hash_key, range_key=None, indexes=None, stream=False, partition_write_limit=None):
+        self.aws = aws
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes or {}
+        self.lock = threading.RLock()
+        self.items = {}
+        self.partitions = {}
+        self.index_partitions = {index_name: {} for index_name in self.indexes}
+        self.revision = 0
+        self._scan_order = None
+        self.stream_enabled = stream
+        self.stream_records = []
+        self.read_units = 0.0
+        self.write_units = 0.0
+        self.partition_write_limit = partition_write_limit
+        self.partition_tokens = {}
+        self.meta = SimpleNamespace(client=aws.resource_client)
+
+    @property
+    def table_name(self):
+        return self.name
+
+    def key_of(self, item):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            raise client_error('ValidationException', 'The provided key element does not match the schema', 'Key')
+        return (item[self.hash_key], item[self.range_key] if self.range_key else None)
+
+    def key_dict(self, key):
+        result = {self.hash_key: key[0]}
+        if self.range_key:
+            result[self.range_key] = key[1]
+        return result
+
+    def index_entry(self, index_name, item):
+        hash_key, range_key, _ = self.indexes[index_name]
+        if hash_key not in item or (range_key and range_key not in item):
+            return None
+        return item[hash_key], (item[range_key] if range_key else '', self.key_of(item))
+
+    # Store or remove one item, keeping partitions, indexes and the stream in step
+    def _write(self, key, new_item, event_name=None):
+        old_item = self.items.get(key)
+        if old_item is not None:
+            for index_name in self.indexes:
+                entry = self.index_entry(index_name, old_item)
+                if entry:
+                    entries = self.index_partitions[index_name][entry[0]]
+                    del entries[bisect.bisect_left(entries, entry[1])]
+        if new_item is None:
+            self.items.pop(key, None)
+            range_keys = self.partitions.get(key[0], [])
+            position = bisect.bisect_left(range_keys, key[1]) if self.range_key else 0
+            if position < len(range_keys) and range_keys[position] == key[1]:
+                del range_keys[position]
+        else:
+            if old_item is None:
+                bisect.insort(self.partitions.setdefault(key[0], []), key[1])
+            self.items[key] = new_item
+            for index_name in self.indexes:
+                entry = self.index_entry(index_name, new_item)
+                if entry:
+                    bisect.insort(self.index_partitions[index_name].setdefault(entry[0], []), entry[1])
+        self.revision += 1
+        self._scan_order = None
+
+        if self.stream_enabled and (old_item is not None or new_item is not None):
+            record = {
+                'eventID': str(next(self.aws.sequence)),
+                'eventName': event_name or ('REMOVE' if new_item is None else 'INSERT' if old_item is None else 'MODIFY'),
+                'eventSource': 'aws:dynamodb',
+                'eventSourceARN': f'arn:aws:dynamodb:local:000000000000:table/{self.name}/stream/local',
+                'dynamodb': {
+                    'Keys': to_typed(self.key_dict(key)),
+                    'SequenceNumber': str(next(self.aws.sequence)),
+                    'StreamViewType': 'NEW_IMAGE',
+                }
+            }
+            if new_item is not None:
+                record['dynamodb']['NewImage'] = to_typed(new_item)
+            self.stream_records.append(record)
+
+    def drain_stream(self):
+        with self.lock:
+            records, self.stream_records = self.stream_records, []
+        return records
+
+    def _charge(self, read=0.0, write=0.0):
+        with self.aws.capacity_lock:
+            self.read_units += read
+            self.write_units += write
+
+    # False if the partition has no room for the write; throttled writes consume nothing
+    def _take_partition_units(self, hash_value, units):
+        if self.partition_write_limit is None:
+            return True
+        limit = self.partition_write_limit
+        with self.aws.capacity_lock:
+            now = time.monotonic()
+            tokens, updated = self.partition_tokens.get(hash_value, (limit, now))
+            tokens = min(limit, tokens + (now - updated) * limit)
+            taken = tokens >= units
+            self.partition_tokens[hash_value] = (tokens - units if taken else tokens, now)
+            return taken
+
+    def _throttle(self, hash_value, units, operation):
+        if not self._take_partition_units(hash_value, units):
+            raise client_error('ProvisionedThroughputExceededException',
+                               'The level of configured provisioned throughput for the table was exceeded.', operation)
+
+    def _check(self, condition, item, operation, return_old=None):
+        if condition is not None and not evaluate(condition, item or {}):
+            extra = {}
+            if return_old == 'ALL_OLD' and item is not None:
+                extra['Item'] = to_typed(item)
+            raise client_error('ConditionalCheckFailedException', 'The conditional request failed', operation, **extra)
+
+    # Bulk-load items that already use Decimal for numbers, without stream records or capacity
+    def load(self, items):
+        with self.lock:
+            stream_enabled, self.stream_enabled = self.stream_enabled, False
+            for item in items:
+                self._write(self.key_of(item), item)
+            self.stream_enabled = stream_enabled
+
+    # Resource API
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False,
+                 ReturnConsumedCapacity=None):
+        self.aws.wait()
+        key = self.key_of(normalize_item(Key))
+        with self.lock:
+            item = self.items.get(key)
+            result = {} if item is None else {'Item': project(item, parse_projection(ProjectionExpression, ExpressionAttributeNames or {}))}
+        self._charge(read=read_units(item_size(item) if item else 0, ConsistentRead))
+        return ok(result)
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                 ReturnValues='NONE', ReturnValuesOnConditionCheckFailure=None, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        item = normalize_item(Item)
+        condition = parse_condition(ConditionExpression, ExpressionAttributeNames, normalize_item(ExpressionAttributeValues or {}))
+        key = self.key_of(item)
+        with self.lock:
+            old_item = self.items.get(key)
+            units = write_units(max(item_size(item), item_size(old_item or {})))
+            self._throttle(key[0], units, 'PutItem')
+            self._charge(write=units)
+            self._check(condition, old_item, 'PutItem', ReturnValuesOnConditionCheckFailure)
+            self._write(key, item)
+        return ok({'Attributes': copy_item(old_item)} if ReturnValues == 'ALL_OLD' and old_item else {})
+
+    def update_item(self, Key, UpdateExpression=None, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', ReturnValuesOnConditionCheckFailure=None,
+                    ReturnConsumedCapacity=None):
+        self.aws.wait()
+        names = ExpressionAttributeNames or {}
+        values = normalize_item(ExpressionAttributeValues or {})
+        key_item = normalize_item(Key)
+        key = self.key_of(key_item)
+        condition = parse_condition(ConditionExpression, names, values)
+        actions = Parser(UpdateExpression, names, values).update() if UpdateExpression else []
+
+        with self.lock:
+            old_item = self.items.get(key)
+            self._check(condition, old_item, 'UpdateItem', ReturnValuesOnConditionCheckFailure)
+            new_item = copy_item(old_item) if old_item else dict(key_item)
+            changed = []
+            for action, name, operand in actions:
+                changed.append(name)
+                if action == 'set':
+                    new_item[name] = evaluate(operand, old_item or key_item)
+                elif action == 'remove':
+                    new_item.pop(name, None)
+                elif action == 'add':
+                    value = evaluate(operand, new_item)
+                    current = new_item.get(name)
+                    new_item[name] = value if current is None else (current | value if isinstance(value, set) else current + value)
+                elif action == 'delete':
+                    current = new_item.get(name, set()) - evaluate(operand, new_item)
+                    if current:
+                        new_item[name] = current
+                    else:
+                        new_item.pop(name, None)
+            if name_in_key(changed, self):
+                raise client_error('ValidationException', 'Cannot update attribute that is part of the key', 'UpdateItem')
+            units = write_units(max(item_size(new_item), item_size(old_item or {})))
+            self._throttle(key[0], units, 'UpdateItem')
+            self._charge(write=units)
+            self._write(key, new_item)
+
+        if ReturnValues == 'ALL_NEW':
+            return ok({'Attributes': copy_item(new_item)})
+        if ReturnValues == 'ALL_OLD' and old_item:
+            return ok({'Attributes': copy_item(old_item)})
+        if ReturnValues == 'UPDATED_NEW':
+            return ok({'Attributes': {name: new_item[name] for name in changed if name in new_item}})
+        if ReturnValues == 'UPDATED_OLD' and old_item:
+            return ok({'Attributes': {name: old_item[name] for name in changed if name in old_item}})
+        return ok({})
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ReturnValues='NONE', ReturnValuesOnConditionCheckFailure=None, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        key = self.key_of(normalize_item(Key))
+        condition = parse_condition(ConditionExpression, ExpressionAttributeNames, normalize_item(ExpressionAttributeValues or {}))
+        with self.lock:
+            old_item = self.items.get(key)
+            units = write_units(item_size(old_item or {}))
+            self._throttle(key[0], units, 'DeleteItem')
+            self._charge(write=units)
+            self._check(condition, old_item, 'DeleteItem', ReturnValuesOnConditionCheckFailure)
+            if old_item is not None:
+                self._write(key, None)
+        return ok({'Attributes': copy_item(old_item)} if ReturnValues == 'ALL_OLD' and old_item else {})
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None,
+              ScanIndexForward=True, ConsistentRead=False, Select=None, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        names = ExpressionAttributeNames or {}
+        values = normalize_item(ExpressionAttributeValues or {})
+        if IndexName is not None and IndexName not in self.indexes:
+            raise client_error('ValidationException', 'The table does not have the specified index: ' + IndexName, 'Query')
+        hash_key = self.indexes[IndexName][0] if IndexName else self.hash_key
+        hash_value, range_condition = split_key_condition(parse_condition(KeyConditionExpression, names, values), hash_key)
+        filter_condition = parse_condition(FilterExpression, names, values)
+        projection = parse_projection(ProjectionExpression, names)
+        start = normalize_item(ExclusiveStartKey) if ExclusiveStartKey else None
+
+        with self.lock:
+            if IndexName:
+                entries = self.index_partitions[IndexName].get(hash_value, [])
+                keys = [entry[1] for entry in entries]
+                start_position = bisect.bisect_right(entries, self.index_position(IndexName, start)) if start else 0
+            else:
+                range_keys = self.partitions.get(hash_value, [])
+                keys = [(hash_value, range_key) for range_key in range_keys]
+                start_position = bisect.bisect_right(range_keys, start.get(self.range_key)) if start else 0
+            if not ScanIndexForward:
+                keys = keys[::-1]
+            candidates = [self.items[key] for key in keys[start_position:]]
+            if range_condition is not None:
+                candidates = [item for item in candidates if evaluate(range_condition, item)]
+            return self._page('Query', candidates, filter_condition, projection, Limit, IndexName, ConsistentRead)
+
+    def index_position(self, index_name, start):
+        _, range_key, _ = self.indexes[index_name]
+        return (start[range_key] if range_key else '', self.key_of(start))
+
+    def scan(self, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None, Segment=None, TotalSegments=None,
+             IndexName=None, ConsistentRead=False, Select=None, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        names = ExpressionAttributeNames or {}
+        filter_condition = parse_condition(FilterExpression, names, normalize_item(ExpressionAttributeValues or {}))
+        projection = parse_projection(ProjectionExpression, names)
+        start = self.key_of(normalize_item(ExclusiveStartKey)) if ExclusiveStartKey else None
+
+        with self.lock:
+            keys = self.scan_order(Segment or 0, TotalSegments or 1)
+            start_position = bisect.bisect_right(keys, start) if start else 0
+            # Only build the page (a limited slice, not the whole segment) under the lock
+            window = keys[start_position:start_position + (Limit or len(keys))]
+            candidates = [self.items[key] for key in window]
+            more = start_position + len(window) < len(keys)
+            page = self._page('Scan', candidates, filter_condition, projection, Limit, None, ConsistentRead)
+            if more and 'LastEvaluatedKey' not in page and candidates:
+                page['LastEvaluatedKey'] = self.key_dict(self.key_of(candidates[-1]))
+            return page
+
+    # Keys of one scan segment in a stable order, cached until the next write
+    def scan_order(self, segment, total_segments):
+        if self._scan_order is None or self._scan_order[0] != (self.revision, total_segments):
+            segments = [[] for _ in range(total_segments)]
+            for key in self.items:
+                segments[zlib.crc32(repr(key[0]).encode()) % total_segments].append(key)
+            for keys in segments:
+                keys.sort()
+            self._scan_order = ((self.revision, total_segments), segments)
+        return self._scan_order[1][segment]
+
+    # One page of a query or scan: Limit counts items read before filtering, and a page stops at 1 MB
+    def _page(self, operation, candidates, filter_condition, projection, limit, index_name, consistent):
+        items = []
+        read_size = 0
+        scanned = 0
+        for item in candidates:
+            if (limit is not None and scanned >= limit) or read_size >= 1024 * 1024:
+                break
+            read_size += item_size(item)
+            scanned += 1
+            if filter_condition is None or evaluate(filter_condition, item):
+                items.append(project(item, projection))
+        self._charge(read=read_units(read_size, consistent))
+
+        result = {'Items': items, 'Count': len(items), 'ScannedCount': scanned}
+        if scanned < len(candidates):
+            last = candidates[scanned - 1]
+            last_key = self.key_dict(self.key_of(last))
+            if index_name:
+                hash_key, range_key, _ = self.indexes[index_name]
+                last_key[hash_key] = last[hash_key]
+                if range_key:
+                    last_key[range_key] = last[range_key]
+            result['LastEvaluatedKey'] = last_key
+        return ok(result)
+
+def name_in_key(names, table):
+    return table.hash_key in names or (table.range_key is not None and table.range_key in names)
+
+# Clients
+
+# The client behind the resource (resource.meta.client): takes plain Python values
+class LocalResourceClient:
+    def __init__(self, aws):
+        self.aws = aws
+
+    # Requests to throttled partitions come back in UnprocessedItems
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        unprocessed = {}
+        for table_name, requests in RequestItems.items():
+            table = self.aws.table(table_name)
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = normalize_item(request['PutRequest']['Item'])
+                    key = table.key_of(item)
+                    with table.lock:
+                        units = write_units(item_size(item))
+                        if not table._take_partition_units(key[0], units):
+                            unprocessed.setdefault(table_name, []).append(request)
+                            continue
+                        table._charge(write=units)
+                        table._write(key, item)
+                else:
+                    key = table.key_of(normalize_item(request['DeleteRequest']['Key']))
+                    with table.lock:
+                        old_item = table.items.get(key)
+                        units = write_units(item_size(old_item or {}))
+                        if not table._take_partition_units(key[0], units):
+                            unprocessed.setdefault(table_name, []).append(request)
+                            continue
+                        table._charge(write=units)
+                        if old_item is not None:
+                            table._write(key, None)
+        return ok({'UnprocessedItems': unprocessed})
+
+    def query(self, TableName, **kwargs):
+        return self.aws.table(TableName).query(**kwargs)
+
+    def scan(self, TableName, **kwargs):
+        return self.aws.table(TableName).scan(**kwargs)
+
+    def update_item(self, TableName, **kwargs):
+        return self.aws.table(TableName).update_item(**kwargs)
+
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self.aws.table(table_name)
+            projection = parse_projection(request.get('ProjectionExpression'), request.get('ExpressionAttributeNames') or {})
+            found = []
+            with table.lock:
+                for key in request['Keys']:
+                    item = table.items.get(table.key_of(normalize_item(key)))
+                    table._charge(read=read_units(item_size(item) if item else 0, request.get('ConsistentRead', False)))
+                    if item is not None:
+                        found.append(project(item, projection))
+            responses[table_name] = found
+        return ok({'Responses': responses, 'UnprocessedKeys': {}})
+
+# The low-level client (aws_clients.get_client('dynamodb')): attribute values are typed
+class LocalDynamoDBClient:
+    def __init__(self, aws):
+        self.aws = aws
+
+    # All-or-nothing: every condition is checked with all involved tables locked, then all writes applied
+    def transact_write_items(self, TransactItems, ClientRequestToken=None, ReturnConsumedCapacity=None):
+        self.aws.wait()
+        operations = []
+        for entry in TransactItems:
+            (action, request), = entry.items()
+            operations.append((action, request, self.aws.table(request['TableName'])))
+
+        tables = sorted({table.name: table for _, _, table in operations}.values(), key=lambda table: table.name)
+        with self.aws.transaction_lock:
+            for table in tables:
+                table.lock.acquire()
+            try:
+                reasons = []
+                prepared = []
+                for action, request, table in operations:
+                    names = request.get('ExpressionAttributeNames') or {}
+                    values = from_typed(request.get('ExpressionAttributeValues') or {})
+                    condition = parse_condition(request.get('ConditionExpression'), names, values)
+                    item = from_typed(request['Item']) if action == 'Put' else None
+                    key = table.key_of(item if item is not None else from_typed(request['Key']))
+                    old_item = table.items.get(key)
+                    if condition is not None and not evaluate(condition, old_item or {}):
+                        reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+                    elif action != 'ConditionCheck' and not table._take_partition_units(key[0], 2 * write_units(item_size(item or old_item or {}))):
+                        reasons.append({'Code': 'ThrottlingError', 'Message': 'Throughput exceeds the current capacity of your table or index.'})
+                    else:
+                        reasons.append({'Code': 'None'})
+                    prepared.append((action, request, table, key, item, old_item, names, values))
+
+                if any(reason['Code'] != 'None' for reason in reasons):
+                    codes = ', '.join(reason['Code'] for reason in reasons)
+                    raise client_error(
+                        'TransactionCanceledException',
+                        f'Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]',
+                        'TransactWriteItems',
+                        CancellationReasons=reasons
+                    )
+
+                for action, request, table, key, item, old_item, names, values in prepared:
+                    if action == 'Put':
+                        table._charge(write=2 * write_units(item_size(item)))
+                        table._write(key, item)
+                    elif action == 'Delete':
+                        table._charge(write=2 * write_units(item_size(old_item or {})))
+                        if old_item is not None:
+                            table._write(key, None)
+                    elif action == 'Update':
+                        new_item = copy_item(old_item) if old_item else table.key_dict(key)
+                        for update, name, operand in Parser(request['UpdateExpression'], names, values).update():
+                            if update == 'set':
+                                new_item[name] = evaluate(operand, old_item or new_item)
+                            elif update == 'remove':
+                                new_item.pop(name, None)
+                        table._charge(write=2 * write_units(item_size(new_item)))
+                        table._write(key, new_item)
+                    else:
+                        table._charge(read=2 * read_units(item_size(old_item or {}), True))
+            finally:
+                for table in reversed(tables):
+                    table.lock.release()
+        return ok({})
+
+class LocalResource:
+    def __init__(self, aws):
+        self.aws = aws
+        self.meta = SimpleNamespace(client=aws.resource_client)
+
+    def Table(self, name):
+        return self.aws.table(name)
+
+# Cognito
+
+# Pure-Python RSA key for signing the stand-in's tokens (cognito_jwt only needs to verify them)
+def generate_rsa_key(bits=2048, seed=None):
+    rng = random.Random(seed)
+
+    def is_probable_prime(n):
+        for p in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+            if n % p == 0:
+                return n == p
+        d, r = n - 1, 0
+        while d % 2 == 0:
+            d, r = d // 2, r + 1
+        for _ in range(24):
+            x = pow(rng.randrange(2, n - 1), d, n)
+            if x in (1, n - 1):
+                continue
+            for _ in range(r - 1):
+                x = pow(x, 2, n)
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+
+    def prime(bits):
+        while True:
+            candidate = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+            if is_probable_prime(candidate):
+                return candidate
+
+    e = 65537
+    while True:
+        p, q = prime(bits // 2), prime(bits // 2)
+        phi = (p - 1) * (q - 1)
+        if p != q and math.gcd(e, phi) == 1:
+            return p * q, e, pow(e, -1, phi), p, q
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def int_to_b64url(value):
+    return b64url(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+class LocalCognito:
+    EXCEPTIONS = [
+        'UserNotFoundException', 'UsernameExistsException', 'NotAuthorizedException',
+        'CodeMismatchException', 'ExpiredCodeException', 'InvalidPasswordException',
+        'UserNotConfirmedException',
+    ]
+
+    # key_bits: Cognito signs with 2048-bit keys; smaller keys sign faster when that is not what is measured
+    def __init__(self, aws, user_pool_id, client_id, key_seed=None, key_bits=2048):
+        self.aws = aws
+        self.user_pool_id = user_pool_id
+        self.client_id = client_id
+        self.issuer = f"https://cognito-idp.{user_pool_id.split('_', 1)[0]}.amazonaws.com/{user_pool_id}"
+        self.lock = threading.Lock()
+        self.users = {}
+        self.usernames_by_email = {}
+        self.reset_codes = {}
+        self.access_tokens = {}
+        self.recent_tokens = {}
+        # list_users has a low request quota in Cognito, so callers are measured by how often they use it
+        self.list_users_calls = 0
+        self.kid = 'local-key'
+        self.n, self.e, self.d, self.p, self.q = generate_rsa_key(key_bits, key_seed)
+        self.exceptions = SimpleNamespace(**{
+            name: type(name, (ClientError,), {}) for name in self.EXCEPTIONS
+        })
+
+    def error(self, name, message, operation):
+        return getattr(self.exceptions, name)({'Error': {'Code': name, 'Message': message}}, operation)
+
+    def jwks(self, url=None):
+        return {'keys': [{'kty': 'RSA', 'kid': self.kid, 'alg': 'RS256', 'use': 'sig',
+                          'n': int_to_b64url(self.n), 'e': int_to_b64url(self.e)}]}
+
+    def sign(self, claims):
+        header = b64url(json.dumps({'alg': 'RS256', 'kid': self.kid}).encode())
+        payload = b64url(json.dumps(claims).encode())
+        signing_input = f'{header}.{payload}'.encode()
+
+        # EMSA-PKCS1-v1_5 with SHA-256 (RFC 8017, section 9.2)
+        digest_info = bytes.fromhex('3031300d060960864801650304020105000420') + hashlib.sha256(signing_input).digest()
+        length = (self.n.bit_length() + 7) // 8
+        encoded = b'\x00\x01' + b'\xff' * (length - len(digest_info) - 3) + b'\x00' + digest_info
+        # Chinese remainder theorem: two half-size exponentiations instead of one full one
+        message = int.from_bytes(encoded, 'big')
+        m1 = pow(message, self.d % (self.p - 1), self.p)
+        m2 = pow(message, self.d % (self.q - 1), self.q)
+        h = (pow(self.q, -1, self.p) * (m1 - m2)) % self.p
+        signature = (m2 + h * self.q).to_bytes(length, 'big')
+        return f'{header}.{payload}.{b64url(signature)}'
+
+    def add_user(self, username, password, email, confirmed=True):
+        with self.lock:
+            self.users[username] = {
+                'password': password,
+                'status': 'CONFIRMED' if confirmed else 'UNCONFIRMED',
+                'attributes': {'email': email, 'email_verified': 'true' if confirmed else 'false', 'sub': username},
+            }
+            self.usernames_by_email[email] = username
+
+    def get(self, username, operation):
+        user = self.users.get(username)
+        if user is None:
+            raise self.error('UserNotFoundException', 'User does not exist.', operation)
+        return user
+
+    def user_attributes(self, user):
+        return [{'Name': name, 'Value': value} for name, value in user['attributes'].items()]
+
+    def list_users(self, UserPoolId, Filter=None, Limit=60, AttributesToGet=None):
+        self.aws.wait()
+        match = re.match(r'\s*email\s*=\s*"(.*)"\s*$', Filter or '')
+        with self.lock:
+            self.list_users_calls += 1
+            usernames = [self.usernames_by_email[match.group(1)]] if match and match.group(1) in self.usernames_by_email else []
+            return {'Users': [
+                {'Username': username, 'Attributes': self.user_attributes(self.users[username]),
+                 'UserStatus': self.users[username]['status']}
+                for username in usernames[:Limit]
+            ]}
+
+    def sign_up(self, ClientId, Username, Password, UserAttributes=None):
+        self.aws.wait()
+        with self.lock:
+            if Username in self.users:
+                raise self.error('UsernameExistsException', 'User already exists', 'SignUp')
+            attributes = {attribute['Name']: attribute['Value'] for attribute in UserAttributes or []}
+            self.users[Username] = {'password': Password, 'status': 'UNCONFIRMED',
+                                    'attributes': dict(attributes, sub=Username)}
+            if 'email' in attributes:
+                self.usernames_by_email[attributes['email']] = Username
+        return {'UserConfirmed': False, 'UserSub': Username}
+
+    def admin_get_user(self, UserPoolId, Username):
+        self.aws.wait()
+        with self.lock:
+            user = self.get(Username, 'AdminGetUser')
+            return {'Username': Username, 'UserAttributes': self.user_attributes(user), 'UserStatus': user['status']}
+
+    def admin_update_user_attributes(self, UserPoolId, Username, UserAttributes):
+        self.aws.wait()
+        with self.lock:
+            user = self.get(Username, 'AdminUpdateUserAttributes')
+            user['attributes'].update({attribute['Name']: attribute['Value'] for attribute in UserAttributes})
+        return {}
+
+    def admin_confirm_sign_up(self, UserPoolId, Username):
+        self.aws.wait()
+        with self.lock:
+            self.get(Username, 'AdminConfirmSignUp')['status'] = 'CONFIRMED'
+        return {}
+
+    def admin_delete_user(self, UserPoolId, Username):
+        self.aws.wait()
+        with self.lock:
+            user = self.users.pop(Username, None)
+            if user is None:
+                raise self.error('UserNotFoundException', 'User does not exist.', 'AdminDeleteUser')
+            self.usernames_by_email.pop(user['attributes'].get('email'), None)
+        return {}
+
+    def forgot_password(self, ClientId, Username):
+        self.aws.wait()
+        with self.lock:
+            self.get(Username, 'ForgotPassword')
+            self.reset_codes[Username] = '123456'
+        return {'CodeDeliveryDetails': {'DeliveryMedium': 'EMAIL'}}
+
+    def confirm_forgot_password(self, ClientId, Username, ConfirmationCode, Password):
+        self.aws.wait()
+        with self.lock:
+            user = self.get(Username, 'ConfirmForgotPassword')
+            if Username not in self.reset_codes:
+                raise self.error('ExpiredCodeException', 'Invalid code provided, please request a code again.', 'ConfirmForgotPassword')
+            if self.reset_codes[Username] != ConfirmationCode:
+                raise self.error('CodeMismatchException', 'Invalid verification code provided.', 'ConfirmForgotPassword')
+            del self.reset_codes[Username]
+            user['password'] = Password
+        return {}
+
+    def initiate_auth(self, ClientId, AuthFlow, AuthParameters):
+        self.aws.wait()
+        username = AuthParameters.get('USERNAME')
+        with self.lock:
+            user = self.users.get(username)
+            if user is None or user['password'] != AuthParameters.get('PASSWORD'):
+                raise self.error('NotAuthorizedException', 'Incorrect username or password.', 'InitiateAuth')
+            # Like Cognito, only a correct password finds out that the user is unconfirmed
+            if user['status'] != 'CONFIRMED':
+                raise self.error('UserNotConfirmedException', 'User is not confirmed.', 'InitiateAuth')
+        # Signing is pure-Python RSA and costs milliseconds of CPU that real Cognito spends on its
+        # own servers, so a user's token is reused for logins within the same second
+        now = int(time.time())
+        with self.lock:
+            access_token = self.recent_tokens.get((username, now))
+        if access_token is None:
+            access_token = self.sign({
+                'sub': username, 'username': username, 'iss': self.issuer, 'client_id': self.client_id,
+                'token_use': 'access', 'iat': now, 'exp': now + 3600,
+            })
+            with self.lock:
+                self.recent_tokens = {key: token for key, token in self.recent_tokens.items() if key[1] == now}
+                self.recent_tokens[(username, now)] = access_token
+                self.access_tokens[access_token] = username
+        return {'AuthenticationResult': {'AccessToken': access_token, 'ExpiresIn': 3600, 'TokenType': 'Bearer',
+                                         'IdToken': access_token, 'RefreshToken': f'refresh-{username}'}}
+
+    def get_user(self, AccessToken):
+        self.aws.wait()
+        with self.lock:
+            username = self.access_tokens.get(AccessToken)
+            if username is None or username not in self.users:
+                raise self.error('NotAuthorizedException', 'Invalid Access Token', 'GetUser')
+            return {'Username': username, 'UserAttributes': self.user_attributes(self.users[username])}
+
+# Redis
+
+# The get/set/delete subset of redis-py's client, with expiry. Values come back as bytes like
+# redis-py's without decode_responses. clock is injectable so tests can move time forward.
+class LocalRedis:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self.entries[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None, px=None):
+        if isinstance(value, str):
+            value = value.encode()
+        ttl = px / 1000 if px is not None else ex
+        with self.lock:
+            self.entries[name] = (value, None if ttl is None else self.clock() + ttl)
+        return True
+
+    def delete(self, *names):
+        with self.lock:
+            return sum(self.entries.pop(name, None) is not None for name in names)
+
+# Everything together
+
+class LocalAWS:
+    # latency: seconds each call sleeps, outside any lock, to stand in for the network round trip
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self.sequence = itertools.count(100000000000000000000)
+        self.capacity_lock = threading.Lock()
+        self.transaction_lock = threading.Lock()
+        self.resource_client = LocalResourceClient(self)
+        self.client = LocalDynamoDBClient(self)
+        self.resource = LocalResource(self)
+        self.cognito = None
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def create_table(self, name, hash_key, range_key=None, indexes=None, stream=False, partition_write_limit=None):
+        self.tables[name] = LocalTable(self, name, hash_key, range_key, indexes, stream, partition_write_limit)
+        return self.tables[name]
+
+    def table(self, name):
+        if name not in self.tables:
+            raise client_error('ResourceNotFoundException', f'Requested resource not found: Table: {name} not found', 'DescribeTable')
+        return self.tables[name]
+
+    def create_user_pool(self, user_pool_id, client_id, key_seed=None, key_bits=2048):
+        self.cognito = LocalCognito(self, user_pool_id, client_id, key_seed, key_bits)
+        return self.cognito
+
+    # Total read and write units consumed so far, per table
+    def capacity(self):
+        with self.capacity_lock:
+            return {name: (table.read_units, table.write_units) for name, table in self.tables.items()}
+
+    # Route aws_clients (and so every handler) to the stand-ins
+    def install(self):
+        import aws_clients
+        import cognito_jwt
+
+        aws_clients._clients['dynamodb'] = self.client
+        aws_clients._resources['dynamodb'] = self.resource
+        aws_clients._tables.clear()
+        aws_clients._tables.update(self.tables)
+        if self.cognito is not None:
+            aws_clients._clients['cognito-idp'] = self.cognito
+            cognito_jwt._jwks = cognito_jwt.JWKSCache(f'{self.cognito.issuer}/.well-known/jwks.json', fetch=self.cognito.jwks)
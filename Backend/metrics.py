@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Per-invocation latency and DynamoDB consumed-capacity metrics, written as one CloudWatch
+# Embedded Metric Format (EMF) line when the outermost instrumented handler returns.
+#
+# AWS calls are recorded automatically through botocore event hooks that aws_clients installs on
+# every client; other steps can be timed with `with timed("JsonEncode"):`. Set METRICS_ENABLED=false
+# to turn everything off.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "InsuranceBackend")
+
+# EMF accepts at most 100 values per metric in one record
+MAX_VALUES_PER_METRIC = 100
+
+_lock = threading.Lock()
+_values = {}
+_units = {}
+_depth = 0
+
+def record(name, value, unit="Milliseconds"):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        values = _values.setdefault(name, [])
+        if len(values) < MAX_VALUES_PER_METRIC:
+            values.append(value)
+        _units[name] = unit
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(f"{name}.Duration", (time.perf_counter() - start) * 1000)
+
+def capacity_units(consumed_capacity):
+    # Single-table calls return a dict, batch and transaction calls a list of them
+    if isinstance(consumed_capacity, dict):
+        consumed_capacity = [consumed_capacity]
+    return sum(entry.get("CapacityUnits", 0) for entry in consumed_capacity or [])
+
+# botocore hooks, registered by aws_clients.register_metrics_hooks
+
+def start_call(params, model, context, **kwargs):
+    context["metrics_start"] = time.perf_counter()
+    if model.service_model.service_id.hyphenize() == "dynamodb" and "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+def record_call(model, context, parsed=None, **kwargs):
+    start = context.pop("metrics_start", None)
+    if start is None:
+        return
+    name = f"{model.service_model.service_id.hyphenize()}.{model.name}"
+    record(f"{name}.Duration", (time.perf_counter() - start) * 1000)
+    if parsed and "ConsumedCapacity" in parsed:
+        record(f"{name}.ConsumedCapacity", capacity_units(parsed["ConsumedCapacity"]), unit="Count")
+    if kwargs.get("exception") is not None or (parsed or {}).get("Error"):
+        record(f"{name}.Errors", 1, unit="Count")
+
+def flush(function_name):
+    global _values, _units
+    with _lock:
+        values, units = _values, _units
+        _values, _units = {}, {}
+    if not values:
+        return
+
+    document = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Function"]],
+                "Metrics": [{"Name": name, "Unit": units[name]} for name in values],
+            }],
+        },
+        "Function": function_name,
+    }
+    document.update(values)
+    print(json.dumps(document))
+
+# Wrap a lambda_handler so its duration and every AWS call it makes are emitted once it returns.
+# Nested instrumented handlers (the router calling a module's handler) share one record.
+def instrumented(handler):
+    @wraps(handler)
+    def wrapper(event, context):
+        global _depth
+        if not METRICS_ENABLED:
+            return handler(event, context)
+
+        _depth += 1
+        start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            _depth -= 1
+            if _depth == 0:
+                record("Handler.Duration", (time.perf_counter() - start) * 1000)
+                function_name = getattr(context, "function_name", None) or os.getenv("AWS_LAMBDA_FUNCTION_NAME", handler.__module__)
+                flush(function_name)
+    return wrapper
@@ -0,0 +1,34 @@
+from botocore.exceptions import ClientError
+from aws_clients import get_client
+from idempotency import IDEMPOTENCY_TABLE
+
+dynamodb_client = get_client('dynamodb')
+
+# Create the table behind the Idempotency-Key header (see idempotency.py), with TTL on expiresAt
+# so stored responses are deleted once retries are no longer expected
+def create_idempotency_table():
+    try:
+        dynamodb_client.create_table(
+            TableName=IDEMPOTENCY_TABLE,
+            AttributeDefinitions=[{'AttributeName': 'idempotencyKey', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'idempotencyKey', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        print(f"Creating table {IDEMPOTENCY_TABLE}")
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceInUseException':
+            raise
+        print(f"Table {IDEMPOTENCY_TABLE} already exists")
+
+    dynamodb_client.get_waiter('table_exists').wait(TableName=IDEMPOTENCY_TABLE)
+
+    status = dynamodb_client.describe_time_to_live(TableName=IDEMPOTENCY_TABLE)['TimeToLiveDescription']
+    if status['TimeToLiveStatus'] not in ('ENABLED', 'ENABLING'):
+        dynamodb_client.update_time_to_live(
+            TableName=IDEMPOTENCY_TABLE,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expiresAt'}
+        )
+        print(f"Enabled TTL on {IDEMPOTENCY_TABLE}.expiresAt")
+
+if __name__ == '__main__':
+    create_idempotency_table()
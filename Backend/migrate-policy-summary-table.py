@@ -0,0 +1,47 @@
+from botocore.exceptions import ClientError
+from aws_clients import get_client
+from policy_summary import KINDS, SUMMARY_TABLE
+
+dynamodb_client = get_client('dynamodb')
+
+# Create the summary table written by policy_summary.py
+def create_summary_table():
+    try:
+        dynamodb_client.create_table(
+            TableName=SUMMARY_TABLE,
+            AttributeDefinitions=[
+                {'AttributeName': 'userId', 'AttributeType': 'S'},
+                {'AttributeName': 'kind', 'AttributeType': 'S'}
+            ],
+            KeySchema=[
+                {'AttributeName': 'userId', 'KeyType': 'HASH'},
+                {'AttributeName': 'kind', 'KeyType': 'RANGE'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        print(f"Creating table {SUMMARY_TABLE}")
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceInUseException':
+            raise
+        print(f"Table {SUMMARY_TABLE} already exists")
+
+    dynamodb_client.get_waiter('table_exists').wait(TableName=SUMMARY_TABLE)
+
+# Turn on the streams the projector reads. The event source mappings to the function are
+# created with its deployment, using the stream ARNs printed here.
+def enable_policy_streams():
+    for config in KINDS.values():
+        table = dynamodb_client.describe_table(TableName=config['table'])['Table']
+        if table.get('StreamSpecification', {}).get('StreamEnabled'):
+            print(f"Stream already enabled on {config['table']}: {table['LatestStreamArn']}")
+            continue
+
+        table = dynamodb_client.update_table(
+            TableName=config['table'],
+            StreamSpecification={'StreamEnabled': True, 'StreamViewType': 'NEW_IMAGE'}
+        )['TableDescription']
+        print(f"Enabled stream on {config['table']}: {table['LatestStreamArn']}")
+
+if __name__ == '__main__':
+    create_summary_table()
+    enable_policy_streams()
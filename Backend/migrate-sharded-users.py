@@ -0,0 +1,83 @@
+import argparse
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from sharding import SHARDED_USERS, partition_key, query_partition, user_partitions
+
+POLICY_TABLES = ['VehicleInsuranceData', 'TravelInsuranceData']
+
+# Attempts at moving one policy that keeps being updated while it is copied
+MAX_MOVE_ATTEMPTS = 5
+
+# Move a user's existing policies into their shards (see sharding.py), or back into the plain
+# userId partition with --unshard. Run with the same SHARDED_USERS as the functions; the user
+# must be listed there in both directions. Safe to re-run and to run while the API is serving:
+# each policy is copied before the old copy is deleted, and the delete only happens if the policy
+# did not change in between.
+def migrate_user(user_id, table_names, unshard=False):
+    if user_id not in SHARDED_USERS:
+        raise SystemExit(f"{user_id} is not in SHARDED_USERS")
+
+    def target(insurance_id):
+        return user_id if unshard else partition_key(user_id, insurance_id)
+
+    for table_name in table_names:
+        moved = 0
+        for partition in user_partitions(user_id):
+            for item in partition_items(table_name, partition):
+                if target(item['insuranceId']) != partition:
+                    move_policy(table_name, item, target(item['insuranceId']))
+                    moved += 1
+        print(f"Moved {moved} {table_name} policies of {user_id}")
+
+def partition_items(table_name, partition):
+    start_key = None
+    while True:
+        response = query_partition(table_name, partition, None, start_key, None)
+        yield from response['Items']
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return
+
+# Copy the policy under the new partition key, unless a newer version is already there (a PATCH
+# finds the new key first), then delete the old one if it is still the version that was read
+def move_policy(table_name, item, new_partition):
+    table = get_table(table_name)
+    old_key = {'userId': item['userId'], 'insuranceId': item['insuranceId']}
+
+    for attempt in range(MAX_MOVE_ATTEMPTS):
+        version = item.get('version', 0)
+        try:
+            table.put_item(
+                Item=dict(item, userId=new_partition),
+                ConditionExpression='attribute_not_exists(insuranceId) OR attribute_not_exists(version) OR version < :version',
+                ExpressionAttributeValues={':version': version}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        # Items written before versions existed count as version 0
+        condition = 'version = :version' if version else 'attribute_not_exists(version) OR version = :version'
+        try:
+            table.delete_item(Key=old_key, ConditionExpression=condition, ExpressionAttributeValues={':version': version})
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        # Changed since it was read (or already deleted): copy the current version
+        item = table.get_item(Key=old_key, ConsistentRead=True).get('Item')
+        if item is None:
+            return
+
+    print(f"Gave up moving policy {old_key['insuranceId']}; it keeps changing, re-run to retry")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move policies of sharded users between partitions')
+    parser.add_argument('user_ids', nargs='+', metavar='userId')
+    parser.add_argument('--tables', nargs='+', default=POLICY_TABLES)
+    parser.add_argument('--unshard', action='store_true', help='move policies back into the userId partition')
+    args = parser.parse_args()
+
+    for user_id in args.user_ids:
+        migrate_user(user_id, args.tables, args.unshard)
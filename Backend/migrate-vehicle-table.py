@@ -0,0 +1,186 @@
+import os
+import time
+from botocore.exceptions import ClientError
+from aws_clients import get_client, get_table
+
+dynamodb_client = get_client('dynamodb')
+
+TABLE_NAME = 'VehicleInsuranceData'
+REGISTRATION_INDEX_NAME = os.getenv('REGISTRATION_INDEX_NAME', 'registrationNumber-index')
+REGISTRATION_LOCK_TABLE = os.getenv('REGISTRATION_LOCK_TABLE', 'VehicleRegistrationLocks')
+EXPIRY_INDEX_NAME = os.getenv('EXPIRY_INDEX_NAME', 'expiryBucket-index')
+
+# Set to let DynamoDB TTL delete expired policies (see expiry_sweep.py)
+EXPIRED_POLICY_RETENTION_DAYS = os.getenv('EXPIRED_POLICY_RETENTION_DAYS')
+
+# Create the registrationNumber GSI used by GetVehicleInsuranceStatus.
+# DynamoDB backfills existing items into a new index itself; this waits until that is done.
+def create_registration_index():
+    create_index(
+        REGISTRATION_INDEX_NAME,
+        key_schema=[{'AttributeName': 'registrationNumber', 'KeyType': 'HASH'}],
+        attribute_definitions=[{'AttributeName': 'registrationNumber', 'AttributeType': 'S'}],
+        # Only the fields returned by the status endpoint are projected
+        projection={'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['insuranceType', 'expiryDate']}
+    )
+
+# Create the sparse expiryBucket GSI read by the expiry sweep. Only items that have the
+# attribute are indexed, which backfill_expiry_buckets adds to existing unexpired policies.
+def create_expiry_index():
+    create_index(
+        EXPIRY_INDEX_NAME,
+        key_schema=[
+            {'AttributeName': 'expiryBucket', 'KeyType': 'HASH'},
+            {'AttributeName': 'insuranceId', 'KeyType': 'RANGE'}
+        ],
+        attribute_definitions=[
+            {'AttributeName': 'expiryBucket', 'AttributeType': 'S'},
+            {'AttributeName': 'insuranceId', 'AttributeType': 'S'}
+        ],
+        # The sweep needs the table key (always projected) and the registration number to free
+        projection={'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['registrationNumber']}
+    )
+
+def create_index(index_name, key_schema, attribute_definitions, projection):
+    table = dynamodb_client.describe_table(TableName=TABLE_NAME)['Table']
+    existing_indexes = [index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])]
+
+    if index_name in existing_indexes:
+        print(f"Index {index_name} already exists on {TABLE_NAME}")
+    else:
+        index = {'IndexName': index_name, 'KeySchema': key_schema, 'Projection': projection}
+
+        # Provisioned tables need throughput settings for the index as well
+        if table.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+            throughput = table['ProvisionedThroughput']
+            index['ProvisionedThroughput'] = {
+                'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+                'WriteCapacityUnits': throughput['WriteCapacityUnits']
+            }
+
+        dynamodb_client.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=attribute_definitions,
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        print(f"Creating index {index_name} on {TABLE_NAME}")
+
+    wait_for_index(index_name)
+
+# Poll until the index is ACTIVE, i.e. the backfill of existing items has finished
+def wait_for_index(index_name, poll_seconds=15):
+    while True:
+        table = dynamodb_client.describe_table(TableName=TABLE_NAME)['Table']
+        index = next(i for i in table.get('GlobalSecondaryIndexes', []) if i['IndexName'] == index_name)
+
+        if index['IndexStatus'] == 'ACTIVE':
+            print(f"Index {index_name} is active ({index.get('ItemCount', 0)} items)")
+            return
+
+        print(f"Index {index_name} is {index['IndexStatus']}, backfilling: {index.get('Backfilling', False)}")
+        time.sleep(poll_seconds)
+
+# Create the table add-insurance-api uses to claim registration numbers
+def create_registration_lock_table():
+    try:
+        dynamodb_client.create_table(
+            TableName=REGISTRATION_LOCK_TABLE,
+            AttributeDefinitions=[{'AttributeName': 'registrationNumber', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'registrationNumber', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        print(f"Creating table {REGISTRATION_LOCK_TABLE}")
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceInUseException':
+            raise
+        print(f"Table {REGISTRATION_LOCK_TABLE} already exists")
+
+    dynamodb_client.get_waiter('table_exists').wait(TableName=REGISTRATION_LOCK_TABLE)
+
+# Write a lock item for every existing policy that has not expired; expired policies give up
+# their registration number (see expiry_sweep.py). Safe to re-run; duplicates already in the
+# policy table are reported and keep the lock of whichever policy was seen first.
+def backfill_registration_locks():
+    policy_table = get_table(TABLE_NAME)
+    lock_table = get_table(REGISTRATION_LOCK_TABLE)
+    scan_kwargs = {
+        'ProjectionExpression': 'registrationNumber, userId, insuranceId',
+        'FilterExpression': 'attribute_exists(registrationNumber) AND (attribute_not_exists(policyStatus) OR policyStatus <> :expired)',
+        'ExpressionAttributeValues': {':expired': 'expired'}
+    }
+    written = 0
+
+    while True:
+        response = policy_table.scan(**scan_kwargs)
+
+        for item in response['Items']:
+            try:
+                lock_table.put_item(
+                    Item=item,
+                    ConditionExpression='attribute_not_exists(registrationNumber) OR insuranceId = :insurance_id',
+                    ExpressionAttributeValues={':insurance_id': item['insuranceId']}
+                )
+                written += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                print(f"Duplicate registration number {item['registrationNumber']} on policy {item['insuranceId']}")
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    print(f"Backfilled {written} registration locks")
+
+# Give policies created before expiryBucket existed a bucket, so the sweep sees them.
+# Safe to re-run: expired and already bucketed policies are skipped.
+def backfill_expiry_buckets():
+    policy_table = get_table(TABLE_NAME)
+    scan_kwargs = {
+        'ProjectionExpression': 'userId, insuranceId, expiryDate',
+        'FilterExpression': 'attribute_exists(expiryDate) AND attribute_not_exists(expiryBucket) AND attribute_not_exists(policyStatus)'
+    }
+    written = 0
+
+    while True:
+        response = policy_table.scan(**scan_kwargs)
+
+        for item in response['Items']:
+            try:
+                policy_table.update_item(
+                    Key={'userId': item['userId'], 'insuranceId': item['insuranceId']},
+                    UpdateExpression='SET expiryBucket = :bucket',
+                    ConditionExpression='attribute_exists(insuranceId)',
+                    ExpressionAttributeValues={':bucket': item['expiryDate']}
+                )
+                written += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    print(f"Backfilled {written} expiry buckets")
+
+def enable_expiry_ttl():
+    status = dynamodb_client.describe_time_to_live(TableName=TABLE_NAME)['TimeToLiveDescription']
+    if status['TimeToLiveStatus'] in ('ENABLED', 'ENABLING'):
+        print(f"TTL already {status['TimeToLiveStatus'].lower()} on {TABLE_NAME} ({status.get('AttributeName')})")
+        return
+
+    dynamodb_client.update_time_to_live(
+        TableName=TABLE_NAME,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expiresAt'}
+    )
+    print(f"Enabled TTL on {TABLE_NAME}.expiresAt")
+
+if __name__ == '__main__':
+    create_registration_index()
+    create_registration_lock_table()
+    backfill_registration_locks()
+    create_expiry_index()
+    backfill_expiry_buckets()
+    if EXPIRED_POLICY_RETENTION_DAYS:
+        enable_expiry_ttl()
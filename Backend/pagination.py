@@ -0,0 +1,37 @@
+import base64
+import json
+
+# Cursor pagination shared by the policy listing endpoints. nextToken is the LastEvaluatedKey
+# of the previous page, base64-encoded so clients treat it as opaque.
+
+# Page size when the client does not pass ?limit=, and the most it may ask for
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_next_token(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_next_token(token):
+    if not token:
+        return None
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        start_key = None
+    # Every key attribute of these tables is a string
+    if not isinstance(start_key, dict) or not start_key or not all(isinstance(value, str) for value in start_key.values()):
+        raise ValueError("Invalid nextToken")
+    return start_key
@@ -0,0 +1,280 @@
+import os
+import time
+from datetime import datetime
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from metrics import instrumented
+from retries import THROTTLING_CODES, TRANSIENT_CODES, with_deadline
+from sharding import owner_user_id, policy_keys, query_user_items, shard_count
+from structured_log import get_logger
+
+# Per-user policy summaries kept up to date from the DynamoDB Streams of the policy tables, so
+# a status read is one get_item instead of a query. One summary item per (userId, kind):
+#
+#   {"userId", "kind": "vehicle" | "travel", "policies": {insuranceId: {...display fields}},
+#    "activeCount", "expiredCount", "nextExpiry", "version", "updatedAt"}
+#
+# "policies" holds every policy of the user, expired ones with their policyStatus, so a first
+# page read from the summary matches one read from the base table. The counts and nextExpiry
+# are as of updatedAt; readers recompute them for the current day with policy_counts.
+#
+# An item holds at most 400 KB, so a user with more than MAX_SUMMARY_POLICIES policies of a kind
+# gets {"userId", "kind", "incomplete": true, "version", "updatedAt"} instead, as does a user
+# whose summary could not be updated. Readers treat it like a missing summary and the projector
+# leaves it alone until the user is rebuilt.
+#
+# Both tables need a stream with NEW_IMAGE (or NEW_AND_OLD_IMAGES) mapped to this function with
+# ReportBatchItemFailures enabled. Create the table with migrate-policy-summary-table.py, then
+# invoke with {"rebuild": "vehicle"} and {"rebuild": "travel"} to fill it from the base tables
+# (add "userId" to rebuild one user).
+
+SUMMARY_TABLE = os.getenv('POLICY_SUMMARY_TABLE', 'PolicySummaries')
+
+# Serve first pages of the status endpoints from summaries; turn on once they have been rebuilt.
+# Reads lag writes by the stream delay, usually well under a second.
+SUMMARY_READS_ENABLED = os.getenv('POLICY_SUMMARY_READS', 'false').lower() == 'true'
+
+# Base table and summarized fields for each kind of policy
+KINDS = {
+    'vehicle': {
+        'table': 'VehicleInsuranceData',
+        'fields': ['insuranceId', 'registrationNumber', 'make', 'model', 'insuranceType', 'price',
+                   'expiryDate', 'version'],
+        'expiry_field': 'expiryDate'
+    },
+    'travel': {
+        'table': 'TravelInsuranceData',
+        'fields': ['insuranceId', 'customer_name', 'title', 'insuranceType', 'price', 'startDate', 'endDate',
+                   'createdAt', 'version'],
+        'expiry_field': 'endDate'
+    }
+}
+TABLE_KINDS = {config['table']: kind for kind, config in KINDS.items()}
+
+# Attempts at the read-modify-write of one summary when another writer got there first
+MAX_SUMMARY_ATTEMPTS = 5
+
+# Most policies one summary lists; about 250 bytes each, so well under the 400 KB item limit
+MAX_SUMMARY_POLICIES = int(os.getenv('MAX_SUMMARY_POLICIES', '500'))
+
+log = get_logger('policy_summary')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    if 'rebuild' in event:
+        return rebuild(event['rebuild'], event.get('userId'))
+    return process_stream_records(event.get('Records', []))
+
+# Returns the summary of one user's policies of a kind, or None if it has never been built or
+# is incomplete
+def get_summary(user_id, kind):
+    return complete_summary(read_summary(user_id, kind))
+
+def read_summary(user_id, kind):
+    return get_table(SUMMARY_TABLE).get_item(Key={'userId': user_id, 'kind': kind}).get('Item')
+
+def complete_summary(summary):
+    return None if summary is None or summary.get('incomplete') else summary
+
+# The policies of a summary, in insuranceId order like a query of the base table
+def summary_policies(summary):
+    return [summary['policies'][insurance_id] for insurance_id in sorted(summary['policies'])]
+
+# The first page of a summary's policies and the LastEvaluatedKey a query of the base table
+# would page on from (None when the page holds the rest)
+def summary_first_page(summary, limit):
+    insurance_ids = sorted(summary['policies'])
+    policies = [summary['policies'][insurance_id] for insurance_id in insurance_ids[:limit]]
+    last_key = None
+    if len(insurance_ids) > limit:
+        last_key = {'userId': summary['userId'], 'insuranceId': insurance_ids[limit - 1]}
+    return policies, last_key
+
+def is_active(policy):
+    return policy.get('policyStatus', 'active') != 'expired'
+
+# Active and not past its expiry date, which a policy can be before the expiry sweep marks it
+def is_current(kind, policy, today):
+    expiry = parse_date(policy.get(KINDS[kind]['expiry_field']))
+    return is_active(policy) and (expiry is None or expiry >= today)
+
+# activeCount, expiredCount and nextExpiry of a user's policies of a kind as of today (UTC)
+def policy_counts(kind, policies, today=None):
+    today = today or datetime.utcnow().strftime('%Y-%m-%d')
+    current = [policy for policy in policies if is_current(kind, policy, today)]
+    expiries = sorted(filter(None, (parse_date(policy.get(KINDS[kind]['expiry_field'])) for policy in current)))
+    return {
+        'activeCount': len(current),
+        'expiredCount': len(policies) - len(current),
+        'nextExpiry': expiries[0] if expiries else None
+    }
+
+# Dates look like YYYY-MM-DD; travel dates may also be "Not available"
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+# The display fields of a base-table item, and its status if it has expired
+def summarize(kind, item):
+    entry = {field: item[field] for field in KINDS[kind]['fields'] if field in item}
+    if not is_active(item):
+        entry['policyStatus'] = item['policyStatus']
+    return entry
+
+# Apply stream changes to each affected summary. Changes are grouped per user and applied in
+# stream order. A user whose summary could not be written because of throttling, a server error
+# or competing writers is reported from its first record on, and Lambda retries the batch from
+# there. Any other error would fail the same way on every retry, so the summary is marked
+# incomplete instead (readers fall back to the base table until a rebuild) and the batch carries on.
+def process_stream_records(records):
+    changes = {}
+    for record in records:
+        kind = TABLE_KINDS.get(record['eventSourceARN'].split(':table/')[1].split('/')[0])
+        if kind is None:
+            continue
+        stream_record = record['dynamodb']
+        keys = from_dynamodb_item(stream_record['Keys'])
+        new_image = from_dynamodb_item(stream_record['NewImage']) if 'NewImage' in stream_record else None
+        # Summaries are per user, whichever shard the policy is stored in
+        user_id = owner_user_id(keys['userId'])
+        if new_image is None and shard_count(user_id):
+            new_image = find_moved_policy(KINDS[kind]['table'], user_id, keys)
+        changes.setdefault((user_id, kind), []).append(
+            (stream_record['SequenceNumber'], keys['insuranceId'], new_image)
+        )
+
+    failed = []
+    for (user_id, kind), user_changes in changes.items():
+        try:
+            apply_changes(user_id, kind, [(insurance_id, image) for _, insurance_id, image in user_changes])
+        except ClientError as e:
+            log.error('summary_update_failed', userId=user_id, kind=kind, error=e.response['Error']['Message'])
+            if is_retryable(e):
+                failed.append(user_changes[0][0])
+            else:
+                mark_incomplete(user_id, kind)
+
+    # Retrying from the earliest failed record also re-applies later ones, which is harmless:
+    # each change sets or removes one policy
+    if failed:
+        return {'batchItemFailures': [{'itemIdentifier': min(failed, key=int)}]}
+    return {'batchItemFailures': []}
+
+def is_retryable(error):
+    code = error.response['Error']['Code']
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+    return (code == 'ConditionalCheckFailedException' or code in THROTTLING_CODES or code in TRANSIENT_CODES
+            or status >= 500)
+
+# Bumping the version makes writers that read the summary before this start over and find it incomplete
+def mark_incomplete(user_id, kind):
+    try:
+        get_table(SUMMARY_TABLE).update_item(
+            Key={'userId': user_id, 'kind': kind},
+            UpdateExpression='SET incomplete = :true, updatedAt = :now '
+                             'REMOVE policies, activeCount, expiredCount, nextExpiry ADD version :one',
+            ExpressionAttributeValues={':true': True, ':now': int(time.time()), ':one': 1}
+        )
+    except ClientError as e:
+        log.error('summary_mark_incomplete_failed', userId=user_id, kind=kind, error=e.response['Error']['Message'])
+
+# migrate-sharded-users.py moves a policy by writing it under its new key and deleting the old
+# one, and the two records may arrive in either order. A removal of a sharded user's policy only
+# removes it from the summary if it is not stored under another key.
+def find_moved_policy(table_name, user_id, keys):
+    for key in policy_keys(user_id, keys['insuranceId']):
+        if key['userId'] == keys['userId']:
+            continue
+        item = get_table(table_name).get_item(Key=key, ConsistentRead=True).get('Item')
+        if item:
+            return item
+    return None
+
+# changes: (insuranceId, new image or None for a removal) in stream order
+def apply_changes(user_id, kind, changes):
+    for attempt in range(MAX_SUMMARY_ATTEMPTS):
+        summary = read_summary(user_id, kind) or new_summary(user_id, kind)
+        if summary.get('incomplete'):
+            return
+        for insurance_id, image in changes:
+            summary['policies'].pop(insurance_id, None)
+            if image is not None:
+                summary['policies'][insurance_id] = summarize(kind, image)
+        try:
+            save_summary(summary)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MAX_SUMMARY_ATTEMPTS - 1:
+                raise
+
+def new_summary(user_id, kind):
+    return {'userId': user_id, 'kind': kind, 'policies': {}, 'version': 0}
+
+# Recompute the derived fields and write the summary if nobody else changed it since it was read
+def save_summary(summary):
+    expected_version = summary['version']
+    if len(summary['policies']) > MAX_SUMMARY_POLICIES:
+        item = {'userId': summary['userId'], 'kind': summary['kind'], 'incomplete': True}
+    else:
+        policies = list(summary['policies'].values())
+        item = dict(new_summary(summary['userId'], summary['kind']), policies=summary['policies'],
+                    **policy_counts(summary['kind'], policies))
+    item.update(version=expected_version + 1, updatedAt=int(time.time()))
+
+    condition = {'ConditionExpression': 'attribute_not_exists(userId)'}
+    if expected_version:
+        condition = {
+            'ConditionExpression': 'version = :expected',
+            'ExpressionAttributeValues': {':expected': expected_version}
+        }
+    get_table(SUMMARY_TABLE).put_item(Item=item, **condition)
+
+# Rebuild summaries from the base table: one user, or every user in it
+def rebuild(kind, user_id=None):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {', '.join(KINDS)}")
+
+    user_ids = [user_id] if user_id else list_user_ids(KINDS[kind]['table'])
+    for current_user_id in user_ids:
+        rebuild_user(kind, current_user_id)
+
+    log.info('summaries_rebuilt', kind=kind, users=len(user_ids))
+    return {'rebuilt': len(user_ids)}
+
+def rebuild_user(kind, user_id):
+    changes = [(item['insuranceId'], item) for item in query_user_items(KINDS[kind]['table'], user_id)]
+
+    # Start from an empty summary so policies missing from the base table are dropped
+    for attempt in range(MAX_SUMMARY_ATTEMPTS):
+        current = read_summary(user_id, kind)
+        summary = new_summary(user_id, kind)
+        summary['version'] = current['version'] if current else 0
+        for insurance_id, item in changes:
+            summary['policies'][insurance_id] = summarize(kind, item)
+        try:
+            save_summary(summary)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MAX_SUMMARY_ATTEMPTS - 1:
+                raise
+
+def list_user_ids(table_name):
+    table = get_table(table_name)
+    scan_kwargs = {'ProjectionExpression': 'userId'}
+    user_ids = set()
+    while True:
+        response = table.scan(**scan_kwargs)
+        user_ids.update(owner_user_id(item['userId']) for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return sorted(user_ids)
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+# Stream images are in the low-level attribute-value format
+def from_dynamodb_item(item):
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    return {key: deserializer.deserialize(value) for key, value in item.items()}
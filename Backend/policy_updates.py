@@ -0,0 +1,126 @@
+import json
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from dynamodb_batch import unstorable_field
+from http_responses import error_response, json_response
+from policy_summary import parse_date
+from sharding import policy_keys
+
+# In-place policy updates with optimistic locking, shared by the vehicle and travel PATCH
+# endpoints. Every policy carries a version number (items written before versions existed
+# count as version 0); an update names the version it was based on and only succeeds if the
+# policy is still at that version, so two clients cannot silently overwrite each other.
+#
+# PATCH body: {"userId": ..., "insuranceId": ..., "version": 3, "price": 120, ...}
+# Response:   {"insuranceId": ..., "version": 4, "price": 120, ...}  (only the changed fields)
+
+# Travel dates the client does not know yet are stored as this
+DATE_NOT_AVAILABLE = 'Not available'
+
+def is_price(value):
+    if isinstance(value, bool) or not isinstance(value, (int, Decimal)):
+        return False
+    return Decimal(value).is_finite() and value >= 0
+
+def is_travel_date(value):
+    return value == DATE_NOT_AVAILABLE or parse_date(value) == value
+
+def is_text(value):
+    return isinstance(value, str) and value != ''
+
+# What each updatable field may be set to; fields not listed here take any string
+FIELD_RULES = {
+    'price': (is_price, 'a non-negative number'),
+    'startDate': (is_travel_date, f'a YYYY-MM-DD date or "{DATE_NOT_AVAILABLE}"'),
+    'endDate': (is_travel_date, f'a YYYY-MM-DD date or "{DATE_NOT_AVAILABLE}"'),
+    'title': (is_text, 'a non-empty string'),
+    'insuranceType': (is_text, 'a non-empty string'),
+}
+
+# Why the new value of a field cannot be stored, or None
+def invalid_value(field, value):
+    check, expected = FIELD_RULES.get(field, (lambda value: isinstance(value, str), 'a string'))
+    if not check(value) or unstorable_field({field: value}):
+        return f'{field} must be {expected}'
+    return None
+
+def reject_constant(name):
+    raise ValueError(f'{name} is not a valid JSON value')
+
+# Parse and apply a PATCH request. on_updated(item) runs after a successful write with the full
+# updated item, e.g. to invalidate caches.
+def handle_patch(event, table_name, updatable_fields, on_updated=None):
+    try:
+        # Prices must reach DynamoDB as Decimal, not float; NaN and Infinity are not JSON
+        body = json.loads(event.get('body') or '{}', parse_float=Decimal, parse_constant=reject_constant)
+    except ValueError:
+        return error_response(400, 'Body must be valid JSON')
+    if not isinstance(body, dict):
+        return error_response(400, 'Body must be a JSON object')
+
+    user_id = body.pop('userId', None)
+    insurance_id = body.pop('insuranceId', None)
+    version = body.pop('version', None)
+    if not isinstance(user_id, str) or not user_id or not isinstance(insurance_id, str) or not insurance_id:
+        return error_response(400, 'userId and insuranceId are required')
+    if not isinstance(version, int) or isinstance(version, bool) or version < 0:
+        return error_response(400, 'version must be the non-negative integer the update is based on')
+
+    unknown = sorted(set(body) - set(updatable_fields))
+    if unknown:
+        return error_response(400, f"Fields cannot be updated: {', '.join(unknown)}")
+    if not body:
+        return error_response(400, f"Nothing to update; allowed fields: {', '.join(updatable_fields)}")
+    for field in sorted(body):
+        error = invalid_value(field, body[field])
+        if error:
+            return error_response(400, error)
+
+    # A sharded user's policy is in its shard or, until migrated, in the userId partition
+    for key in policy_keys(user_id, insurance_id):
+        try:
+            item = update_policy(table_name, key, body, version)
+            break
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if 'Item' in e.response:
+                current = e.response['Item'].get('version', {'N': '0'})['N']
+                return json_response(409, {
+                    'error': 'Policy was changed by another request; reload it and retry',
+                    'currentVersion': int(current)
+                })
+    else:
+        return error_response(404, 'Policy not found')
+
+    if on_updated:
+        on_updated(item)
+
+    changed = {field: item[field] for field in body}
+    return json_response(200, {'insuranceId': insurance_id, 'version': item['version'], **changed})
+
+# One conditional UpdateItem: set the given fields and bump the version if it still matches
+def update_policy(table_name, key, changes, expected_version):
+    names = {'#version': 'version'}
+    values = {':expected': expected_version, ':one': 1, ':zero': 0}
+    assignments = ['#version = if_not_exists(#version, :zero) + :one']
+    for position, (field, value) in enumerate(sorted(changes.items())):
+        names[f'#f{position}'] = field
+        values[f':v{position}'] = value
+        assignments.append(f'#f{position} = :v{position}')
+
+    condition = 'attribute_exists(insuranceId) AND #version = :expected'
+    if expected_version == 0:
+        condition = 'attribute_exists(insuranceId) AND (attribute_not_exists(#version) OR #version = :expected)'
+
+    response = get_table(table_name).update_item(
+        Key=key,
+        UpdateExpression='SET ' + ', '.join(assignments),
+        ConditionExpression=condition,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_NEW',
+        ReturnValuesOnConditionCheckFailure='ALL_OLD'
+    )
+    return response['Attributes']
@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from botocore.exceptions import ClientError
+from dynamodb_batch import batch_get
+from http_responses import error_response, json_response
+from metrics import instrumented
+from pagination import decode_next_token, encode_next_token, parse_limit
+from policy_summary import KINDS, SUMMARY_READS_ENABLED, SUMMARY_TABLE, complete_summary, is_current, parse_date, summary_policies
+from retries import with_deadline
+from sharding import query_user_items, query_user_page
+from structured_log import get_logger
+
+# A user's vehicle and travel policies in one listing, so a page showing both needs one request
+# instead of GET /vehicle followed by GET /travel-policies. The tables are queried at the same
+# time, so a page takes about as long as the slower of the two queries.
+#
+#   GET /portfolio?userId=...&limit=...&nextToken=...
+#   {"policies": [{"kind": "vehicle" | "travel", "insuranceId", ...}], "nextToken": ...,
+#    "totals": {"activeCount", "expiredCount", "vehicleCount", "travelCount", "totalPrice", "nextExpiry"}}
+#
+# Both kinds are merged in insuranceId order, the order each table returns them in. nextToken
+# records how far each kind has been read ({kind: last insuranceId returned, or null}; finished
+# kinds are left out), and every page reads up to `limit` policies of each unfinished kind and
+# returns the lowest `limit` of them.
+#
+# totals cover the whole portfolio and are only on the first page. vehicleCount, travelCount,
+# totalPrice and nextExpiry are over active policies; a policy past its expiry date counts as
+# expired even before the expiry sweep has marked it. They come from the page itself when it
+# holds every policy, from the policy summaries when summary reads are on (read in the same
+# round trip as the page), and otherwise from a second, projected read of both tables.
+
+# The fields the vehicle and travel listings return
+POLICY_FIELDS = {kind: config['fields'] + ['policyStatus'] for kind, config in KINDS.items()}
+
+# What the totals need when they have to be read separately
+TOTALS_FIELDS = {kind: ['insuranceId', 'price', config['expiry_field'], 'policyStatus'] for kind, config in KINDS.items()}
+
+log = get_logger('portfolio')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    query_params = event.get('queryStringParameters') or {}
+    user_id = (query_params.get('userId') or '').strip()
+    if not user_id:
+        return error_response(400, 'Missing required parameter: userId')
+
+    try:
+        limit = parse_limit(query_params.get('limit'))
+        cursor = parse_cursor(query_params.get('nextToken'))
+    except ValueError as e:
+        return error_response(400, str(e))
+
+    try:
+        return json_response(200, get_portfolio_page(user_id, limit, cursor))
+    except ClientError as e:
+        log.error('query_failed', userId=user_id, error=e.response['Error']['Message'])
+        return error_response(500, 'An error occurred while retrieving policies.')
+
+# {kind: last insuranceId or None}, or None for the first page
+def parse_cursor(token):
+    cursor = decode_next_token(token)
+    if cursor is None:
+        return None
+    if not set(cursor) <= set(KINDS) or not all(after is None or isinstance(after, str) for after in cursor.values()):
+        raise ValueError('Invalid nextToken')
+    return cursor
+
+def get_portfolio_page(user_id, limit, cursor=None):
+    first_page = cursor is None
+    if first_page:
+        cursor = {kind: None for kind in KINDS}
+
+    with ThreadPoolExecutor(max_workers=len(KINDS) + 1) as executor:
+        futures = {
+            kind: executor.submit(query_kind_page, kind, user_id, limit, after)
+            for kind, after in cursor.items()
+        }
+        summaries = executor.submit(get_summaries, user_id) if first_page and SUMMARY_READS_ENABLED else None
+        pages = {kind: future.result() for kind, future in futures.items()}
+        summaries = summaries.result() if summaries else None
+
+    entries = sorted(
+        ((item['insuranceId'], kind, item) for kind, page in pages.items() for item in page['Items']),
+        key=lambda entry: entry[0]
+    )[:limit]
+
+    # A kind is finished once everything it has left was returned
+    next_cursor = {}
+    for kind, page in pages.items():
+        returned = [insurance_id for insurance_id, entry_kind, _ in entries if entry_kind == kind]
+        if len(returned) < len(page['Items']) or 'LastEvaluatedKey' in page:
+            next_cursor[kind] = returned[-1] if returned else cursor[kind]
+
+    # A policy past its expiry date is listed as expired even before the sweep has marked it,
+    # the same way the totals count it
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    body = {
+        'policies': [
+            {'kind': kind, **item, 'policyStatus': 'active' if is_current(kind, item, today) else 'expired'}
+            for _, kind, item in entries
+        ],
+        'nextToken': encode_next_token(next_cursor)
+    }
+    if first_page:
+        totals = None
+        if not next_cursor:
+            totals = policy_totals({kind: page['Items'] for kind, page in pages.items()})
+        elif summaries is not None:
+            totals = summary_totals(summaries)
+        if totals is None:
+            totals = policy_totals(read_totals_fields(user_id))
+        body['totals'] = totals
+    return body
+
+def query_kind_page(kind, user_id, limit, after):
+    start_key = {'userId': user_id, 'insuranceId': after} if after else None
+    return query_user_page(KINDS[kind]['table'], user_id, limit, start_key, POLICY_FIELDS[kind])
+
+# {kind: summary or None}, both in one BatchGetItem
+def get_summaries(user_id):
+    summaries = batch_get(SUMMARY_TABLE, [{'userId': user_id, 'kind': kind} for kind in KINDS])
+    return {
+        kind: complete_summary(next((summary for summary in summaries if summary['kind'] == kind), None))
+        for kind in KINDS
+    }
+
+# Every policy of the user with only the fields the totals need, both kinds at once
+def read_totals_fields(user_id):
+    with ThreadPoolExecutor(max_workers=len(KINDS)) as executor:
+        futures = {
+            kind: executor.submit(query_user_items, config['table'], user_id, TOTALS_FIELDS[kind])
+            for kind, config in KINDS.items()
+        }
+        return {kind: future.result() for kind, future in futures.items()}
+
+def policy_totals(policies_by_kind):
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    totals = {'activeCount': 0, 'expiredCount': 0}
+    price = 0
+    expiries = []
+    for kind, policies in policies_by_kind.items():
+        active = [policy for policy in policies if is_current(kind, policy, today)]
+        totals[f'{kind}Count'] = len(active)
+        totals['activeCount'] += len(active)
+        totals['expiredCount'] += len(policies) - len(active)
+        price += sum(filter(None, (parse_price(policy.get('price')) for policy in active)))
+        expiries.extend(parse_date(policy.get(KINDS[kind]['expiry_field'])) for policy in active)
+    expiries = sorted(expiry for expiry in expiries if expiry)
+    return dict(totals, totalPrice=price, nextExpiry=expiries[0] if expiries else None)
+
+# Prices are stored as numbers, or as strings like "300.00" by clients that format them first.
+# Anything that is not a finite number is left out of totalPrice.
+def parse_price(value):
+    try:
+        price = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return price if price.is_finite() else None
+
+# Totals from the summaries, or None if either cannot be used
+def summary_totals(summaries):
+    if any(summary is None for summary in summaries.values()):
+        return None
+    return policy_totals({kind: summary_policies(summary) for kind, summary in summaries.items()})
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Measures how long each handler module takes to import in a fresh interpreter, which is
+# the part of a Lambda cold start under our control. Uses `python -X importtime` and groups
+# the self time of every imported module by top-level package.
+#
+#   python profile_imports.py            report median import time per handler
+#   python profile_imports.py --check    also fail if a handler exceeds import_budgets.json
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGETS_FILE = os.path.join(BACKEND_DIR, "import_budgets.json")
+
+HANDLERS = [
+    "GetTravelInsuranceStatus.py",
+    "GetVehicleInsuranceStatus.py",
+    "GetPolicyPortfolio.py",
+    "add-insurance-api.py",
+    "add-travel-insurance-api.py",
+    "cancel-insurance-function.py",
+    "cancel-travel-insurance.py",
+    "expiry_sweep.py",
+    "policy_summary.py",
+    "vehicle-auth-lambda.py",
+    "router.py",
+]
+
+# Handler file names contain hyphens, so they are loaded by path like the Lambda runtime does.
+# The marker separates interpreter start-up imports from the handler's own.
+LOADER = """
+import importlib.util, sys, time
+sys.path.insert(0, {backend_dir!r})
+sys.stderr.write("--- handler import ---\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("handler", {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print((time.perf_counter() - start) * 1000)
+"""
+
+def profile_handler(filename):
+    code = LOADER.format(backend_dir=BACKEND_DIR, path=os.path.join(BACKEND_DIR, filename))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True
+    )
+    total_ms = float(result.stdout.strip().splitlines()[-1])
+
+    per_package_us = {}
+    stderr = result.stderr.split("--- handler import ---", 1)[-1]
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        per_package_us[package] = per_package_us.get(package, 0) + int(self_us)
+
+    return total_ms, per_package_us
+
+# Median over several fresh interpreters to smooth out disk cache and scheduling noise
+def profile_all(runs):
+    report = {}
+    for filename in HANDLERS:
+        totals = []
+        packages = {}
+        for _ in range(runs):
+            total_ms, per_package_us = profile_handler(filename)
+            totals.append(total_ms)
+            for package, self_us in per_package_us.items():
+                packages.setdefault(package, []).append(self_us)
+        report[filename] = {
+            "import_ms": statistics.median(totals),
+            "packages_ms": {
+                package: statistics.median(values) / 1000
+                for package, values in packages.items()
+            },
+        }
+    return report
+
+def load_budgets():
+    with open(BUDGETS_FILE) as f:
+        return json.load(f)
+
+# Returns a list of human-readable budget violations, empty when every handler is in budget
+def check_budgets(report, budgets):
+    violations = []
+    for filename, result in report.items():
+        budget = budgets.get(filename, budgets["default"])
+        if result["import_ms"] > budget:
+            violations.append(f"{filename}: {result['import_ms']:.1f} ms exceeds budget of {budget} ms")
+    return violations
+
+def print_report(report, top):
+    for filename, result in report.items():
+        print(f"{filename}: {result['import_ms']:.1f} ms")
+        heaviest = sorted(result["packages_ms"].items(), key=lambda p: p[1], reverse=True)[:top]
+        for package, self_ms in heaviest:
+            print(f"    {package:<24} {self_ms:8.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile Backend handler import (cold start) time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per handler")
+    parser.add_argument("--top", type=int, default=5, help="packages to list per handler")
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if a budget is exceeded")
+    args = parser.parse_args()
+
+    report = profile_all(args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
+
+    if args.check:
+        violations = check_budgets(report, load_budgets())
+        for violation in violations:
+            print(f"FAIL {violation}")
+        sys.exit(1 if violations else 0)
@@ -0,0 +1,203 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from functools import wraps
+import metrics
+from structured_log import get_logger
+
+# Retries for every AWS call the handlers make, installed on each client by aws_clients through
+# botocore's needs-retry and before-send events (botocore's own retries are turned off).
+#
+# - Throttling (ProvisionedThroughputExceededException, TooManyRequestsException, ...), 5xx and
+#   connection errors are retried with full-jitter exponential backoff.
+# - A call stops retrying once the next attempt would start within AWS_RETRY_TIME_RESERVE_MS of
+#   the Lambda deadline, so the handler still has time to answer. Decorate the lambda_handler with
+#   @with_deadline to take the deadline from its context; without it only the attempt limit applies.
+# - Each service has a client-side token bucket that is inactive until the service throttles. A
+#   throttle cuts the allowed send rate, then the rate creeps back up while calls succeed and the
+#   limit is lifted once it is well above where throttling started. Callers wait for a token
+#   instead of sending requests that would only be throttled again.
+
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+
+# Per-operation attempt limits, e.g. "InitiateAuth=3,Query=8"
+OPERATION_MAX_ATTEMPTS = {
+    name.strip(): int(attempts)
+    for name, attempts in (entry.split("=") for entry in os.getenv("AWS_OPERATION_MAX_ATTEMPTS", "").split(",") if entry)
+}
+
+RETRY_BASE_DELAY = float(os.getenv("AWS_RETRY_BASE_DELAY", "0.05"))
+RETRY_MAX_DELAY = float(os.getenv("AWS_RETRY_MAX_DELAY", "1.0"))
+RETRY_TIME_RESERVE = float(os.getenv("AWS_RETRY_TIME_RESERVE_MS", "1000")) / 1000
+
+RATE_LIMIT_ENABLED = os.getenv("AWS_RATE_LIMIT", "true").lower() != "false"
+# Lowest send rate (per second) the bucket goes down to
+MIN_RATE = 1.0
+# Share of the rate kept after a throttle; throttles within RATE_DECREASE_INTERVAL seconds of a
+# cut count as one
+RATE_DECREASE = 0.7
+RATE_DECREASE_INTERVAL = 0.1
+# Share of the rate where throttling started that is regained per second without throttles
+RATE_RECOVERY = 0.1
+# The limit is lifted once the rate is this far above where throttling started
+RATE_LIFT = 1.5
+
+THROTTLING_CODES = {
+    "ProvisionedThroughputExceededException", "ThrottlingException", "Throttling", "RequestLimitExceeded",
+    "TooManyRequestsException", "RequestThrottled", "RequestThrottledException",
+}
+TRANSIENT_CODES = {"InternalServerError", "InternalFailure", "InternalErrorException", "ServiceUnavailable"}
+TRANSIENT_STATUS_CODES = {500, 502, 503, 504}
+
+log = get_logger("retries")
+
+_lock = threading.Lock()
+_services = {}
+_deadline = None
+
+# Seconds left before the current invocation's deadline, or None if there is none
+def remaining_time():
+    deadline = _deadline
+    return None if deadline is None else deadline - time.monotonic()
+
+# Take the deadline of each invocation from its Lambda context. Nested handlers (the router
+# calling a module's handler) see the same context, so the inner one sets the same deadline.
+def with_deadline(handler):
+    @wraps(handler)
+    def wrapper(event, context):
+        global _deadline
+        previous = _deadline
+        get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+        if get_remaining_time is not None:
+            _deadline = time.monotonic() + get_remaining_time() / 1000
+        try:
+            return handler(event, context)
+        finally:
+            _deadline = previous
+    return wrapper
+
+# "throttled", "transient" or None for a botocore response (http_response, parsed) or exception
+def classify(response, caught_exception):
+    if caught_exception is not None:
+        from botocore.exceptions import ConnectionError, HTTPClientError
+
+        return "transient" if isinstance(caught_exception, (ConnectionError, HTTPClientError)) else None
+    if response is None:
+        return None
+    http_response, parsed = response
+    code = parsed.get("Error", {}).get("Code")
+    if code in THROTTLING_CODES:
+        return "throttled"
+    if code in TRANSIENT_CODES or http_response.status_code in TRANSIENT_STATUS_CODES:
+        return "transient"
+    return None
+
+# Full jitter: anywhere between 0 and the exponential cap, so retries of a burst spread out
+def backoff_delay(attempts):
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1)))
+
+class TokenBucket:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Sends per second, None while unlimited
+        self.rate = None
+        self.start_rate = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.rate_updated = self.updated
+        # Send times over the last second, to know the rate when throttling starts
+        self.sent = deque()
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Take a token, waiting for it if the bucket is empty, but never past the retry reserve
+    def acquire(self, remaining=None):
+        with self.lock:
+            now = time.monotonic()
+            self.sent.append(now)
+            while self.sent[0] < now - 1:
+                self.sent.popleft()
+            if self.rate is None:
+                return 0.0
+            self._refill(now)
+            # Tokens go negative while callers are waiting; each waits for its own token
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if remaining is not None:
+            wait = min(wait, max(0.0, remaining - RETRY_TIME_RESERVE))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.rate is None:
+                self.start_rate = max(MIN_RATE, float(len(self.sent)))
+                self.rate = self.start_rate
+                self.tokens = 0.0
+                self.updated = now
+            elif now - self.rate_updated < RATE_DECREASE_INTERVAL:
+                # Requests that were already in flight when the rate was cut
+                return
+            self._refill(now)
+            self.rate = max(MIN_RATE, self.rate * RATE_DECREASE)
+            self.rate_updated = now
+
+    def on_success(self):
+        if self.rate is None:
+            return
+        with self.lock:
+            if self.rate is None:
+                return
+            now = time.monotonic()
+            self._refill(now)
+            self.rate += self.start_rate * RATE_RECOVERY * (now - self.rate_updated)
+            self.rate_updated = now
+            if self.rate >= self.start_rate * RATE_LIFT:
+                self.rate = None
+
+# Retry state shared by every client of one service
+class ServiceRetries:
+    def __init__(self, service):
+        self.service = service
+        self.bucket = TokenBucket()
+
+    # before-send handler: runs before every attempt
+    def before_send(self, **kwargs):
+        if RATE_LIMIT_ENABLED:
+            self.bucket.acquire(remaining_time())
+
+    # needs-retry handler: seconds to sleep before the next attempt, or None to stop
+    def needs_retry(self, response=None, operation=None, attempts=1, caught_exception=None, **kwargs):
+        kind = classify(response, caught_exception)
+        if kind is None:
+            self.bucket.on_success()
+            return None
+
+        name = f"{self.service}.{operation.name}"
+        if kind == "throttled":
+            self.bucket.on_throttle()
+            metrics.record(f"{name}.Throttles", 1, unit="Count")
+
+        if attempts >= OPERATION_MAX_ATTEMPTS.get(operation.name, AWS_MAX_ATTEMPTS):
+            return None
+        delay = backoff_delay(attempts)
+        remaining = remaining_time()
+        if remaining is not None and remaining - delay < RETRY_TIME_RESERVE:
+            log.warning("retry_abandoned", operation=name, attempts=attempts, remainingMs=int(remaining * 1000))
+            return None
+        metrics.record(f"{name}.Retries", 1, unit="Count")
+        return delay
+
+def for_service(service):
+    retries = _services.get(service)
+    if retries is None:
+        with _lock:
+            retries = _services.setdefault(service, ServiceRetries(service))
+    return retries
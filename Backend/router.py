@@ -0,0 +1,60 @@
+import portfolio
+import travel_cancel
+import travel_policies
+import travel_status
+import user_auth
+import vehicle_cancel
+import vehicle_policies
+import vehicle_status
+from http_responses import PREFLIGHT_RESPONSE, error_response
+from metrics import instrumented
+from retries import with_deadline
+from structured_log import get_logger
+
+# Single entry point for every Backend endpoint, so one function (and its warm containers) can
+# serve all traffic. Routes map (HTTP method, API Gateway resource path) to the same
+# lambda_handler functions the standalone Lambdas use.
+
+ROUTES = {
+    ("GET", "/vehicle"): vehicle_policies.lambda_handler,
+    ("POST", "/vehicle"): vehicle_policies.lambda_handler,
+    ("PATCH", "/vehicle"): vehicle_policies.lambda_handler,
+    ("GET", "/vehicle-status"): vehicle_status.lambda_handler,
+    ("DELETE", "/delete-car-insurance"): vehicle_cancel.lambda_handler,
+    ("POST", "/travel"): travel_policies.lambda_handler,
+    ("PATCH", "/travel"): travel_policies.lambda_handler,
+    ("GET", "/travel-policies"): travel_status.lambda_handler,
+    ("DELETE", "/cancel-insurance-api"): travel_cancel.lambda_handler,
+    ("GET", "/portfolio"): portfolio.lambda_handler,
+    ("POST", "/auth"): user_auth.lambda_handler,
+}
+
+ROUTE_PATHS = {path for _, path in ROUTES}
+
+log = get_logger("router")
+
+def get_route_path(event):
+    path = event.get("resource") or event.get("path") or "/"
+    return path.rstrip("/") or "/"
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    method = event.get("httpMethod", "")
+    path = get_route_path(event)
+
+    # Handle preflight request (CORS) for every route
+    if method == "OPTIONS":
+        return PREFLIGHT_RESPONSE
+
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if path in ROUTE_PATHS:
+            return error_response(405, "Method not allowed")
+        return error_response(404, f"No route for {method} {path}")
+
+    try:
+        return handler(event, context)
+    except Exception as e:
+        log.error("unhandled_error", method=method, path=path, error=str(e))
+        return error_response(500, "Internal server error")
@@ -0,0 +1,126 @@
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from aws_clients import get_resource, get_table
+
+# Write sharding for tenants with very many policies under one userId (fleet operators). A
+# DynamoDB partition accepts about 1000 write units per second, so one userId partition caps how
+# fast such a tenant can add policies. For the users listed in SHARDED_USERS, policies are stored
+# under the partition key "<userId>#<shard>", with the shard derived from the insuranceId, and
+# reads query every shard in parallel and merge the results.
+#
+#   SHARDED_USERS="fleet-operator-1=16,fleet-operator-2=8"
+#
+# Reads of a sharded user always include the plain userId partition too, so policies written
+# before the user was sharded stay visible and point operations fall back to it. To shard a user,
+# add them to SHARDED_USERS on every function, then move their existing policies into the shards
+# with migrate-sharded-users.py. To unshard, run the migration with --unshard first, then remove
+# the user from SHARDED_USERS. The shard count of a user cannot be changed in place; unshard first.
+#
+# userIds ending in "#<digits>" are reserved for shard keys.
+
+SHARDED_USERS = {
+    user_id.strip(): int(shards)
+    for user_id, shards in (entry.rsplit('=', 1) for entry in os.getenv('SHARDED_USERS', '').split(',') if entry)
+}
+
+# Concurrent queries per scatter-gather read
+SHARD_READ_WORKERS = int(os.getenv('SHARD_READ_WORKERS', '8'))
+
+def shard_count(user_id):
+    return SHARDED_USERS.get(user_id, 0)
+
+# The partition key a new policy of this user is stored under
+def partition_key(user_id, insurance_id):
+    shards = shard_count(user_id)
+    if not shards:
+        return user_id
+    return f'{user_id}#{zlib.crc32(insurance_id.encode()) % shards}'
+
+# Every partition key that may hold this user's policies
+def user_partitions(user_id):
+    return [user_id] + [f'{user_id}#{shard}' for shard in range(shard_count(user_id))]
+
+# Keys to try, in order, for a point operation on one policy
+def policy_keys(user_id, insurance_id):
+    keys = [{'userId': partition_key(user_id, insurance_id), 'insuranceId': insurance_id}]
+    if keys[0]['userId'] != user_id:
+        keys.append({'userId': user_id, 'insuranceId': insurance_id})
+    return keys
+
+# Delete one policy, trying each of its possible keys. Returns the DeleteItem response, or None
+# if the policy does not exist.
+def delete_policy(table_name, user_id, insurance_id, **kwargs):
+    for key in policy_keys(user_id, insurance_id):
+        try:
+            return get_table(table_name).delete_item(Key=key, ConditionExpression='attribute_exists(insuranceId)', **kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    return None
+
+# The userId a stored partition key belongs to
+def owner_user_id(partition):
+    user_id, separator, shard = partition.rpartition('#')
+    if separator and shard.isdigit() and user_id in SHARDED_USERS:
+        return user_id
+    return partition
+
+# One page of a user's policies in insuranceId order, like a single query of the userId partition:
+# {'Items': [...], 'LastEvaluatedKey': {'userId', 'insuranceId'} when there may be more}.
+# Items keep their stored partition key. For a sharded user every partition is queried for up to
+# `limit` policies after the start key's insuranceId, and the lowest `limit` of them are returned,
+# so a page can read up to (shards + 1) * limit items.
+def query_user_page(table_name, user_id, limit, start_key=None, projection=None):
+    partitions = user_partitions(user_id)
+    if len(partitions) == 1:
+        return query_partition(table_name, user_id, limit, start_key, projection)
+
+    after = start_key['insuranceId'] if start_key else None
+
+    def query_shard(partition):
+        return query_partition(table_name, partition, limit, None, projection, after=after)
+
+    with ThreadPoolExecutor(max_workers=min(SHARD_READ_WORKERS, len(partitions))) as executor:
+        responses = list(executor.map(query_shard, partitions))
+
+    items = sorted((item for response in responses for item in response['Items']), key=lambda item: item['insuranceId'])
+    page = {'Items': items[:limit], 'Count': min(limit, len(items))}
+    if page['Items'] and (len(items) > limit or any('LastEvaluatedKey' in response for response in responses)):
+        page['LastEvaluatedKey'] = {'userId': user_id, 'insuranceId': page['Items'][-1]['insuranceId']}
+    return page
+
+# Every policy of a user, across all of their partitions
+def query_user_items(table_name, user_id, projection=None):
+    items = []
+    for partition in user_partitions(user_id):
+        start_key = None
+        while True:
+            response = query_partition(table_name, partition, None, start_key, projection)
+            items.extend(response['Items'])
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                break
+    return items
+
+# Query one partition through the resource's client, which is safe to share between threads
+def query_partition(table_name, partition, limit, start_key, projection, after=None):
+    query_kwargs = {
+        'TableName': table_name,
+        'KeyConditionExpression': '#userId = :partition',
+        'ExpressionAttributeNames': {'#userId': 'userId'},
+        'ExpressionAttributeValues': {':partition': partition}
+    }
+    if after is not None:
+        query_kwargs['KeyConditionExpression'] += ' AND #insuranceId > :after'
+        query_kwargs['ExpressionAttributeNames']['#insuranceId'] = 'insuranceId'
+        query_kwargs['ExpressionAttributeValues'][':after'] = after
+    if projection:
+        query_kwargs['ProjectionExpression'] = ', '.join(f'#{field}' for field in projection)
+        query_kwargs['ExpressionAttributeNames'].update({f'#{field}': field for field in projection})
+    if limit:
+        query_kwargs['Limit'] = limit
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    return get_resource('dynamodb').meta.client.query(**query_kwargs)
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from structured_log import get_logger
+
+# Read-through cache for the status endpoints (GetVehicleInsuranceStatus, GetTravelInsuranceStatus).
+#
+# The default backend lives in the Lambda container, so it only sees invalidations made by the
+# same function; entries written by other functions age out after STATUS_CACHE_TTL seconds.
+# Set STATUS_CACHE_REDIS_URL to share one cache (and its invalidations) across all functions.
+#
+# Values must be JSON-serializable. None is stored as a negative ("inactive") result with its own,
+# shorter TTL; a lookup that finds nothing returns MISS.
+
+MISS = object()
+
+log = get_logger("status_cache")
+
+DEFAULT_TTL = float(os.getenv("STATUS_CACHE_TTL", "30"))
+DEFAULT_NEGATIVE_TTL = float(os.getenv("STATUS_CACHE_NEGATIVE_TTL", "10"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("STATUS_CACHE_MAX_ENTRIES", "1024"))
+
+def vehicle_status_key(registration_number):
+    return f"vehicle:registration:{registration_number}"
+
+def travel_status_key(user_id):
+    return f"travel:user:{user_id}"
+
+# In-process LRU cache with per-entry expiry, bounded to max_entries
+class LocalCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Cache backed by any client with the redis-py get/set/delete interface. Cache errors are
+# logged and treated as misses so an unavailable cache never fails a request.
+class RedisCache:
+    def __init__(self, client, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, prefix="status:"):
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            log.warning("cache_get_failed", error=str(e))
+            return MISS
+        if raw is None:
+            return MISS
+        return json.loads(raw)
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is None else self.ttl
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+        except Exception as e:
+            log.warning("cache_set_failed", error=str(e))
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self.client.delete(*[self.prefix + key for key in keys])
+        except Exception as e:
+            log.warning("cache_delete_failed", error=str(e))
+
+_cache = None
+
+def get_status_cache():
+    global _cache
+    if _cache is None:
+        redis_url = os.getenv("STATUS_CACHE_REDIS_URL")
+        if redis_url:
+            import redis
+
+            _cache = RedisCache(redis.Redis.from_url(redis_url, socket_timeout=0.2))
+        else:
+            _cache = LocalCache()
+    return _cache
+
+# Replace the backend, e.g. with a RedisCache built around a specific client
+def set_status_cache(cache):
+    global _cache
+    _cache = cache
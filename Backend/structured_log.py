@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import random
+
+# Structured JSON logging for the Backend handlers.
+#
+#   log = get_logger("vehicle_policies")
+#   log.info("policy_created", insuranceId=insurance_id)
+#   log.debug("request", event=event)
+#
+# Nothing is serialized unless the level is enabled and the record survives sampling. Each level
+# can be sampled (LOG_SAMPLE_RATES="DEBUG=0.01,INFO=0.5"); sampled records carry "sampleRate" so
+# counts can be scaled back up. Field values are truncated to LOG_MAX_FIELD_LENGTH characters and
+# values under secret-looking keys (passwords, OTPs, tokens) are never written. A "body" string
+# (the raw request body of an API Gateway event) is parsed first so its fields are redacted the
+# same way, and replaced by its length when it is not JSON.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "512"))
+
+REDACTED = "[REDACTED]"
+SECRET_KEYS = {
+    "password", "new_password", "otp", "access_token", "accesstoken", "idtoken", "refreshtoken",
+    "authorization", "session", "secrethash", "confirmationcode",
+}
+
+def parse_sample_rates(value):
+    rates = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        level, _, rate = entry.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+# The Lambda runtime installs a root handler; add one when running elsewhere
+if not logging.root.handlers:
+    logging.basicConfig(format="%(message)s")
+
+def truncate(text):
+    if len(text) <= MAX_FIELD_LENGTH:
+        return text
+    return f"{text[:MAX_FIELD_LENGTH]}...[{len(text) - MAX_FIELD_LENGTH} more chars]"
+
+def redact(value, depth=0):
+    if depth > 8:
+        return "..."
+    if isinstance(value, dict):
+        return {key: redact(field_value(key, item), depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, depth + 1) for item in value]
+    if isinstance(value, str):
+        return truncate(value)
+    return value
+
+# What to log for a field: secrets are replaced, and a raw request body is parsed so the fields in
+# it are redacted too (or dropped when it is not JSON)
+def field_value(key, value):
+    key = str(key).lower()
+    if key in SECRET_KEYS:
+        return REDACTED
+    if key == "body" and isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return f"[{len(value)} chars, not JSON]"
+    return value
+
+# Strings and numbers are kept as they are; anything else is JSON-encoded, capped in size
+def format_field(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return truncate(value)
+    return truncate(json.dumps(redact(value), default=str))
+
+# Formats the record only when logging actually writes it out
+class _LazyRecord:
+    __slots__ = ("fields",)
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return json.dumps({
+            key: format_field(field_value(key, value)) for key, value in self.fields.items()
+        }, default=str)
+
+class StructuredLogger:
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.getLogger(f"backend.{name}")
+        self.logger.setLevel(LOG_LEVEL)
+
+    def log(self, level, message, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = SAMPLE_RATES.get(level, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+
+        record = {"level": logging.getLevelName(level), "logger": self.name, "message": message}
+        if rate < 1.0:
+            record["sampleRate"] = rate
+        record.update(fields)
+        self.logger.log(level, "%s", _LazyRecord(record))
+
+    def debug(self, message, **fields):
+        self.log(logging.DEBUG, message, **fields)
+
+    def info(self, message, **fields):
+        self.log(logging.INFO, message, **fields)
+
+    def warning(self, message, **fields):
+        self.log(logging.WARNING, message, **fields)
+
+    def error(self, message, **fields):
+        self.log(logging.ERROR, message, **fields)
+
+def get_logger(name):
+    return StructuredLogger(name)
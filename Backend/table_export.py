@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_resource
+from json_encoding import dumps
+from pagination import decode_next_token, encode_next_token
+
+# Full dumps of the policy tables for analytics and reconciliation, using a parallel scan.
+# Every segment is read by its own thread, one page at a time, and written to its own file, so
+# memory stays at about one page per segment whatever the table size.
+#
+#   python table_export.py VehicleInsuranceData TravelInsuranceData --out exports --segments 16
+#
+# Output goes to <out>/<table>/segment-NNNN.<ext>; checkpoint.json next to it records, after
+# every page, where each segment stopped and how many bytes of its file are complete. Running the
+# same command again resumes unfinished segments (pass --restart to start over).
+#
+# Formats:
+#   ndjson    one item per line
+#   columnar  one line per page: {"count": n, "columns": {"attr": [values...]}}, with null where
+#             an item lacks the attribute; a dependency-free stand-in for Parquet row groups
+
+DEFAULT_TABLES = ['VehicleInsuranceData', 'TravelInsuranceData']
+DEFAULT_SEGMENTS = 8
+EXTENSIONS = {'ndjson': 'ndjson', 'columnar': 'columns.ndjson'}
+
+def encode_ndjson_page(items):
+    return ''.join(dumps(item) + '\n' for item in items)
+
+def encode_columnar_page(items):
+    names = sorted({name for item in items for name in item})
+    columns = {name: [item.get(name) for item in items] for name in names}
+    return dumps({'count': len(items), 'columns': columns}) + '\n'
+
+ENCODERS = {'ndjson': encode_ndjson_page, 'columnar': encode_columnar_page}
+
+class Checkpoint:
+    def __init__(self, path, total_segments, file_format):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {
+            'totalSegments': total_segments,
+            'format': file_format,
+            'segments': {str(segment): {'done': False, 'nextToken': None, 'items': 0, 'bytes': 0}
+                         for segment in range(total_segments)}
+        }
+
+    # Returns a Checkpoint continuing the saved one, or None if there is none to continue
+    @classmethod
+    def load(cls, path, total_segments, file_format):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        if state['totalSegments'] != total_segments or state['format'] != file_format:
+            raise ValueError(
+                f"{path} was written with {state['totalSegments']} {state['format']} segments; "
+                "use the same settings or --restart"
+            )
+        checkpoint = cls(path, total_segments, file_format)
+        checkpoint.state = state
+        return checkpoint
+
+    def segment(self, segment):
+        return self.state['segments'][str(segment)]
+
+    def update(self, segment, **fields):
+        with self.lock:
+            self.state['segments'][str(segment)].update(fields)
+            self.save()
+
+    # Write to a temporary file first so a crash never leaves a half-written checkpoint
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.state, f)
+        os.replace(self.path + '.tmp', self.path)
+
+def export_segment(table_name, segment, total_segments, path, checkpoint, encode, page_size=None):
+    progress = checkpoint.segment(segment)
+    if progress['done']:
+        return progress['items']
+
+    scan_kwargs = {'TableName': table_name, 'Segment': segment, 'TotalSegments': total_segments}
+    if page_size:
+        scan_kwargs['Limit'] = page_size
+    start_key = decode_next_token(progress['nextToken'])
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+
+    # Every segment runs in its own thread: boto3 resources are not thread-safe, clients are
+    client = get_resource('dynamodb').meta.client
+    items = progress['items']
+    with open(path, 'ab') as f:
+        # Drop anything written after the last checkpoint; those items are read again
+        f.truncate(progress['bytes'])
+        while True:
+            response = client.scan(**scan_kwargs)
+            f.write(encode(response['Items']).encode() if response['Items'] else b'')
+            f.flush()
+            items += len(response['Items'])
+
+            last_key = response.get('LastEvaluatedKey')
+            checkpoint.update(segment, done=last_key is None, nextToken=encode_next_token(last_key),
+                              items=items, bytes=f.tell())
+            if last_key is None:
+                return items
+            scan_kwargs['ExclusiveStartKey'] = last_key
+
+def export_table(table_name, out_dir, total_segments=DEFAULT_SEGMENTS, file_format='ndjson',
+                 page_size=None, restart=False):
+    table_dir = os.path.join(out_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+    checkpoint_path = os.path.join(table_dir, 'checkpoint.json')
+
+    checkpoint = None if restart else Checkpoint.load(checkpoint_path, total_segments, file_format)
+    if checkpoint is None:
+        checkpoint = Checkpoint(checkpoint_path, total_segments, file_format)
+        checkpoint.save()
+
+    encode = ENCODERS[file_format]
+    paths = [
+        os.path.join(table_dir, f'segment-{segment:04d}.{EXTENSIONS[file_format]}')
+        for segment in range(total_segments)
+    ]
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        counts = list(executor.map(
+            lambda segment: export_segment(
+                table_name, segment, total_segments, paths[segment], checkpoint, encode, page_size
+            ),
+            range(total_segments)
+        ))
+    return sum(counts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export DynamoDB tables with a parallel scan")
+    parser.add_argument("tables", nargs="*", default=DEFAULT_TABLES)
+    parser.add_argument("--out", default="exports", help="output directory")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="scan segments (threads) per table")
+    parser.add_argument("--format", choices=sorted(ENCODERS), default="ndjson")
+    parser.add_argument("--page-size", type=int, help="items per scan request (default: 1 MB pages)")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and export from scratch")
+    args = parser.parse_args()
+
+    for table_name in args.tables:
+        start = time.perf_counter()
+        count = export_table(table_name, args.out, args.segments, args.format, args.page_size, args.restart)
+        elapsed = time.perf_counter() - start
+        print(f"{table_name}: {count} items in {elapsed:.1f} s ({count / max(elapsed, 1e-9):.0f} items/s)")
+
+if __name__ == "__main__":
+    main()
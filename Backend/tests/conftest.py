@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# Handler tests run against the in-process DynamoDB/Cognito stand-in (local_aws.py), set up the
+# same way the benchmark sets it up.
+#
+#   cd Backend && python -m pytest -q
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmark import BENCHMARK_ENV, CLIENT_ID, USER_POOL_ID, api_event, create_tables  # noqa: E402
+
+# Handlers read these at import time
+for name, value in BENCHMARK_ENV.items():
+    os.environ.setdefault(name, value)
+
+@pytest.fixture
+def aws():
+    import status_cache
+    from local_aws import LocalAWS
+
+    aws = LocalAWS()
+    create_tables(aws)
+    aws.install()
+    status_cache.set_status_cache(status_cache.LocalCache())
+    return aws
+
+# The stand-in with a Cognito user pool; keys are small and seeded so the fixture stays fast
+@pytest.fixture
+def cognito(aws):
+    pool = aws.create_user_pool(USER_POOL_ID, CLIENT_ID, key_seed=1, key_bits=1024)
+    aws.install()
+    return pool
+
+@pytest.fixture
+def call():
+    import router
+
+    def call(method, path, query=None, body=None, headers=None):
+        return router.lambda_handler(api_event(method, path, query, body, headers), None)
+    return call
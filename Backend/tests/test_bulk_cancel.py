@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import dynamodb_batch
+import router
+from benchmark import api_event
+from dynamodb_batch import MAX_BULK_CANCEL, parse_bulk_cancel_request
+
+@pytest.mark.parametrize("body, parsed", [
+    ({"userId": "user-1", "all": True}, ("user-1", None)),
+    ({"userId": "user-1", "insuranceIds": ["a", "b"]}, ("user-1", ["a", "b"])),
+    # "all" must be exactly true; anything else falls back to insuranceIds
+    ({"userId": "user-1", "all": "yes", "insuranceIds": ["a"]}, ("user-1", ["a"])),
+    ({"userId": "user-1", "insuranceIds": ["a"] * MAX_BULK_CANCEL}, ("user-1", ["a"] * MAX_BULK_CANCEL)),
+])
+def test_parse_bulk_cancel_request(body, parsed):
+    assert parse_bulk_cancel_request(body) == parsed
+
+@pytest.mark.parametrize("body, message", [
+    (["user-1"], "userId is required"),
+    ({"insuranceIds": ["a"]}, "userId is required"),
+    ({"userId": "", "all": True}, "userId is required"),
+    ({"userId": 42, "all": True}, "userId is required"),
+    ({"userId": "user-1"}, "non-empty list"),
+    ({"userId": "user-1", "all": 1}, "non-empty list"),
+    ({"userId": "user-1", "insuranceIds": []}, "non-empty list"),
+    ({"userId": "user-1", "insuranceIds": "a"}, "non-empty list"),
+    ({"userId": "user-1", "insuranceIds": ["a", ""]}, "non-empty list"),
+    ({"userId": "user-1", "insuranceIds": ["a", 7]}, "non-empty list"),
+    ({"userId": "user-1", "insuranceIds": ["a"] * (MAX_BULK_CANCEL + 1)}, f"At most {MAX_BULK_CANCEL}"),
+])
+def test_invalid_bulk_cancel_requests(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_bulk_cancel_request(body)
+
+# The stand-in leaves deletes of these policies unprocessed on every attempt, like a partition that
+# stays throttled
+@pytest.fixture
+def unprocessable(aws, monkeypatch):
+    policies = set()
+    client = aws.resource.meta.client
+    batch_write_item = client.batch_write_item
+
+    def throttled_batch_write_item(RequestItems, **kwargs):
+        kept, unprocessed = {}, {}
+        for table_name, requests in RequestItems.items():
+            for request in requests:
+                key = request.get("DeleteRequest", {}).get("Key", {})
+                target = unprocessed if key.get("insuranceId") in policies else kept
+                target.setdefault(table_name, []).append(request)
+        response = batch_write_item(RequestItems=kept, **kwargs) if kept else {"UnprocessedItems": {}}
+        for table_name, requests in unprocessed.items():
+            response["UnprocessedItems"].setdefault(table_name, []).extend(requests)
+        return response
+
+    monkeypatch.setattr(client, "batch_write_item", throttled_batch_write_item)
+    monkeypatch.setattr(dynamodb_batch, "_backoff", lambda attempt, base_delay: None)
+    return policies
+
+def bulk_cancel(call, path, **body):
+    response = call("DELETE", path, body=body)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
+
+def test_vehicle_bulk_cancel_reports_each_outcome(aws, call, unprocessable):
+    for number in ("A", "B", "C"):
+        assert call("POST", "/vehicle", body={"userId": "user-1", "registrationNumber": f"REG-{number}"})["statusCode"] == 200
+    ids = {item["registrationNumber"]: item["insuranceId"] for item in aws.table("VehicleInsuranceData").items.values()}
+    unprocessable.add(ids["REG-C"])
+
+    body = bulk_cancel(call, "/delete-car-insurance", userId="user-1",
+                       insuranceIds=[ids["REG-A"], "veh-missing", ids["REG-C"], ids["REG-B"]])
+    assert sorted(body["deleted"]) == sorted([ids["REG-A"], ids["REG-B"]])
+    assert body["notFound"] == ["veh-missing"]
+    assert body["failed"] == [ids["REG-C"]]
+
+    # Only the deleted policies give up their registration numbers
+    remaining = [item["insuranceId"] for item in aws.table("VehicleInsuranceData").items.values()]
+    assert remaining == [ids["REG-C"]]
+    assert [number for number, _ in aws.table("VehicleRegistrationLocks").items] == ["REG-C"]
+    assert call("POST", "/vehicle", body={"userId": "user-2", "registrationNumber": "REG-A"})["statusCode"] == 200
+    assert call("POST", "/vehicle", body={"userId": "user-2", "registrationNumber": "REG-C"})["statusCode"] == 409
+
+def test_travel_bulk_cancel_of_all_policies(aws, call, unprocessable):
+    trips = aws.table("TravelInsuranceData")
+    for index in range(30):
+        trips.put_item(Item={"userId": "user-1", "insuranceId": f"trip-{index:02d}"})
+    trips.put_item(Item={"userId": "user-2", "insuranceId": "trip-00"})
+    unprocessable.update({"trip-03", "trip-27"})
+
+    body = bulk_cancel(call, "/cancel-insurance-api", userId="user-1", all=True)
+    assert len(body["deleted"]) == 28
+    assert body["notFound"] == []
+    assert body["failed"] == ["trip-03", "trip-27"]
+    assert sorted(trips.items) == [("user-1", "trip-03"), ("user-1", "trip-27"), ("user-2", "trip-00")]
+
+def test_bulk_cancel_of_unknown_policies_only(aws, call):
+    body = bulk_cancel(call, "/cancel-insurance-api", userId="user-1", insuranceIds=["trip-1", "trip-1", "trip-2"])
+    assert body == {"deleted": [], "notFound": ["trip-1", "trip-2"], "failed": []}
+
+@pytest.mark.parametrize("path", ["/delete-car-insurance", "/cancel-insurance-api"])
+def test_invalid_bulk_cancel_is_a_400(aws, call, path):
+    assert call("DELETE", path, body={"userId": "user-1", "insuranceIds": []})["statusCode"] == 400
+
+@pytest.mark.parametrize("path", ["/delete-car-insurance", "/cancel-insurance-api"])
+@pytest.mark.parametrize("body", ["{oops", '{"userId": "user-1", "all": tru}', "\xff"])
+def test_malformed_json_is_a_400(aws, path, body):
+    event = api_event("DELETE", path)
+    event["body"] = body
+    response = router.lambda_handler(event, None)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"]) == {"error": "Body must be valid JSON"}
@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+
+from cognito_jwt import JWKSCache, TokenValidationError, verify_token
+from local_aws import LocalCognito, b64url
+
+USER_POOL_ID = "us-east-1_jwttest"
+CLIENT_ID = "jwt-client"
+
+# Two pools with their own locally generated keys; the second one stands in for an attacker's key
+@pytest.fixture(scope="module")
+def pool():
+    return LocalCognito(None, USER_POOL_ID, CLIENT_ID, key_seed=7, key_bits=1024)
+
+@pytest.fixture(scope="module")
+def other_pool():
+    return LocalCognito(None, USER_POOL_ID, CLIENT_ID, key_seed=8, key_bits=1024)
+
+def claims(pool, **overrides):
+    now = int(time.time())
+    return dict({"sub": "alice", "username": "alice", "iss": pool.issuer, "client_id": CLIENT_ID,
+                 "token_use": "access", "iat": now, "exp": now + 3600}, **overrides)
+
+def verify(pool, token):
+    return verify_token(token, JWKSCache("unused", fetch=pool.jwks), pool.issuer, CLIENT_ID)
+
+# A token with the given header and payload and a signature of the right length that is not valid
+def unsigned_token(header, payload):
+    encode = lambda value: b64url(json.dumps(value).encode())
+    return f"{encode(header)}.{encode(payload)}.{b64url(bytes(128))}"
+
+def test_valid_token(pool):
+    assert verify(pool, pool.sign(claims(pool)))["username"] == "alice"
+
+def test_signature_by_another_key(pool, other_pool):
+    with pytest.raises(TokenValidationError, match="Invalid signature"):
+        verify(pool, other_pool.sign(claims(pool)))
+
+def test_tampered_payload(pool):
+    header, _, signature = pool.sign(claims(pool)).split(".")
+    payload = b64url(json.dumps(claims(pool, username="mallory")).encode())
+    with pytest.raises(TokenValidationError, match="Invalid signature"):
+        verify(pool, f"{header}.{payload}.{signature}")
+
+def test_expired(pool):
+    now = int(time.time())
+    with pytest.raises(TokenValidationError, match="expired"):
+        verify(pool, pool.sign(claims(pool, iat=now - 7200, exp=now - 3600)))
+
+def test_wrong_issuer(pool):
+    with pytest.raises(TokenValidationError, match="issuer"):
+        verify(pool, pool.sign(claims(pool, iss="https://cognito-idp.us-east-1.amazonaws.com/us-east-1_other")))
+
+def test_wrong_audience(pool):
+    with pytest.raises(TokenValidationError, match="audience"):
+        verify(pool, pool.sign(claims(pool, client_id="other-client")))
+
+def test_unknown_kid(pool, other_pool):
+    other_pool.kid = "rotated-key"
+    try:
+        token = other_pool.sign(claims(pool))
+    finally:
+        other_pool.kid = "local-key"
+    with pytest.raises(TokenValidationError, match="Unknown signing key"):
+        verify(pool, token)
+
+@pytest.mark.parametrize("token", [
+    None,
+    42,
+    ["a", "b", "c"],
+    {"token": "x"},
+    "not-a-token",
+    "a.b",
+    "é.é.é",
+])
+def test_tokens_that_are_not_jwts(pool, token):
+    with pytest.raises(TokenValidationError, match="Malformed token"):
+        verify(pool, token)
+
+@pytest.mark.parametrize("header, payload", [
+    (["RS256"], {}),
+    ("RS256", {}),
+    ({"alg": "RS256", "kid": "local-key"}, ["alice"]),
+    ({"alg": "RS256", "kid": "local-key"}, None),
+])
+def test_header_and_claims_must_be_objects(pool, header, payload):
+    with pytest.raises(TokenValidationError, match="Malformed token"):
+        verify(pool, unsigned_token(header, payload))
+
+@pytest.mark.parametrize("kid", [None, ["local-key"], {"kid": "local-key"}, 1])
+def test_kid_must_be_a_string(pool, kid):
+    with pytest.raises(TokenValidationError, match="Unknown signing key"):
+        verify(pool, unsigned_token({"alg": "RS256", "kid": kid}, claims(pool)))
+
+def test_non_numeric_iat(pool):
+    with pytest.raises(TokenValidationError):
+        verify(pool, pool.sign(claims(pool, iat="yesterday")))
+
+# Through the handler, a token that is not a string is a 401, not a 500
+def test_validate_rejects_non_string_tokens(call, cognito):
+    for token in (["a.b.c"], {"alg": "RS256"}, 12345):
+        response = call("POST", "/auth", body={"action": "validate", "access_token": token})
+        assert response["statusCode"] == 401
@@ -0,0 +1,49 @@
+import json
+from datetime import datetime, timedelta
+
+import expiry_sweep
+
+def register(call, user_id, registration_number):
+    response = call("POST", "/vehicle", body={"userId": user_id, "registrationNumber": registration_number,
+                                             "make": "Toyota", "model": "Corolla", "price": 300})
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
+
+def vehicle_status(call, registration_number):
+    return json.loads(call("GET", "/vehicle-status", {"registrationNumber": registration_number})["body"])
+
+# Move a policy's expiry to yesterday, as if a year had passed
+def backdate(aws, user_id, registration_number):
+    yesterday = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d")
+    table = aws.table("VehicleInsuranceData")
+    for item in list(table.items.values()):
+        if item["userId"] == user_id and item["registrationNumber"] == registration_number:
+            table.update_item(Key={"userId": user_id, "insuranceId": item["insuranceId"]},
+                              UpdateExpression="SET expiryDate = :day, expiryBucket = :day",
+                              ExpressionAttributeValues={":day": yesterday})
+
+def test_sweep_expires_policies_and_frees_their_registration_numbers(aws, call):
+    register(call, "user-1", "SWEEP-1")
+    backdate(aws, "user-1", "SWEEP-1")
+
+    assert expiry_sweep.lambda_handler({}, None) == {"expired": 1}
+    item, = aws.table("VehicleInsuranceData").items.values()
+    assert item["policyStatus"] == "expired"
+    assert "expiryBucket" not in item
+    assert ("SWEEP-1", None) not in aws.table("VehicleRegistrationLocks").items
+
+    # Already swept: nothing left in the bucket
+    assert expiry_sweep.lambda_handler({}, None) == {"expired": 0}
+
+def test_status_of_a_vehicle_reinsured_after_its_policy_expired(aws, call):
+    register(call, "user-1", "SWEEP-2")
+    backdate(aws, "user-1", "SWEEP-2")
+    expiry_sweep.lambda_handler({}, None)
+    assert vehicle_status(call, "SWEEP-2") == {"status": "inactive"}
+
+    # The new policy is the one the status reports, whichever the index returns first
+    register(call, "user-2", "SWEEP-2")
+    for _ in range(2):
+        status = vehicle_status(call, "SWEEP-2")
+        assert status["status"] == "active"
+        assert status["expiryDate"] > datetime.utcnow().strftime("%Y-%m-%d")
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import time
+
+import idempotency
+import travel_policies
+
+TRIP = {"userId": "user-1", "username": "Customer", "tripTitle": "Trip", "startDate": "2026-12-01",
+        "endDate": "2026-12-10", "price": 120}
+
+def create(call, body, key):
+    response = call("POST", "/travel", body=body, headers={"Idempotency-Key": key})
+    return response["statusCode"], json.loads(response["body"])
+
+def trips(aws):
+    return list(aws.table("TravelInsuranceData").items.values())
+
+def fingerprint(body):
+    return hashlib.sha256(json.dumps(body).encode()).hexdigest()
+
+def claim(aws, key, body, locked_until):
+    aws.table("IdempotencyKeys").put_item(Item={
+        "idempotencyKey": f"travel_policies#{key}", "status": "in_progress", "fingerprint": fingerprint(body),
+        "lockedUntil": locked_until, "expiresAt": int(time.time()) + 3600,
+    })
+
+def test_retry_with_the_same_key_replays_the_first_response(aws, call):
+    first = create(call, TRIP, "key-1")
+    assert first[0] == 200
+    assert create(call, TRIP, "key-1") == first
+    assert len(trips(aws)) == 1
+    assert aws.table("IdempotencyKeys").items[("travel_policies#key-1", None)]["status"] == "completed"
+
+def test_key_reused_with_another_body(aws, call):
+    create(call, TRIP, "key-1")
+    status, _ = create(call, dict(TRIP, tripTitle="Other trip"), "key-1")
+    assert status == 422
+    assert len(trips(aws)) == 1
+
+def test_key_still_in_progress(aws, call):
+    claim(aws, "key-1", TRIP, locked_until=int(time.time()) + 60)
+    status, body = create(call, TRIP, "key-1")
+    assert status == 409
+    assert trips(aws) == []
+
+def test_abandoned_claim_is_taken_over(aws, call):
+    claim(aws, "key-1", TRIP, locked_until=int(time.time()) - 1)
+    status, body = create(call, TRIP, "key-1")
+    assert status == 200
+    assert len(trips(aws)) == 1
+    assert create(call, TRIP, "key-1") == (status, body)
+
+def test_server_errors_release_the_key(aws, call, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(travel_policies, "handle_create", lambda event: {"statusCode": 503, "headers": {}, "body": "{}"})
+        assert create(call, TRIP, "key-1")[0] == 503
+    assert ("travel_policies#key-1", None) not in aws.table("IdempotencyKeys").items
+    assert create(call, TRIP, "key-1")[0] == 200
+
+def test_bulk_failures_are_replayed_and_retried_with_a_new_key(aws, call, monkeypatch):
+    batch_write = travel_policies.batch_write
+
+    # The last two puts come back unprocessed, as if throttled
+    def throttled_batch_write(table_name, requests, **kwargs):
+        return batch_write(table_name, requests[:-2], **kwargs) + requests[-2:]
+
+    policies = [dict(TRIP, tripTitle=f"Trip {index}") for index in range(5)]
+    with monkeypatch.context() as patch:
+        patch.setattr(travel_policies, "batch_write", throttled_batch_write)
+        status, body = create(call, policies, "bulk-1")
+    assert status == 200
+    assert body["created"] == 3
+    assert [result["status"] for result in body["results"]] == ["created"] * 3 + ["failed"] * 2
+
+    # The same key replays the response instead of creating the first three again
+    assert create(call, policies, "bulk-1") == (status, body)
+    assert len(trips(aws)) == 3
+
+    failed = [policies[result["index"]] for result in body["results"] if result["status"] == "failed"]
+    status, retried = create(call, failed, "bulk-2")
+    assert retried["created"] == 2
+    assert sorted(trip["title"] for trip in trips(aws)) == [f"Trip {index}" for index in range(5)]
+
+def test_key_length(call):
+    assert create(call, TRIP, "")[0] == 400
+    assert create(call, TRIP, "k" * (idempotency.MAX_KEY_LENGTH + 1))[0] == 400
@@ -0,0 +1,92 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+
+@pytest.fixture(autouse=True)
+def no_pending_values():
+    metrics.flush("discarded")
+    yield
+    metrics.flush("discarded")
+
+def emitted(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+def dynamodb_call(name):
+    service_model = SimpleNamespace(service_id=SimpleNamespace(hyphenize=lambda: "dynamodb"))
+    return SimpleNamespace(service_model=service_model, name=name, input_shape=SimpleNamespace(members={"ReturnConsumedCapacity": None}))
+
+def test_one_emf_record_per_invocation(capsys):
+    @metrics.instrumented
+    def handler(event, context):
+        with metrics.timed("JsonEncode"):
+            pass
+        return "ok"
+
+    assert handler({}, SimpleNamespace(function_name="vehicle-policies")) == "ok"
+    [document] = emitted(capsys)
+    [directive] = document["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == metrics.METRICS_NAMESPACE
+    assert directive["Dimensions"] == [["Function"]]
+    assert directive["Metrics"] == [{"Name": "JsonEncode.Duration", "Unit": "Milliseconds"},
+                                    {"Name": "Handler.Duration", "Unit": "Milliseconds"}]
+    assert document["Function"] == "vehicle-policies"
+    assert isinstance(document["_aws"]["Timestamp"], int)
+    # Every metric named in the directive has its values at the top level
+    assert all(len(document[metric["Name"]]) == 1 for metric in directive["Metrics"])
+
+def test_nested_handlers_share_one_record(capsys):
+    inner = metrics.instrumented(lambda event, context: "inner")
+    outer = metrics.instrumented(lambda event, context: inner(event, context))
+    outer({}, None)
+    [document] = emitted(capsys)
+    assert len(document["Handler.Duration"]) == 1
+
+def test_record_is_emitted_when_the_handler_raises(capsys):
+    @metrics.instrumented
+    def handler(event, context):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        handler({}, None)
+    assert "Handler.Duration" in emitted(capsys)[0]
+
+def test_values_per_metric_are_capped():
+    for value in range(metrics.MAX_VALUES_PER_METRIC + 20):
+        metrics.record("Query.Duration", value)
+    assert len(metrics._values["Query.Duration"]) == metrics.MAX_VALUES_PER_METRIC
+
+def test_aws_calls_record_duration_capacity_and_errors(capsys):
+    model = dynamodb_call("Query")
+    context, params = {}, {}
+    metrics.start_call(params, model, context)
+    assert params["ReturnConsumedCapacity"] == "TOTAL"
+    metrics.record_call(model, context, parsed={"ConsumedCapacity": {"CapacityUnits": 2.5}})
+    metrics.start_call({}, model, context)
+    metrics.record_call(model, context, parsed={"Error": {"Code": "ThrottlingException"}})
+    metrics.flush("table-export")
+
+    [document] = emitted(capsys)
+    units = {metric["Name"]: metric["Unit"] for metric in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert units == {"dynamodb.Query.Duration": "Milliseconds", "dynamodb.Query.ConsumedCapacity": "Count",
+                     "dynamodb.Query.Errors": "Count"}
+    assert document["dynamodb.Query.ConsumedCapacity"] == [2.5]
+    assert document["dynamodb.Query.Errors"] == [1]
+    assert len(document["dynamodb.Query.Duration"]) == 2
+
+@pytest.mark.parametrize("consumed, units", [
+    ({"TableName": "t", "CapacityUnits": 1.5}, 1.5),
+    ([{"CapacityUnits": 1}, {"CapacityUnits": 2}, {"TableName": "t"}], 3),
+    (None, 0),
+])
+def test_capacity_units(consumed, units):
+    assert metrics.capacity_units(consumed) == units
+
+def test_disabled_metrics_emit_nothing(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    handler = metrics.instrumented(lambda event, context: metrics.record("Extra", 1))
+    handler({}, None)
+    metrics.flush("anything")
+    assert capsys.readouterr().out == ""
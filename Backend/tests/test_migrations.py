@@ -0,0 +1,127 @@
+import importlib.util
+import os
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+# Migration scripts have hyphenated names, so they are loaded by path; aws_clients must already
+# point at the stand-in, since they build their clients at import time
+def load_script(filename):
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace("-", "_"), os.path.join(BACKEND_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def migrate_vehicle_table(aws):
+    return load_script("migrate-vehicle-table.py")
+
+def vehicle(insurance_id, registration_number, **fields):
+    return dict({"userId": "user-1", "insuranceId": insurance_id, "registrationNumber": registration_number,
+                 "expiryDate": "2099-01-01"}, **fields)
+
+def test_lock_backfill_skips_expired_policies(aws, migrate_vehicle_table):
+    policies = aws.table("VehicleInsuranceData")
+    # The expired policy is seen first and would otherwise hold the number its successor uses
+    policies.put_item(Item=vehicle("veh-1", "REG-1", expiryDate="2020-01-01", policyStatus="expired"))
+    policies.put_item(Item=vehicle("veh-2", "REG-1"))
+    policies.put_item(Item=vehicle("veh-3", "REG-2", expiryDate="2020-01-01", policyStatus="expired"))
+    policies.put_item(Item=vehicle("veh-4", "REG-3"))
+    policies.put_item(Item={"userId": "user-1", "insuranceId": "veh-5"})
+
+    migrate_vehicle_table.backfill_registration_locks()
+    # Safe to re-run
+    migrate_vehicle_table.backfill_registration_locks()
+
+    locks = aws.table("VehicleRegistrationLocks").items
+    assert {number: lock["insuranceId"] for (number, _), lock in locks.items()} == {"REG-1": "veh-2", "REG-3": "veh-4"}
+
+def test_duplicate_registrations_keep_the_first_lock(aws, migrate_vehicle_table, capsys):
+    policies = aws.table("VehicleInsuranceData")
+    policies.put_item(Item=vehicle("veh-1", "REG-1"))
+    policies.put_item(Item=vehicle("veh-2", "REG-1"))
+
+    migrate_vehicle_table.backfill_registration_locks()
+    assert aws.table("VehicleRegistrationLocks").items[("REG-1", None)]["insuranceId"] == "veh-1"
+    assert "Duplicate registration number REG-1 on policy veh-2" in capsys.readouterr().out
+
+@pytest.fixture
+def migrate_sharded_users(aws, monkeypatch):
+    import sharding
+
+    monkeypatch.setitem(sharding.SHARDED_USERS, "fleet-1", 4)
+    return load_script("migrate-sharded-users.py")
+
+def partitions_of(table):
+    return {insurance_id: partition for partition, insurance_id in table.items}
+
+def test_policies_move_into_shards_and_back(aws, migrate_sharded_users, capsys):
+    import sharding
+
+    trips = aws.table("TravelInsuranceData")
+    for index in range(20):
+        trips.put_item(Item={"userId": "fleet-1", "insuranceId": f"trip-{index:02d}", "title": f"Trip {index}",
+                             "version": index % 3})
+    trips.put_item(Item={"userId": "user-1", "insuranceId": "trip-00"})
+    before = {item["insuranceId"]: item for item in trips.items.values() if item["userId"] == "fleet-1"}
+
+    migrate_sharded_users.migrate_user("fleet-1", ["TravelInsuranceData"])
+    moved = {item["insuranceId"]: item for item in trips.items.values() if item["userId"] != "user-1"}
+    assert {insurance_id: item["userId"] for insurance_id, item in moved.items()} == {
+        insurance_id: sharding.partition_key("fleet-1", insurance_id) for insurance_id in before}
+    assert all(dict(item, userId="fleet-1") == before[insurance_id] for insurance_id, item in moved.items())
+    assert trips.items[("user-1", "trip-00")]
+
+    # Re-running finds nothing to move
+    sharded = set(trips.items)
+    capsys.readouterr()
+    migrate_sharded_users.migrate_user("fleet-1", ["TravelInsuranceData"])
+    assert capsys.readouterr().out == "Moved 0 TravelInsuranceData policies of fleet-1\n"
+    assert set(trips.items) == sharded
+
+    migrate_sharded_users.migrate_user("fleet-1", ["TravelInsuranceData"], unshard=True)
+    assert {item["userId"] for item in trips.items.values()} == {"fleet-1", "user-1"}
+    assert {item["insuranceId"]: item for item in trips.items.values() if item["userId"] == "fleet-1"} == before
+
+def test_users_that_are_not_sharded_are_refused(aws, migrate_sharded_users):
+    with pytest.raises(SystemExit):
+        migrate_sharded_users.migrate_user("user-1", ["TravelInsuranceData"])
+
+# A PATCH finds the shard copy first, so a newer version there is kept and the stale original removed
+def test_newer_copy_in_the_shard_is_kept(aws, migrate_sharded_users):
+    import sharding
+
+    trips = aws.table("TravelInsuranceData")
+    shard = sharding.partition_key("fleet-1", "trip-1")
+    trips.put_item(Item={"userId": "fleet-1", "insuranceId": "trip-1", "price": 100, "version": 2})
+    trips.put_item(Item={"userId": shard, "insuranceId": "trip-1", "price": 150, "version": 3})
+
+    migrate_sharded_users.migrate_user("fleet-1", ["TravelInsuranceData"])
+    assert partitions_of(trips) == {"trip-1": shard}
+    assert trips.items[(shard, "trip-1")]["price"] == 150
+
+# A policy updated between the copy and the delete is copied again at its new version
+def test_policy_changed_during_the_move(aws, migrate_sharded_users, monkeypatch):
+    import sharding
+
+    trips = aws.table("TravelInsuranceData")
+    trips.put_item(Item={"userId": "fleet-1", "insuranceId": "trip-1", "price": 100, "version": 1})
+    put_item = trips.put_item
+    writes = []
+
+    def put_then_concurrent_patch(**kwargs):
+        response = put_item(**kwargs)
+        if not writes:
+            trips.update_item(Key={"userId": "fleet-1", "insuranceId": "trip-1"},
+                              UpdateExpression="SET price = :price, version = :version",
+                              ExpressionAttributeValues={":price": 120, ":version": 2})
+        writes.append(kwargs["Item"]["version"])
+        return response
+    monkeypatch.setattr(trips, "put_item", put_then_concurrent_patch)
+
+    migrate_sharded_users.migrate_user("fleet-1", ["TravelInsuranceData"])
+    shard = sharding.partition_key("fleet-1", "trip-1")
+    assert writes == [1, 2]
+    assert partitions_of(trips) == {"trip-1": shard}
+    assert trips.items[(shard, "trip-1")]["price"] == 120
@@ -0,0 +1,77 @@
+import base64
+import json
+
+import pytest
+
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_next_token, encode_next_token, parse_limit
+
+def token_of(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+@pytest.mark.parametrize("value, limit", [
+    (None, DEFAULT_PAGE_SIZE), ("1", 1), ("25", 25), (str(MAX_PAGE_SIZE), MAX_PAGE_SIZE),
+    (str(MAX_PAGE_SIZE + 1), MAX_PAGE_SIZE), ("100000", MAX_PAGE_SIZE),
+])
+def test_parse_limit(value, limit):
+    assert parse_limit(value) == limit
+
+@pytest.mark.parametrize("value, message", [
+    ("0", "positive"), ("-5", "positive"), ("ten", "integer"), ("1.5", "integer"), ("", "integer"),
+])
+def test_invalid_limits(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_limit(value)
+
+def test_tokens_round_trip():
+    key = {"userId": "user-1", "insuranceId": "veh-0001"}
+    token = encode_next_token(key)
+    # URL-safe, so it can go into a query string as it is
+    assert "+" not in token and "/" not in token
+    assert decode_next_token(token) == key
+
+@pytest.mark.parametrize("key", [None, {}])
+def test_no_more_pages_means_no_token(key):
+    assert encode_next_token(key) is None
+    assert decode_next_token(encode_next_token(key)) is None
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    "é",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    token_of(["user-1", "veh-1"]),
+    token_of("user-1"),
+    token_of(42),
+    token_of({}),
+    token_of({"userId": None, "insuranceId": "veh-1"}),
+    token_of({"userId": 5, "insuranceId": ["veh-1"]}),
+])
+def test_invalid_tokens(token):
+    with pytest.raises(ValueError, match="Invalid nextToken"):
+        decode_next_token(token)
+
+@pytest.mark.parametrize("path", ["/vehicle", "/travel-policies", "/portfolio"])
+@pytest.mark.parametrize("query", [
+    {"limit": "0"}, {"limit": "many"}, {"nextToken": "!!"}, {"nextToken": token_of({"userId": 5, "insuranceId": []})},
+])
+def test_handlers_answer_invalid_paging_with_400(aws, call, path, query):
+    assert call("GET", path, dict(query, userId="user-1"))["statusCode"] == 400
+
+# Paging with nextToken visits every policy once, in insuranceId order
+@pytest.mark.parametrize("path, table", [("/vehicle", "VehicleInsuranceData"), ("/travel-policies", "TravelInsuranceData")])
+def test_pages_cover_every_policy_once(aws, call, path, table):
+    for index in range(23):
+        aws.table(table).put_item(Item={"userId": "user-1", "insuranceId": f"pol-{index:03d}", "registrationNumber": f"REG{index}"})
+    aws.table(table).put_item(Item={"userId": "user-2", "insuranceId": "pol-000"})
+
+    seen, token = [], None
+    while True:
+        query = {"userId": "user-1", "limit": "5"}
+        if token:
+            query["nextToken"] = token
+        body = json.loads(call("GET", path, query)["body"])
+        assert len(body["policies"]) <= 5
+        seen.extend(policy["insuranceId"] for policy in body["policies"])
+        token = body["nextToken"]
+        if not token:
+            break
+    assert seen == [f"pol-{index:03d}" for index in range(23)]
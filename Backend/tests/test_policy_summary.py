@@ -0,0 +1,228 @@
+import base64
+import itertools
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import policy_summary
+import travel_status
+import vehicle_policies
+from local_aws import client_error, to_typed
+from pagination import DEFAULT_PAGE_SIZE
+
+sequence = itertools.count(1000)
+
+def day(offset):
+    return (datetime.utcnow() + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+# A stream record as Lambda delivers it, built by hand
+def stream_record(table_name, user_id, insurance_id, image=None):
+    keys = {"userId": user_id, "insuranceId": insurance_id}
+    record = {
+        "eventName": "REMOVE" if image is None else "MODIFY",
+        "eventSourceARN": f"arn:aws:dynamodb:us-east-1:123456789012:table/{table_name}/stream/2026-01-01T00:00:00.000",
+        "dynamodb": {"Keys": to_typed(keys), "SequenceNumber": str(next(sequence)), "StreamViewType": "NEW_IMAGE"},
+    }
+    if image is not None:
+        record["dynamodb"]["NewImage"] = to_typed(dict(image, **keys))
+    return record
+
+def vehicle(insurance_id, expiry, **fields):
+    return dict({"insuranceId": insurance_id, "registrationNumber": f"REG-{insurance_id}", "make": "Toyota",
+                 "model": "Corolla", "insuranceType": "Standard", "price": 300, "expiryDate": expiry,
+                 "version": 1}, **fields)
+
+def stored_summary(aws, user_id, kind):
+    return aws.table("PolicySummaries").items.get((user_id, kind))
+
+def without_write_metadata(summary):
+    return {key: value for key, value in summary.items() if key not in ("version", "updatedAt")}
+
+def test_synthetic_records_keep_counts_and_next_expiry(aws):
+    table = "VehicleInsuranceData"
+    records = [
+        stream_record(table, "user-1", "veh-1", vehicle("veh-1", day(30))),
+        stream_record(table, "user-1", "veh-2", vehicle("veh-2", day(10))),
+        # Marked by the sweep
+        stream_record(table, "user-1", "veh-3", vehicle("veh-3", day(-3), policyStatus="expired")),
+        # Past its expiry date but not swept yet
+        stream_record(table, "user-1", "veh-4", vehicle("veh-4", day(-1))),
+        stream_record(table, "user-2", "veh-5", vehicle("veh-5", day(5))),
+    ]
+    assert policy_summary.process_stream_records(records) == {"batchItemFailures": []}
+
+    summary = stored_summary(aws, "user-1", "vehicle")
+    assert sorted(summary["policies"]) == ["veh-1", "veh-2", "veh-3", "veh-4"]
+    assert summary["policies"]["veh-3"]["policyStatus"] == "expired"
+    assert (summary["activeCount"], summary["expiredCount"], summary["nextExpiry"]) == (2, 2, day(10))
+    assert stored_summary(aws, "user-2", "vehicle")["nextExpiry"] == day(5)
+
+    # Cancelling the policy that expires first moves nextExpiry on; re-delivered records change nothing
+    records = [stream_record(table, "user-1", "veh-2"), stream_record(table, "user-1", "veh-3")]
+    policy_summary.process_stream_records(records)
+    policy_summary.process_stream_records(records)
+    summary = stored_summary(aws, "user-1", "vehicle")
+    assert sorted(summary["policies"]) == ["veh-1", "veh-4"]
+    assert (summary["activeCount"], summary["expiredCount"], summary["nextExpiry"]) == (1, 1, day(30))
+
+    # Counts read later are for that day, not the day the summary was written
+    counts = policy_summary.policy_counts("vehicle", policy_summary.summary_policies(summary), today=day(31))
+    assert counts == {"activeCount": 0, "expiredCount": 2, "nextExpiry": None}
+
+def test_rebuild_matches_the_stream_projection(aws):
+    table = aws.table("TravelInsuranceData")
+    for index in range(12):
+        table.put_item(Item={"userId": "user-1", "insuranceId": f"trip-{index:02d}", "title": "Trip",
+                             "insuranceType": "Travel", "price": 100 + index, "startDate": day(index - 6),
+                             "endDate": day(index - 4), "version": 1})
+    table.delete_item(Key={"userId": "user-1", "insuranceId": "trip-05"})
+    table.put_item(Item={"userId": "user-1", "insuranceId": "trip-20", "title": "Open trip", "endDate": "Not available"})
+
+    policy_summary.process_stream_records(table.drain_stream())
+    projected = stored_summary(aws, "user-1", "travel")
+    assert (projected["activeCount"], projected["expiredCount"], projected["nextExpiry"]) == (8, 4, day(0))
+
+    aws.table("PolicySummaries").items.clear()
+    assert policy_summary.lambda_handler({"rebuild": "travel"}, None) == {"rebuilt": 1}
+    assert without_write_metadata(stored_summary(aws, "user-1", "travel")) == without_write_metadata(projected)
+
+def test_users_with_too_many_policies_overflow(aws, monkeypatch):
+    monkeypatch.setattr(policy_summary, "MAX_SUMMARY_POLICIES", 3)
+    table = "VehicleInsuranceData"
+    records = [stream_record(table, "fleet", f"veh-{index}", vehicle(f"veh-{index}", day(30))) for index in range(4)]
+    policy_summary.process_stream_records(records)
+
+    summary = stored_summary(aws, "fleet", "vehicle")
+    assert summary["incomplete"] is True and "policies" not in summary
+    assert policy_summary.get_summary("fleet", "vehicle") is None
+
+    # Left alone by later changes, until a rebuild finds few enough policies again
+    policy_summary.process_stream_records([stream_record(table, "fleet", "veh-0")])
+    assert stored_summary(aws, "fleet", "vehicle")["incomplete"] is True
+    aws.table(table).put_item(Item=dict(vehicle("veh-1", day(30)), userId="fleet"))
+    policy_summary.rebuild("vehicle", "fleet")
+    assert sorted(policy_summary.get_summary("fleet", "vehicle")["policies"]) == ["veh-1"]
+
+def test_permanent_write_errors_mark_the_summary_incomplete_instead_of_failing_the_batch(aws, monkeypatch):
+    table = "VehicleInsuranceData"
+    policy_summary.process_stream_records([stream_record(table, "user-1", "veh-1", vehicle("veh-1", day(30)))])
+    summaries = aws.table("PolicySummaries")
+
+    def too_large(**kwargs):
+        raise client_error("ValidationException", "Item size has exceeded the maximum allowed size", "PutItem")
+    monkeypatch.setattr(summaries, "put_item", too_large)
+    result = policy_summary.process_stream_records([stream_record(table, "user-1", "veh-2", vehicle("veh-2", day(30)))])
+    assert result == {"batchItemFailures": []}
+    assert stored_summary(aws, "user-1", "vehicle")["incomplete"] is True
+    assert policy_summary.get_summary("user-1", "vehicle") is None
+
+    # Later changes do not start a new summary that would miss the earlier policies
+    monkeypatch.undo()
+    policy_summary.process_stream_records([stream_record(table, "user-1", "veh-4", vehicle("veh-4", day(30)))])
+    assert policy_summary.get_summary("user-1", "vehicle") is None
+
+def test_throttled_writes_fail_the_batch_for_a_retry(aws, monkeypatch):
+    table = "VehicleInsuranceData"
+
+    def throttled(**kwargs):
+        raise client_error("ProvisionedThroughputExceededException", "Rate exceeded", "PutItem")
+    monkeypatch.setattr(aws.table("PolicySummaries"), "put_item", throttled)
+    records = [stream_record(table, "user-1", "veh-3", vehicle("veh-3", day(30)))]
+    result = policy_summary.process_stream_records(records)
+    assert result == {"batchItemFailures": [{"itemIdentifier": records[0]["dynamodb"]["SequenceNumber"]}]}
+
+def enable_summary_reads(monkeypatch, enabled=True):
+    monkeypatch.setattr(vehicle_policies, "SUMMARY_READS_ENABLED", enabled)
+    monkeypatch.setattr(travel_status, "SUMMARY_READS_ENABLED", enabled)
+
+# Summary reads on, and the first pages only allowed to come from the summaries
+@pytest.fixture
+def summary_reads(monkeypatch):
+    enable_summary_reads(monkeypatch)
+    query_user_page = vehicle_policies.query_user_page
+
+    def later_pages_only(table_name, user_id, limit, start_key=None, projection=None):
+        assert start_key is not None, "first page read from the table"
+        return query_user_page(table_name, user_id, limit, start_key, projection)
+    monkeypatch.setattr(vehicle_policies, "query_user_page", later_pages_only)
+    monkeypatch.setattr(travel_status, "query_user_page", later_pages_only)
+
+def page(call, path, query):
+    response = call("GET", path, query)
+    return response["statusCode"], json.loads(response["body"])
+
+def test_summary_first_page_is_a_real_first_page(aws, call, summary_reads):
+    table = aws.table("VehicleInsuranceData")
+    count = DEFAULT_PAGE_SIZE + 10
+    for index in range(count):
+        status = {"policyStatus": "expired"} if index % 7 == 0 else {}
+        table.put_item(Item=dict(vehicle(f"veh-{index:03d}", day(-1 if status else 60)), userId="user-1", **status))
+    policy_summary.process_stream_records(table.drain_stream())
+
+    status, first = page(call, "/vehicle", {"userId": "user-1"})
+    assert status == 200
+    assert [policy["insuranceId"] for policy in first["policies"]] == [f"veh-{index:03d}" for index in range(DEFAULT_PAGE_SIZE)]
+    assert first["policies"][0]["policyStatus"] == "expired"
+
+    # The token pages on through the base table
+    status, second = page(call, "/vehicle", {"userId": "user-1", "nextToken": first["nextToken"]})
+    assert [policy["insuranceId"] for policy in second["policies"]] == [f"veh-{index:03d}" for index in range(DEFAULT_PAGE_SIZE, count)]
+
+    status, small = page(call, "/vehicle", {"userId": "user-1", "limit": "5"})
+    assert len(small["policies"]) == 5
+    assert json.loads(base64.urlsafe_b64decode(small["nextToken"])) == {"userId": "user-1", "insuranceId": "veh-004"}
+
+def test_user_whose_only_policy_expired_still_has_a_listing(aws, call, summary_reads):
+    table = aws.table("VehicleInsuranceData")
+    table.put_item(Item=dict(vehicle("veh-1", day(-10), policyStatus="expired"), userId="user-1"))
+    policy_summary.process_stream_records(table.drain_stream())
+
+    status, body = page(call, "/vehicle", {"userId": "user-1"})
+    assert status == 200
+    assert [policy["policyStatus"] for policy in body["policies"]] == ["expired"]
+    assert page(call, "/vehicle", {"userId": "user-1", "limit": "50"})[1]["policies"] == body["policies"]
+
+def test_travel_summary_page(aws, call, summary_reads):
+    table = aws.table("TravelInsuranceData")
+    for index in range(3):
+        table.put_item(Item={"userId": "user-1", "insuranceId": f"trip-{index}", "title": "Trip",
+                             "startDate": day(index), "endDate": day(index + 2)})
+    policy_summary.process_stream_records(table.drain_stream())
+
+    status, body = page(call, "/travel-policies", {"userId": "user-1", "limit": "2"})
+    assert [policy["insuranceId"] for policy in body["policies"]] == ["trip-0", "trip-1"]
+    assert body["policies"][0]["userId"] == "user-1"
+    status, rest = page(call, "/travel-policies", {"userId": "user-1", "nextToken": body["nextToken"]})
+    assert [policy["insuranceId"] for policy in rest["policies"]] == ["trip-2"]
+
+# A first page has the same shape whether it comes from the summary or from the table
+@pytest.mark.parametrize("path, limit", [("/vehicle", "2"), ("/vehicle", "3"), ("/travel-policies", "2"), ("/travel-policies", "3")])
+def test_summary_and_table_pages_match(aws, call, monkeypatch, path, limit):
+    vehicles = aws.table("VehicleInsuranceData")
+    trips = aws.table("TravelInsuranceData")
+    for index in range(3):
+        vehicles.put_item(Item=dict(vehicle(f"veh-{index}", day(index * 10 - 5)), userId="user-1"))
+    for index, item in enumerate([
+        {"insuranceId": "trip-0", "customer_name": "Customer", "title": "Trip", "insuranceType": "Short Term",
+         "price": 120, "startDate": day(1), "endDate": day(5), "createdAt": "2026-01-01 00:00:00", "version": 1},
+        {"insuranceId": "trip-1", "customer_name": "Customer", "title": "Open trip", "insuranceType": "Short Term",
+         "price": 80, "startDate": "Not available", "endDate": "Not available", "createdAt": "2026-01-02 00:00:00",
+         "version": 2},
+        {"insuranceId": "trip-2", "customer_name": "Customer", "title": "Past trip", "insuranceType": "Short Term",
+         "price": 60, "startDate": day(-9), "endDate": day(-5), "createdAt": "2026-01-03 00:00:00", "version": 1},
+    ]):
+        trips.put_item(Item=dict(item, userId="user-1"))
+    for kind in policy_summary.KINDS:
+        policy_summary.rebuild(kind, "user-1")
+
+    enable_summary_reads(monkeypatch, False)
+    from_table = page(call, path, {"userId": "user-1", "limit": limit})
+    enable_summary_reads(monkeypatch)
+    from_summary = page(call, path, {"userId": "user-1", "limit": limit})
+
+    # A full page from the table carries a LastEvaluatedKey even when nothing follows
+    if limit == "3":
+        assert from_summary[1]["nextToken"] is None
+        from_table[1]["nextToken"] = None
+    assert from_summary == from_table
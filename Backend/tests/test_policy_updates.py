@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+import router
+import sharding
+from benchmark import api_event
+
+def patch(call, path, **body):
+    response = call("PATCH", path, body=body)
+    return response["statusCode"], json.loads(response["body"])
+
+def add_trip(aws, user_id="user-1", **fields):
+    item = dict({"userId": user_id, "insuranceId": "trip-1", "title": "Trip", "insuranceType": "Short Term",
+                 "price": 100, "startDate": "2026-05-01", "endDate": "2026-05-10", "version": 1}, **fields)
+    item = {name: value for name, value in item.items() if value is not None}
+    aws.table("TravelInsuranceData").put_item(Item=item)
+    return item
+
+def stored_trip(aws, user_id="user-1"):
+    return aws.table("TravelInsuranceData").items[(user_id, "trip-1")]
+
+def test_update_bumps_the_version(aws, call):
+    add_trip(aws)
+    status, body = patch(call, "/travel", userId="user-1", insuranceId="trip-1", version=1, price=120.5,
+                         endDate="2026-05-12")
+    assert (status, body) == (200, {"insuranceId": "trip-1", "version": 2, "price": 120.5, "endDate": "2026-05-12"})
+    assert stored_trip(aws)["version"] == 2
+    assert str(stored_trip(aws)["price"]) == "120.5"
+
+def test_items_without_a_version_are_version_0(aws, call):
+    add_trip(aws, version=None)
+    status, body = patch(call, "/travel", userId="user-1", insuranceId="trip-1", version=0, title="Renamed")
+    assert (status, body["version"]) == (200, 1)
+
+def test_stale_version_is_a_conflict(aws, call):
+    add_trip(aws, version=3)
+    status, body = patch(call, "/travel", userId="user-1", insuranceId="trip-1", version=2, price=120)
+    assert status == 409
+    assert body["currentVersion"] == 3
+    assert stored_trip(aws)["price"] == 100
+
+def test_unknown_policy(aws, call):
+    status, _ = patch(call, "/travel", userId="user-1", insuranceId="trip-404", version=1, price=120)
+    assert status == 404
+
+def test_forbidden_field(aws, call):
+    add_trip(aws)
+    status, body = patch(call, "/travel", userId="user-1", insuranceId="trip-1", version=1, customer_name="Mallory")
+    assert status == 400
+    assert "customer_name" in body["error"]
+    assert stored_trip(aws)["version"] == 1
+
+def test_vehicle_expiry_cannot_be_patched(aws, call):
+    status, _ = patch(call, "/vehicle", userId="user-1", insuranceId="veh-1", version=1, expiryDate="2099-01-01")
+    assert status == 400
+
+@pytest.mark.parametrize("fields", [
+    {"price": None},
+    {"price": {"amount": 120}},
+    {"price": "120"},
+    {"price": -1},
+    {"price": True},
+    {"endDate": "next week"},
+    {"endDate": "2026-02-30"},
+    {"startDate": 20260501},
+    {"title": ""},
+    {"insuranceType": ["Annual"]},
+])
+def test_invalid_values(aws, call, fields):
+    add_trip(aws)
+    status, body = patch(call, "/travel", userId="user-1", insuranceId="trip-1", version=1, **fields)
+    assert status == 400
+    assert body["error"].startswith(next(iter(fields)))
+    assert stored_trip(aws)["version"] == 1
+
+def test_travel_dates_may_be_not_available(aws, call):
+    add_trip(aws)
+    status, _ = patch(call, "/travel", userId="user-1", insuranceId="trip-1", version=1, endDate="Not available")
+    assert status == 200
+
+# Numbers that are valid to Python's JSON parser but not to DynamoDB; the last has 40 significant digits
+@pytest.mark.parametrize("constant", ["NaN", "Infinity", "-Infinity", "1.234567890123456789012345678901234567891"])
+def test_unstorable_numbers_are_rejected(aws, call, constant):
+    add_trip(aws)
+    event = api_event("PATCH", "/travel", body={"userId": "user-1", "insuranceId": "trip-1", "version": 1, "price": 0})
+    event["body"] = event["body"].replace('"price": 0', f'"price": {constant}')
+    response = router.lambda_handler(event, None)
+    assert response["statusCode"] == 400
+    assert stored_trip(aws)["version"] == 1
+
+@pytest.mark.parametrize("body", ["{not json", "[1, 2]", '"text"'])
+def test_body_must_be_a_json_object(aws, call, body):
+    event = api_event("PATCH", "/vehicle")
+    event["body"] = body
+    assert router.lambda_handler(event, None)["statusCode"] == 400
+
+def test_sharded_users_policy(aws, call, monkeypatch):
+    monkeypatch.setitem(sharding.SHARDED_USERS, "fleet-1", 4)
+    key = sharding.partition_key("fleet-1", "trip-1")
+    assert key != "fleet-1"
+    add_trip(aws, user_id=key)
+    status, body = patch(call, "/travel", userId="fleet-1", insuranceId="trip-1", version=1, price=90)
+    assert (status, body["version"]) == (200, 2)
+    assert stored_trip(aws, key)["price"] == 90
+
+# Policies written before the user was sharded are still in the plain userId partition
+def test_sharded_users_unmigrated_policy(aws, call, monkeypatch):
+    monkeypatch.setitem(sharding.SHARDED_USERS, "fleet-1", 4)
+    add_trip(aws, user_id="fleet-1")
+    status, _ = patch(call, "/travel", userId="fleet-1", insuranceId="trip-1", version=1, price=90)
+    assert status == 200
+    assert stored_trip(aws, "fleet-1")["price"] == 90
+    status, body = patch(call, "/travel", userId="fleet-1", insuranceId="trip-1", version=1, price=80)
+    assert (status, body["currentVersion"]) == (409, 2)
@@ -0,0 +1,70 @@
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+import policy_summary
+import portfolio
+
+def day(offset):
+    return (datetime.utcnow() + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+def add_policies(aws):
+    vehicles = aws.table("VehicleInsuranceData")
+    # String prices come from clients that format them before sending
+    vehicles.put_item(Item={"userId": "user-1", "insuranceId": "veh-1", "price": "300.50", "expiryDate": day(40)})
+    vehicles.put_item(Item={"userId": "user-1", "insuranceId": "veh-2", "price": Decimal("99.5"), "expiryDate": day(20)})
+    vehicles.put_item(Item={"userId": "user-1", "insuranceId": "veh-3", "price": "n/a", "expiryDate": day(60)})
+    # Past its expiry date, not swept yet
+    vehicles.put_item(Item={"userId": "user-1", "insuranceId": "veh-4", "price": 500, "expiryDate": day(-2)})
+    vehicles.put_item(Item={"userId": "user-1", "insuranceId": "veh-5", "price": 700, "expiryDate": day(-30),
+                            "policyStatus": "expired"})
+    trips = aws.table("TravelInsuranceData")
+    trips.put_item(Item={"userId": "user-1", "insuranceId": "trip-1", "price": "120", "endDate": day(10)})
+    trips.put_item(Item={"userId": "user-1", "insuranceId": "trip-2", "price": 80, "endDate": day(-1)})
+    trips.put_item(Item={"userId": "user-1", "insuranceId": "trip-3", "endDate": "Not available"})
+
+EXPECTED_TOTALS = {
+    "activeCount": 5, "expiredCount": 3, "vehicleCount": 3, "travelCount": 2,
+    "totalPrice": 520, "nextExpiry": day(10),
+}
+
+def totals(call, **query):
+    response = call("GET", "/portfolio", dict(query, userId="user-1"))
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])["totals"]
+
+def test_totals_from_one_page(aws, call):
+    add_policies(aws)
+    assert totals(call) == EXPECTED_TOTALS
+
+def test_totals_from_a_separate_read(aws, call):
+    add_policies(aws)
+    assert totals(call, limit="2") == EXPECTED_TOTALS
+
+def test_totals_from_summaries(aws, call, monkeypatch):
+    add_policies(aws)
+    for kind in policy_summary.KINDS:
+        policy_summary.rebuild(kind, "user-1")
+    monkeypatch.setattr(portfolio, "SUMMARY_READS_ENABLED", True)
+    assert totals(call, limit="2") == EXPECTED_TOTALS
+
+@pytest.mark.parametrize("value, expected", [
+    (12, Decimal(12)), (Decimal("12.5"), Decimal("12.5")), ("12.50", Decimal("12.50")), (12.25, Decimal("12.25")),
+    ("", None), ("twelve", None), (None, None), (True, None), ("NaN", None), ("Infinity", None), ([12], None),
+])
+def test_parse_price(value, expected):
+    assert portfolio.parse_price(value) == expected
+
+# The listing and the totals agree on which policies have expired
+def test_listed_status_matches_the_totals(aws, call):
+    add_policies(aws)
+    body = json.loads(call("GET", "/portfolio", {"userId": "user-1"})["body"])
+    statuses = {policy["insuranceId"]: policy["policyStatus"] for policy in body["policies"]}
+    assert statuses == {
+        "veh-1": "active", "veh-2": "active", "veh-3": "active", "veh-4": "expired", "veh-5": "expired",
+        "trip-1": "active", "trip-2": "expired", "trip-3": "active",
+    }
+    assert sum(status == "expired" for status in statuses.values()) == body["totals"]["expiredCount"]
+    assert {policy["kind"] for policy in body["policies"]} == {"vehicle", "travel"}
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+import profile_imports
+
+# The same check CI runs: every handler imports within its budget in import_budgets.json
+def test_handlers_import_within_budget():
+    result = subprocess.run(
+        [sys.executable, "profile_imports.py", "--check", "--runs", "3"],
+        cwd=profile_imports.BACKEND_DIR, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+# boto3 is loaded on first use (aws_clients.py), not when a handler module is imported
+def test_handlers_do_not_import_boto3():
+    for filename in ("router.py", "vehicle-auth-lambda.py"):
+        _, packages = profile_imports.profile_handler(filename)
+        assert "boto3" not in packages, filename
+
+def test_check_budgets():
+    report = {"a.py": {"import_ms": 120.0}, "b.py": {"import_ms": 80.0}, "c.py": {"import_ms": 150.0}}
+    violations = profile_imports.check_budgets(report, {"default": 100, "c.py": 200})
+    assert violations == ["a.py: 120.0 ms exceeds budget of 100 ms"]
@@ -0,0 +1,134 @@
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ConnectionClosedError, EndpointConnectionError, ParamValidationError, ReadTimeoutError
+
+import retries
+
+def response(status, code=None):
+    parsed = {"Error": {"Code": code, "Message": "..."}} if code else {}
+    return SimpleNamespace(status_code=status), parsed
+
+OPERATION = SimpleNamespace(name="Query")
+
+@pytest.mark.parametrize("code", sorted(retries.THROTTLING_CODES))
+def test_throttling_codes(code):
+    assert retries.classify(response(400, code), None) == "throttled"
+
+@pytest.mark.parametrize("status, code", [
+    (500, "InternalServerError"), (500, "InternalFailure"), (503, "ServiceUnavailable"), (502, None), (504, None),
+    (400, "InternalErrorException"),
+])
+def test_transient_errors(status, code):
+    assert retries.classify(response(status, code), None) == "transient"
+
+@pytest.mark.parametrize("status, code", [
+    (200, None), (400, "ConditionalCheckFailedException"), (400, "ValidationException"),
+    (400, "ResourceNotFoundException"), (403, "AccessDeniedException"), (501, None),
+])
+def test_errors_that_are_not_retried(status, code):
+    assert retries.classify(response(status, code), None) is None
+
+@pytest.mark.parametrize("exception, kind", [
+    (EndpointConnectionError(endpoint_url="https://dynamodb"), "transient"),
+    (ConnectionClosedError(endpoint_url="https://dynamodb"), "transient"),
+    (ReadTimeoutError(endpoint_url="https://dynamodb"), "transient"),
+    (ParamValidationError(report="bad"), None),
+    (ValueError("bug"), None),
+])
+def test_exceptions(exception, kind):
+    assert retries.classify(None, exception) == kind
+
+def test_no_response_and_no_exception():
+    assert retries.classify(None, None) is None
+
+# The largest delay full jitter can pick doubles per attempt, up to RETRY_MAX_DELAY
+def test_backoff_bounds(monkeypatch):
+    monkeypatch.setattr(retries, "RETRY_BASE_DELAY", 0.05)
+    monkeypatch.setattr(retries, "RETRY_MAX_DELAY", 1.0)
+    monkeypatch.setattr(retries.random, "uniform", lambda low, high: (low, high))
+    assert [retries.backoff_delay(attempts) for attempts in (1, 2, 3, 5, 6, 20)] == [
+        (0, 0.05), (0, 0.1), (0, 0.2), (0, 0.8), (0, 1.0), (0, 1.0)]
+
+def test_backoff_is_jittered():
+    delays = [retries.backoff_delay(3) for _ in range(200)]
+    assert all(0 <= delay <= retries.RETRY_BASE_DELAY * 4 for delay in delays)
+    assert len(set(delays)) > 100
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(retries.random, "uniform", lambda low, high: high)
+    return retries.ServiceRetries("dynamodb")
+
+def test_retries_until_the_attempt_limit(service, monkeypatch):
+    monkeypatch.setattr(retries, "AWS_MAX_ATTEMPTS", 3)
+    throttled = response(400, "ProvisionedThroughputExceededException")
+    assert service.needs_retry(throttled, OPERATION, attempts=1) == retries.RETRY_BASE_DELAY
+    assert service.needs_retry(throttled, OPERATION, attempts=2) == retries.RETRY_BASE_DELAY * 2
+    assert service.needs_retry(throttled, OPERATION, attempts=3) is None
+
+def test_per_operation_attempt_limit(service, monkeypatch):
+    monkeypatch.setitem(retries.OPERATION_MAX_ATTEMPTS, "Query", 1)
+    assert service.needs_retry(response(503), OPERATION, attempts=1) is None
+    assert service.needs_retry(response(503), SimpleNamespace(name="GetItem"), attempts=1) is not None
+
+def test_success_is_not_retried(service):
+    assert service.needs_retry(response(200), OPERATION, attempts=1) is None
+
+def invoke_with_remaining(milliseconds, function):
+    context = SimpleNamespace(get_remaining_time_in_millis=lambda: milliseconds)
+    return retries.with_deadline(lambda event, context: function())({}, context)
+
+# A retry that would start within AWS_RETRY_TIME_RESERVE_MS of the deadline is abandoned
+def test_deadline_cut_off(service):
+    retry = lambda: service.needs_retry(response(503), OPERATION, attempts=4)
+    delay = retries.RETRY_BASE_DELAY * 8
+    reserve_ms = retries.RETRY_TIME_RESERVE * 1000
+    assert invoke_with_remaining(reserve_ms + delay * 1000 + 50, retry) == delay
+    assert invoke_with_remaining(reserve_ms + delay * 1000 - 50, retry) is None
+    assert invoke_with_remaining(reserve_ms / 2, retry) is None
+
+def test_deadline_only_applies_during_the_invocation(service):
+    assert invoke_with_remaining(10000, retries.remaining_time) == pytest.approx(10, abs=0.5)
+    assert retries.remaining_time() is None
+    # Without a Lambda context only the attempt limit applies
+    assert service.needs_retry(response(503), OPERATION, attempts=1) == retries.RETRY_BASE_DELAY
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0, slept=[])
+    monkeypatch.setattr(retries.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(retries.time, "sleep", clock.slept.append)
+    return clock
+
+# The first throttle limits sends to what went out in the last second, cut by RATE_DECREASE; the
+# rate then climbs back while calls succeed and the limit is lifted at RATE_LIFT times that
+def test_throttles_limit_the_rate_until_calls_succeed(clock):
+    bucket = retries.TokenBucket()
+    for _ in range(10):
+        assert bucket.acquire() == 0.0
+    bucket.on_throttle()
+    assert bucket.rate == pytest.approx(10 * retries.RATE_DECREASE)
+
+    # Throttles of requests that were already in flight do not cut the rate again
+    bucket.on_throttle()
+    assert bucket.rate == pytest.approx(10 * retries.RATE_DECREASE)
+
+    seconds = (10 * retries.RATE_LIFT - 10 * retries.RATE_DECREASE) / (10 * retries.RATE_RECOVERY)
+    clock.now += seconds - 0.5
+    bucket.on_success()
+    assert bucket.rate is not None
+    clock.now += 0.5
+    bucket.on_success()
+    assert bucket.rate is None
+
+def test_waits_for_a_token_but_not_past_the_reserve(clock):
+    bucket = retries.TokenBucket()
+    bucket.acquire()
+    bucket.on_throttle()
+    # One send per second, and no tokens yet: each caller waits for its own token
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(2.0)
+    assert bucket.acquire(remaining=retries.RETRY_TIME_RESERVE + 0.25) == pytest.approx(0.25)
+    assert bucket.acquire(remaining=retries.RETRY_TIME_RESERVE / 2) == 0.0
+    assert clock.slept == pytest.approx([1.0, 2.0, 0.25])
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import router
+from benchmark import api_event
+from http_responses import CORS_HEADERS
+
+def test_every_route_is_served():
+    assert set(router.ROUTES) == {
+        ("GET", "/vehicle"), ("POST", "/vehicle"), ("PATCH", "/vehicle"), ("GET", "/vehicle-status"),
+        ("DELETE", "/delete-car-insurance"), ("POST", "/travel"), ("PATCH", "/travel"), ("GET", "/travel-policies"),
+        ("DELETE", "/cancel-insurance-api"), ("GET", "/portfolio"), ("POST", "/auth"),
+    }
+
+@pytest.mark.parametrize("path", ["/unknown", "/", "/vehicles", "/vehicle/extra"])
+def test_unknown_path_is_a_404(call, path):
+    response = call("GET", path)
+    assert response["statusCode"] == 404
+    assert json.loads(response["body"]) == {"error": f"No route for GET {path}"}
+
+@pytest.mark.parametrize("method, path", [("DELETE", "/vehicle"), ("GET", "/auth"), ("PUT", "/travel"), ("POST", "/portfolio")])
+def test_known_path_with_another_method_is_a_405(call, method, path):
+    response = call(method, path)
+    assert response["statusCode"] == 405
+    assert response["headers"] == CORS_HEADERS
+
+@pytest.mark.parametrize("path", ["/vehicle", "/auth", "/anything"])
+def test_preflight_is_answered_for_every_path(call, path):
+    response = call("OPTIONS", path)
+    assert response == {"statusCode": 200, "headers": CORS_HEADERS, "body": ""}
+
+# API Gateway's resource is the route template; a trailing slash or a bare path also match
+@pytest.mark.parametrize("event_fields", [
+    {"resource": "/vehicle-status/"},
+    {"resource": None, "path": "/vehicle-status"},
+])
+def test_route_path(aws, event_fields):
+    event = dict(api_event("GET", "/vehicle-status", {"registrationNumber": "REG-1"}), **event_fields)
+    assert router.lambda_handler(event, None)["statusCode"] == 200
+
+def test_exceptions_become_a_500(monkeypatch, call):
+    def broken_handler(event, context):
+        raise RuntimeError("secret detail")
+    monkeypatch.setitem(router.ROUTES, ("GET", "/portfolio"), broken_handler)
+
+    response = call("GET", "/portfolio", {"userId": "user-1"})
+    assert response["statusCode"] == 500
+    # The exception's message stays in the logs
+    assert json.loads(response["body"]) == {"error": "Internal server error"}
+    assert response["headers"] == CORS_HEADERS
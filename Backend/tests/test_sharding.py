@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import sharding
+
+USER = "fleet-1"
+SHARDS = 4
+
+@pytest.fixture
+def sharded(monkeypatch):
+    monkeypatch.setitem(sharding.SHARDED_USERS, USER, SHARDS)
+
+# Policies in every shard, plus a few written before the user was sharded
+def add_policies(aws, table_name, count, legacy=()):
+    table = aws.table(table_name)
+    for index in range(count):
+        insurance_id = f"pol-{index:03d}"
+        partition = USER if insurance_id in legacy else sharding.partition_key(USER, insurance_id)
+        table.put_item(Item={"userId": partition, "insuranceId": insurance_id, "registrationNumber": f"REG{index}"})
+    # Another user's policies must not leak into the pages
+    table.put_item(Item={"userId": "fleet-10", "insuranceId": "pol-000"})
+    table.put_item(Item={"userId": f"{USER}0", "insuranceId": "pol-001"})
+    return [f"pol-{index:03d}" for index in range(count)]
+
+def test_partitions(sharded):
+    assert sharding.user_partitions(USER) == [USER] + [f"{USER}#{shard}" for shard in range(SHARDS)]
+    assert sharding.user_partitions("user-1") == ["user-1"]
+    assert {sharding.partition_key(USER, f"pol-{index}") for index in range(100)} == set(sharding.user_partitions(USER)[1:])
+    assert sharding.partition_key("user-1", "pol-1") == "user-1"
+
+def test_owner_user_id(sharded):
+    assert sharding.owner_user_id(f"{USER}#3") == USER
+    assert sharding.owner_user_id(USER) == USER
+    # Only sharded users' keys are shard keys
+    assert sharding.owner_user_id("user-1#3") == "user-1#3"
+    assert sharding.owner_user_id(f"{USER}#x") == f"{USER}#x"
+
+@pytest.mark.parametrize("limit", [1, 5, 7, 40])
+def test_scatter_gather_pages(aws, sharded, limit):
+    expected = add_policies(aws, "TravelInsuranceData", 37, legacy={"pol-004", "pol-020", "pol-036"})
+
+    seen, start_key = [], None
+    while True:
+        page = sharding.query_user_page("TravelInsuranceData", USER, limit, start_key)
+        assert len(page["Items"]) <= limit and page["Count"] == len(page["Items"])
+        seen.extend(item["insuranceId"] for item in page["Items"])
+        start_key = page.get("LastEvaluatedKey")
+        if not start_key:
+            break
+        # Tokens name the user, not the shard the last item came from
+        assert start_key == {"userId": USER, "insuranceId": seen[-1]}
+    assert seen == expected
+
+def test_query_user_items(aws, sharded):
+    expected = add_policies(aws, "VehicleInsuranceData", 25, legacy={"pol-010"})
+    items = sharding.query_user_items("VehicleInsuranceData", USER)
+    assert sorted(item["insuranceId"] for item in items) == expected
+
+@pytest.mark.parametrize("path", ["/vehicle", "/travel-policies"])
+def test_listing_endpoints_page_across_shards(aws, call, sharded, path):
+    table_name = "VehicleInsuranceData" if path == "/vehicle" else "TravelInsuranceData"
+    expected = add_policies(aws, table_name, 23, legacy={"pol-001"})
+
+    seen, token = [], None
+    while True:
+        query = {"userId": USER, "limit": "4"}
+        if token:
+            query["nextToken"] = token
+        body = json.loads(call("GET", path, query)["body"])
+        seen.extend(policy["insuranceId"] for policy in body["policies"])
+        assert all(policy.get("userId", USER) == USER for policy in body["policies"])
+        token = body["nextToken"]
+        if not token:
+            break
+    assert seen == expected
+
+def test_point_operations_fall_back_to_the_userId_partition(aws, sharded):
+    add_policies(aws, "TravelInsuranceData", 3, legacy={"pol-001"})
+    for insurance_id in ("pol-000", "pol-001"):
+        assert sharding.delete_policy("TravelInsuranceData", USER, insurance_id) is not None
+    assert sharding.delete_policy("TravelInsuranceData", USER, "pol-001") is None
+    remaining = sorted(item["insuranceId"] for item in sharding.query_user_items("TravelInsuranceData", USER))
+    assert remaining == ["pol-002"]
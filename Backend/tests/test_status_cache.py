@@ -0,0 +1,75 @@
+import json
+
+import status_cache
+from local_aws import LocalRedis
+from status_cache import MISS, RedisCache, vehicle_status_key
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def redis_cache(ttl=30, negative_ttl=10):
+    clock = Clock()
+    client = LocalRedis(clock=clock)
+    return RedisCache(client, ttl=ttl, negative_ttl=negative_ttl), client, clock
+
+def test_redis_cache_get_set_and_expiry():
+    cache, client, clock = redis_cache()
+    assert cache.get("a") is MISS
+
+    cache.set("a", {"status": "active", "expiryDate": "2027-01-01"})
+    assert cache.get("a") == {"status": "active", "expiryDate": "2027-01-01"}
+    # Stored under the prefix, as JSON
+    assert json.loads(client.get("status:a")) == {"status": "active", "expiryDate": "2027-01-01"}
+
+    clock.now += 29
+    assert cache.get("a") == {"status": "active", "expiryDate": "2027-01-01"}
+    clock.now += 2
+    assert cache.get("a") is MISS
+
+def test_redis_cache_negative_results_use_the_shorter_ttl():
+    cache, _, clock = redis_cache(ttl=30, negative_ttl=10)
+    cache.set("inactive", None)
+    assert cache.get("inactive") is None
+
+    clock.now += 11
+    assert cache.get("inactive") is MISS
+
+def test_redis_cache_delete():
+    cache, _, _ = redis_cache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    cache.delete("a", "b", "missing")
+    cache.delete()
+    assert cache.get("a") is MISS
+    assert cache.get("b") is MISS
+    assert cache.get("c") == 3
+
+def test_redis_cache_errors_are_misses():
+    class Unavailable:
+        def get(self, name):
+            raise ConnectionError("redis down")
+        set = delete = get
+
+    cache = RedisCache(Unavailable())
+    cache.set("a", 1)
+    cache.delete("a")
+    assert cache.get("a") is MISS
+
+def test_status_endpoint_through_redis_cache(aws, call):
+    cache, _, _ = redis_cache()
+    status_cache.set_status_cache(cache)
+
+    query = {"registrationNumber": "REDIS-1"}
+    assert json.loads(call("GET", "/vehicle-status", query)["body"])["status"] == "inactive"
+    assert cache.get(vehicle_status_key("REDIS-1")) is None
+
+    # Creating the policy invalidates the cached "inactive"
+    assert call("POST", "/vehicle", body={"userId": "user-1", "registrationNumber": "REDIS-1"})["statusCode"] == 200
+    assert cache.get(vehicle_status_key("REDIS-1")) is MISS
+    assert json.loads(call("GET", "/vehicle-status", query)["body"])["status"] == "active"
+    assert cache.get(vehicle_status_key("REDIS-1")) is not MISS
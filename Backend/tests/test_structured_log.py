@@ -0,0 +1,78 @@
+import json
+import logging
+
+import pytest
+
+import structured_log
+from benchmark import api_event
+
+@pytest.fixture
+def log(caplog):
+    log = structured_log.get_logger("test")
+    log.logger.setLevel(logging.DEBUG)
+    caplog.set_level(logging.DEBUG, logger="backend.test")
+    return log
+
+def written(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "backend.test"]
+
+def test_secret_fields_are_redacted(log, caplog):
+    log.info("login", password="hunter2", user={"name": "alice", "Access_Token": "abc", "otp": ["123456"]})
+    [record] = written(caplog)
+    assert record["password"] == structured_log.REDACTED
+    assert json.loads(record["user"]) == {"name": "alice", "Access_Token": structured_log.REDACTED,
+                                          "otp": structured_log.REDACTED}
+
+# API Gateway hands the body over as a JSON string, so its keys are only seen once it is parsed
+def test_secrets_in_a_raw_request_body_are_redacted(log, caplog):
+    event = api_event("POST", "/auth", body={"action": "login", "username": "alice", "password": "hunter2"},
+                      headers={"Authorization": "Bearer abc"})
+    log.debug("event", event=event)
+    log.debug("body", body=event["body"])
+    message = " ".join(record.getMessage() for record in caplog.records)
+    assert "hunter2" not in message and "Bearer abc" not in message
+
+    event_record, body_record = written(caplog)
+    logged = json.loads(event_record["event"])
+    assert logged["body"] == {"action": "login", "username": "alice", "password": structured_log.REDACTED}
+    assert logged["headers"]["Authorization"] == structured_log.REDACTED
+    assert json.loads(body_record["body"])["password"] == structured_log.REDACTED
+
+def test_bodies_that_are_not_json_are_dropped(log, caplog):
+    log.debug("event", event={"body": "password=hunter2&user=alice", "isBase64Encoded": False})
+    [record] = written(caplog)
+    assert json.loads(record["event"])["body"] == "[27 chars, not JSON]"
+
+def test_long_values_are_truncated(log, caplog, monkeypatch):
+    monkeypatch.setattr(structured_log, "MAX_FIELD_LENGTH", 10)
+    log.info("long", text="x" * 25, items={"note": "y" * 12})
+    [record] = written(caplog)
+    assert record["text"] == "x" * 10 + "...[15 more chars]"
+    assert record["items"].startswith('{"note": ')
+    assert record["items"].endswith("more chars]")
+
+def test_deeply_nested_values_are_cut_off():
+    value = {}
+    for _ in range(12):
+        value = {"next": value}
+    assert "..." in json.dumps(structured_log.redact(value))
+
+def test_sampled_records_carry_their_rate(log, caplog, monkeypatch):
+    monkeypatch.setattr(structured_log, "SAMPLE_RATES", {logging.DEBUG: 0.25})
+    draws = iter([0.1, 0.9, 0.2, 0.3])
+    monkeypatch.setattr(structured_log.random, "random", lambda: next(draws))
+    for index in range(4):
+        log.debug("sampled", index=index)
+    log.info("unsampled")
+    records = written(caplog)
+    assert [record.get("index") for record in records] == [0, 2, None]
+    assert [record.get("sampleRate") for record in records] == [0.25, 0.25, None]
+
+def test_parse_sample_rates():
+    assert structured_log.parse_sample_rates("debug=0.01, INFO=0.5,") == {logging.DEBUG: 0.01, logging.INFO: 0.5}
+
+def test_disabled_levels_are_not_formatted(log, caplog, monkeypatch):
+    log.logger.setLevel(logging.WARNING)
+    monkeypatch.setattr(structured_log, "format_field", lambda value: pytest.fail("formatted"))
+    log.debug("skipped", event={"body": "{}"})
+    assert written(caplog) == []
@@ -0,0 +1,21 @@
+import json
+
+import table_export
+
+def test_parallel_export_writes_every_item_once(aws, tmp_path):
+    table = aws.table("TravelInsuranceData")
+    for index in range(250):
+        table.put_item(Item={"userId": f"user-{index % 40:03d}", "insuranceId": f"trip-{index:04d}", "price": index})
+
+    count = table_export.export_table("TravelInsuranceData", str(tmp_path), total_segments=4, page_size=20)
+    assert count == 250
+
+    exported = []
+    for path in sorted((tmp_path / "TravelInsuranceData").glob("segment-*.ndjson")):
+        exported.extend(json.loads(line) for line in path.read_text().splitlines())
+    assert sorted(item["insuranceId"] for item in exported) == [f"trip-{index:04d}" for index in range(250)]
+
+    checkpoint = json.loads((tmp_path / "TravelInsuranceData" / "checkpoint.json").read_text())
+    assert all(segment["done"] for segment in checkpoint["segments"].values())
+    # A finished export is not read again
+    assert table_export.export_table("TravelInsuranceData", str(tmp_path), total_segments=4, page_size=20) == 250
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import router
+from benchmark import api_event
+
+def trip(index, **fields):
+    return {"userId": "user-1", "username": "Customer", "tripTitle": f"Trip {index}", **fields}
+
+def test_bulk_create_stores_fractional_prices(aws, call):
+    policies = [trip(index, price=100) for index in range(30)]
+    policies[27]["price"] = 12.5
+
+    body = json.loads(call("POST", "/travel", body=policies)["body"])
+    assert body["created"] == 30
+    assert sorted(str(item["price"]) for item in aws.table("TravelInsuranceData").items.values())[0] == "100"
+    assert "12.5" in {str(item["price"]) for item in aws.table("TravelInsuranceData").items.values()}
+
+def test_bulk_create_marks_unstorable_items_invalid(aws, call):
+    policies = [trip(index) for index in range(30)]
+    policies[27]["price"] = float("inf")
+    policies[28]["tripTitle"] = ["not", "a", "title"]
+
+    response = call("POST", "/travel", body=policies)
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["created"] == 28
+    assert [result["status"] for result in body["results"][27:]] == ["invalid", "invalid", "created"]
+    assert len(aws.table("TravelInsuranceData").items) == 28
+
+def test_single_create_with_fractional_price(aws, call):
+    assert call("POST", "/travel", body=trip(1, price=49.99))["statusCode"] == 200
+    assert call("POST", "/travel", body=trip(2, price=float("nan")))["statusCode"] == 400
+
+@pytest.mark.parametrize("path", ["/travel", "/vehicle"])
+@pytest.mark.parametrize("body", ["{oops", "[1, 2", "\xff", "'single quotes'"])
+def test_malformed_json_is_a_400(aws, path, body):
+    event = api_event("POST", path)
+    event["body"] = body
+    response = router.lambda_handler(event, None)
+    assert response["statusCode"] == 400
+    assert "valid JSON" in json.loads(response["body"])["message"]
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import user_auth
+from benchmark import EMAIL_INDEX_TABLE
+
+PASSWORD = "Test-passw0rd"
+
+@pytest.fixture(autouse=True)
+def empty_username_cache():
+    user_auth.username_cache.clear()
+    yield
+    user_auth.username_cache.clear()
+
+def auth(call, **body):
+    response = call("POST", "/auth", body=body)
+    return response["statusCode"], json.loads(response["body"])
+
+def throttle_list_users(monkeypatch, cognito):
+    def list_users(**kwargs):
+        raise ClientError({"Error": {"Code": "TooManyRequestsException", "Message": "Too many requests"}}, "ListUsers")
+    monkeypatch.setattr(cognito, "list_users", list_users)
+
+def test_forgot_password_lookup_errors_are_not_cached_as_unknown_users(call, cognito, monkeypatch):
+    cognito.add_user("alice", PASSWORD, "alice@example.com")
+
+    with monkeypatch.context() as patch:
+        throttle_list_users(patch, cognito)
+        status, _ = auth(call, action="forgot_password", email="alice@example.com")
+        assert status == 500
+        status, _ = auth(call, action="reset_password", email="alice@example.com", otp="123456", new_password="New-passw0rd")
+        assert status == 500
+
+    # Once list_users answers again the user is found straight away
+    status, body = auth(call, action="forgot_password", email="alice@example.com")
+    assert (status, body) == (200, {"message": "Password reset instructions sent."})
+    status, _ = auth(call, action="reset_password", email="alice@example.com", otp="123456", new_password="New-passw0rd")
+    assert status == 200
+
+def test_unknown_emails_are_cached_after_an_empty_list_users(call, cognito):
+    status, _ = auth(call, action="forgot_password", email="nobody@example.com")
+    assert status == 400
+    calls = cognito.list_users_calls
+
+    status, _ = auth(call, action="forgot_password", email="nobody@example.com")
+    assert status == 400
+    assert cognito.list_users_calls == calls
+
+def test_repeated_resets_call_list_users_once(call, cognito):
+    cognito.add_user("bob", PASSWORD, "bob@example.com")
+    for _ in range(5):
+        assert auth(call, action="forgot_password", email="bob@example.com")[0] == 200
+        assert auth(call, action="reset_password", email="bob@example.com", otp="123456", new_password=PASSWORD)[0] == 200
+    assert cognito.list_users_calls == 1
+
+# A user left behind by a registration that failed after sign_up
+def half_registered(cognito, username, email, password, confirmed=False):
+    cognito.sign_up(ClientId=cognito.client_id, Username=username, Password=password,
+                    UserAttributes=[{"Name": "email", "Value": email}])
+    if confirmed:
+        cognito.admin_confirm_sign_up(UserPoolId=cognito.user_pool_id, Username=username)
+
+def test_retried_registration_resumes_with_the_same_password(call, cognito):
+    half_registered(cognito, "carol", "carol@example.com", PASSWORD)
+
+    status, _ = auth(call, action="register", username="carol", password=PASSWORD, email="carol@example.com")
+    assert status == 200
+    assert cognito.users["carol"]["status"] == "CONFIRMED"
+    assert cognito.users["carol"]["attributes"]["email_verified"] == "true"
+    assert auth(call, action="login", username="carol", password=PASSWORD)[0] == 200
+
+@pytest.mark.parametrize("confirmed", [False, True])
+def test_pending_registration_is_not_resumed_with_another_password(call, cognito, confirmed):
+    half_registered(cognito, "dave", "dave@example.com", PASSWORD, confirmed)
+
+    status, body = auth(call, action="register", username="dave", password="Guessed-passw0rd", email="dave@example.com")
+    assert (status, body) == (400, {"error": "User already exists."})
+    assert cognito.users["dave"]["status"] == ("CONFIRMED" if confirmed else "UNCONFIRMED")
+    assert cognito.users["dave"]["attributes"].get("email_verified") != "true"
+    assert cognito.users["dave"]["password"] == PASSWORD
+
+@pytest.fixture
+def email_index(aws, monkeypatch):
+    monkeypatch.setattr(user_auth, "EMAIL_INDEX_TABLE", EMAIL_INDEX_TABLE)
+    return aws.table(EMAIL_INDEX_TABLE)
+
+def test_registration_records_the_email_mapping(call, cognito, email_index):
+    status, _ = auth(call, action="register", username="erin", password=PASSWORD, email="Erin@Example.com")
+    assert status == 200
+    assert email_index.items[("erin@example.com", None)]["username"] == "erin"
+
+def test_email_mapped_to_another_user_is_kept(cognito, email_index):
+    user_auth.save_email_mapping("shared@example.com", "frank")
+    user_auth.save_email_mapping("shared@example.com", "grace")
+    assert email_index.items[("shared@example.com", None)]["username"] == "frank"
+    assert user_auth.username_cache.get("shared@example.com") == "frank"
+
+    # Saving the same mapping again is fine
+    user_auth.save_email_mapping("shared@example.com", "frank")
+    assert email_index.items[("shared@example.com", None)]["username"] == "frank"
+
+def test_forgetting_a_mapping_only_removes_the_users_own(cognito, email_index):
+    user_auth.save_email_mapping("shared@example.com", "frank")
+    user_auth.forget_email_mapping("shared@example.com", "grace")
+    assert ("shared@example.com", None) in email_index.items
+    user_auth.forget_email_mapping("shared@example.com", "frank")
+    assert ("shared@example.com", None) not in email_index.items
+
+# A registration that fails after sign_up rolls back without deleting another user's mapping
+def test_rollback_keeps_another_users_mapping(call, cognito, email_index, monkeypatch):
+    user_auth.save_email_mapping("heidi@example.com", "heidi")
+
+    def confirm_fails(**kwargs):
+        raise ClientError({"Error": {"Code": "InternalErrorException", "Message": "Internal error"}}, "AdminConfirmSignUp")
+    monkeypatch.setattr(cognito, "admin_confirm_sign_up", confirm_fails)
+
+    status, _ = auth(call, action="register", username="ivan", password=PASSWORD, email="heidi@example.com")
+    assert status == 500
+    assert "ivan" not in cognito.users
+    assert email_index.items[("heidi@example.com", None)]["username"] == "heidi"
@@ -0,0 +1,65 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import router
+from benchmark import api_event
+
+def test_parallel_duplicate_registrations_create_one_policy(aws, call):
+    # Every request sleeps in the stand-in, so they overlap like concurrent Lambda invocations
+    aws.latency = 0.005
+    body = {"userId": "user-1", "registrationNumber": "DUP-001", "make": "Toyota", "model": "Corolla"}
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = sorted(executor.map(lambda _: call("POST", "/vehicle", body=body)["statusCode"], range(16)))
+
+    assert statuses == [200] + [409] * 15
+    policies = [item for item in aws.table("VehicleInsuranceData").items.values()
+                if item["registrationNumber"] == "DUP-001"]
+    assert len(policies) == 1
+    lock = aws.table("VehicleRegistrationLocks").items[("DUP-001", None)]
+    assert lock["insuranceId"] == policies[0]["insuranceId"]
+
+def test_registration_is_free_again_after_cancel(aws, call):
+    body = {"userId": "user-1", "registrationNumber": "DUP-002"}
+    assert call("POST", "/vehicle", body=body)["statusCode"] == 200
+    assert call("POST", "/vehicle", body=body)["statusCode"] == 409
+
+    policy = json.loads(call("GET", "/vehicle", {"userId": "user-1"})["body"])["policies"][0]
+    cancel = call("DELETE", "/delete-car-insurance", {"userId": "user-1", "insuranceId": policy["insuranceId"]})
+    assert cancel["statusCode"] == 200
+    assert call("POST", "/vehicle", body=body)["statusCode"] == 200
+
+def bulk_vehicles(count, prefix):
+    return [{"userId": "fleet-1", "registrationNumber": f"{prefix}{index:03d}", "price": 100} for index in range(count)]
+
+def test_bulk_create_stores_fractional_prices(aws, call):
+    policies = bulk_vehicles(30, "BULK")
+    policies[27]["price"] = 12.5
+
+    response = call("POST", "/vehicle", body=policies)
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["created"] == 30
+    prices = {item["registrationNumber"]: item["price"] for item in aws.table("VehicleInsuranceData").items.values()}
+    assert str(prices["BULK027"]) == "12.5"
+
+def test_bulk_create_rejects_unstorable_items_before_writing(aws, call):
+    policies = bulk_vehicles(30, "BAD")
+    # NaN parses as a float, and a 40-digit price does not fit a DynamoDB number
+    policies[26]["price"] = float("nan")
+    policies[27]["price"] = "PRECISE"
+    policies[28]["userId"] = 42
+    event = api_event("POST", "/vehicle", body=policies)
+    event["body"] = event["body"].replace('"PRECISE"', "1.234567890123456789012345678901234567891")
+
+    response = router.lambda_handler(event, None)
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["created"] == 27
+    assert [result["status"] for result in body["results"][25:29]] == ["created", "invalid", "invalid", "invalid"]
+    assert body["results"][26]["message"] == "price has a value that cannot be stored"
+    assert len(aws.table("VehicleInsuranceData").items) == 27
+
+def test_single_create_validates_the_body(aws, call):
+    assert call("POST", "/vehicle", body={"userId": "user-1"})["statusCode"] == 400
+    assert call("POST", "/vehicle", body={"userId": "user-1", "registrationNumber": "ONE", "price": 99.5})["statusCode"] == 200
@@ -0,0 +1,74 @@
+import json
+import os
+from botocore.exceptions import ClientError
+from dynamodb_batch import bulk_delete_policies, parse_bulk_cancel_request
+from http_responses import error_response, json_response
+from metrics import instrumented
+from retries import with_deadline
+from sharding import delete_policy
+from status_cache import get_status_cache, travel_status_key
+from structured_log import get_logger
+
+TABLE_NAME = 'TravelInsuranceData'
+
+# Bulk cancels: concurrent batch calls per request
+BULK_CANCEL_WORKERS = int(os.getenv('BULK_CANCEL_WORKERS', '4'))
+
+log = get_logger('travel_cancel')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    log.debug("event", event=event)
+
+    try:
+        # A JSON body means a bulk cancel
+        if event.get('body'):
+            try:
+                body = json.loads(event['body'])
+            except ValueError:
+                return error_response(400, "Body must be valid JSON")
+            return handle_bulk_cancel(body)
+
+        # Get the request parameters from query string
+        query_params = event.get('queryStringParameters') or {}
+        user_id = query_params.get('userId')
+        insurance_id = query_params.get('insuranceId')
+
+        if not user_id or not insurance_id:
+            return error_response(400, "userId and insuranceId are required")
+
+        # Delete the policy from DynamoDB using the userId and insuranceId, failing if it does not exist
+        response = delete_policy(TABLE_NAME, user_id, insurance_id)
+        if response is None:
+            return error_response(404, "Policy not found")
+
+        get_status_cache().delete(travel_status_key(user_id))
+
+        # Check if the deletion was successful
+        if response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 200:
+            return json_response(200, {"message": "Policy deleted successfully"})
+        else:
+            return error_response(500, "Failed to delete policy")
+
+    except ClientError as e:
+        log.error("cancel_failed", error=e.response['Error']['Message'])
+        return error_response(500, "An error occurred while deleting the policy")
+
+def handle_bulk_cancel(body):
+    try:
+        user_id, insurance_ids = parse_bulk_cancel_request(body)
+    except ValueError as e:
+        return error_response(400, str(e))
+
+    deleted, missing, failed = bulk_delete_policies(
+        TABLE_NAME, user_id, insurance_ids, max_workers=BULK_CANCEL_WORKERS
+    )
+    if deleted:
+        get_status_cache().delete(travel_status_key(user_id))
+
+    return json_response(200, {
+        "deleted": [item['insuranceId'] for item in deleted],
+        "notFound": missing,
+        "failed": failed
+    })
@@ -0,0 +1,132 @@
+import json
+import uuid
+import datetime
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from dynamodb_batch import batch_write, unstorable_field
+from http_responses import json_response
+from idempotency import with_idempotency
+from metrics import instrumented
+from policy_updates import handle_patch
+from retries import with_deadline
+from sharding import owner_user_id, partition_key
+from status_cache import get_status_cache, travel_status_key
+from structured_log import get_logger
+
+TABLE_NAME = 'TravelInsuranceData'
+
+# Fields a PATCH may change (see policy_updates.py)
+UPDATABLE_FIELDS = ['title', 'insuranceType', 'price', 'startDate', 'endDate']
+
+# Maximum number of policies accepted by one bulk request
+MAX_BULK_POLICIES = 500
+
+log = get_logger('travel_policies')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    try:
+        if event.get('httpMethod') == 'PATCH':
+            return handle_patch(event, TABLE_NAME, UPDATABLE_FIELDS, on_updated=forget_cached_policies)
+
+        # Retries carrying the same Idempotency-Key get the first response back
+        return with_idempotency(event, 'travel_policies', handle_create)
+
+    except ClientError as e:
+        log.error('save_failed', error=str(e))
+        return json_response(500, {'message': 'Failed to save travel insurance data', 'error': str(e)})
+
+def handle_create(event):
+    # Parse the incoming event
+    try:
+        # Prices must reach DynamoDB as Decimal, not float
+        body = json.loads(event.get('body') or '{}', parse_float=Decimal)
+    except ValueError:
+        return json_response(400, {'message': 'Body must be valid JSON'})
+
+    # A JSON array of policies is handled as one bulk request
+    if isinstance(body, list):
+        return handle_bulk_create(body)
+
+    item, error = parse_policy(body)
+    if error:
+        return json_response(400, {'message': error})
+
+    # Put the item into the DynamoDB table
+    get_table(TABLE_NAME).put_item(Item=item)
+    forget_cached_policies(item)
+
+    return json_response(200, {'message': 'Travel insurance data saved successfully!'})
+
+# (item, None), or (None, why the request body cannot be stored as a policy)
+def parse_policy(body):
+    item = build_travel_item(body) if isinstance(body, dict) else None
+    if not item:
+        return None, 'Missing required fields'
+    field = unstorable_field(item)
+    if field:
+        return None, f'{field} has a value that cannot be stored'
+    return item, None
+
+# Returns the item to store, or None if a required field is missing
+def build_travel_item(body):
+    user_id = body.get('userId')
+    username = body.get('username')
+    trip_title = body.get('tripTitle')
+
+    if not all(isinstance(value, str) and value for value in (user_id, username, trip_title)):
+        return None
+
+    # Generate a unique insurance ID
+    insurance_id = str(uuid.uuid4())
+
+    # Create the item to be stored in DynamoDB
+    return {
+        # Sharded users' policies are spread over several partitions (see sharding.py)
+        'userId': partition_key(user_id, insurance_id),
+        'insuranceId': insurance_id,
+        'customer_name': username,
+        'title': trip_title,
+        'insuranceType': body.get('insuranceType', 'Short Term'),
+        'price': body.get('price', 100),
+        'startDate': body.get('startDate', 'Not available'),
+        'endDate': body.get('endDate', 'Not available'),
+        # Store timestamp for record creation
+        'createdAt': str(datetime.datetime.utcnow()),
+        # Optimistic-locking version, bumped by every PATCH
+        'version': 1
+    }
+
+def forget_cached_policies(item):
+    get_status_cache().delete(travel_status_key(owner_user_id(item['userId'])))
+
+# Create many policies with chunked BatchWriteItem and report a result for each, in request order
+def handle_bulk_create(policies):
+    if not policies or len(policies) > MAX_BULK_POLICIES:
+        return json_response(400, {'message': f'Bulk requests must contain between 1 and {MAX_BULK_POLICIES} policies'})
+
+    # Validate everything in one pass before writing anything
+    results = []
+    items = []
+    for index, body in enumerate(policies):
+        item, error = parse_policy(body)
+        if error:
+            results.append({'index': index, 'status': 'invalid', 'message': error})
+        else:
+            items.append(item)
+            results.append({'index': index, 'status': 'created', 'insuranceId': item['insuranceId']})
+
+    unprocessed = batch_write(TABLE_NAME, [{'PutRequest': {'Item': item}} for item in items])
+    failed_ids = {request['PutRequest']['Item']['insuranceId'] for request in unprocessed}
+    for result in results:
+        if result.get('insuranceId') in failed_ids:
+            result['status'] = 'failed'
+            result['message'] = 'Write was throttled, please retry it in a new request'
+            del result['insuranceId']
+
+    created_items = [item for item in items if item['insuranceId'] not in failed_ids]
+    get_status_cache().delete(*{travel_status_key(owner_user_id(item['userId'])) for item in created_items})
+
+    return json_response(200, {'created': len(created_items), 'total': len(policies), 'results': results})
@@ -0,0 +1,89 @@
+from botocore.exceptions import ClientError
+from http_responses import error_response, json_response
+from json_encoding import dumps
+from metrics import instrumented
+from pagination import decode_next_token, encode_next_token, parse_limit
+from policy_summary import SUMMARY_READS_ENABLED, get_summary, summary_first_page
+from retries import with_deadline
+from sharding import query_user_page
+from status_cache import MISS, get_status_cache, travel_status_key
+from structured_log import get_logger
+
+TABLE_NAME = 'TravelInsuranceData'
+
+log = get_logger('travel_status')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    log.debug("event", event=event)
+
+    try:
+        # Parse query parameters
+        query_params = event.get("queryStringParameters") or {}
+        user_id = query_params.get("userId")
+        
+        if not user_id:
+            return error_response(400, "Missing required parameter: userId")
+
+        try:
+            limit = parse_limit(query_params.get("limit"))
+            start_key = decode_next_token(query_params.get("nextToken"))
+        except ValueError as e:
+            return error_response(400, str(e))
+
+        # Only the first page at the default size is cached, so writes invalidate a single key
+        cacheable = not start_key and query_params.get("limit") is None
+        cache = get_status_cache()
+        cache_key = travel_status_key(user_id)
+
+        # A summary is a single get_item already, so it is not cached again
+        if not start_key and SUMMARY_READS_ENABLED:
+            body = summary_page(user_id, limit)
+        else:
+            body = cache.get(cache_key) if cacheable else MISS
+        if body is MISS:
+            body = query_policies_page(user_id, limit, start_key)
+            if cacheable:
+                cache.set(cache_key, body)
+
+        if body is not None:
+            return json_response(200, body)
+        else:
+            return json_response(200, {"status": "inactive", "message": "No policies found for this userId."})
+
+    except ClientError as e:
+        log.error("query_failed", error=e.response['Error']['Message'])
+        return json_response(500, {"error": "An error occurred while retrieving policies.", "details": str(e)})
+
+# Same body as query_policies_page, from the precomputed summary (MISS if there is none to use)
+def summary_page(user_id, limit):
+    summary = get_summary(user_id, 'travel')
+    if summary is None:
+        return MISS
+    policies, last_key = summary_first_page(summary, limit)
+    if not policies:
+        return None
+    return dumps({
+        "status": "active",
+        "policies": [dict(policy, userId=user_id) for policy in policies],
+        "nextToken": encode_next_token(last_key)
+    })
+
+# Returns the "active" response body for one page, or None if the user has no policies
+def query_policies_page(user_id, limit, start_key):
+    # Query one page of policies related to userId (one query per shard for a sharded user)
+    response = query_user_page(TABLE_NAME, user_id, limit, start_key)
+
+    log.info("policies_page", userId=user_id, count=response["Count"], more=("LastEvaluatedKey" in response))
+
+    if not response["Items"] and not start_key:
+        return None
+
+    # Items carry Decimal prices, so encode with the DynamoDB-aware serializer
+    return dumps({
+        "status": "active",
+        # Sharded items are stored under "<userId>#<shard>"; callers only know the userId
+        "policies": [dict(item, userId=user_id) for item in response["Items"]],
+        "nextToken": encode_next_token(response.get("LastEvaluatedKey"))
+    })
@@ -0,0 +1,367 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from aws_clients import get_cognito_client, get_table
+from cognito_jwt import TokenValidationError, verify_pool_token
+from http_responses import error_response, json_response
+from metrics import instrumented
+from retries import with_deadline
+from status_cache import MISS, LocalCache
+from structured_log import get_logger
+
+log = get_logger("user_auth")
+
+# Get environment variables
+USER_POOL_ID = os.getenv("USER_POOL_ID")
+CLIENT_ID = os.getenv("CLIENT_ID")
+
+# Optional DynamoDB table (partition key "email") mapping emails to Cognito usernames,
+# filled in by register_user so password resets rarely need list_users
+EMAIL_INDEX_TABLE = os.getenv("EMAIL_INDEX_TABLE")
+
+# Runs the independent post-sign-up registration steps; reused across invocations
+REGISTRATION_WORKERS = 3
+registration_executor = ThreadPoolExecutor(max_workers=REGISTRATION_WORKERS)
+
+# "local" verifies tokens against the pool's JWKS; "cognito" always calls get_user
+TOKEN_VALIDATION_MODE = os.getenv("TOKEN_VALIDATION_MODE", "local")
+
+# Per-container email -> username cache; unknown emails are cached for a shorter time
+username_cache = LocalCache(
+    max_entries=int(os.getenv("USERNAME_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("USERNAME_CACHE_TTL", "300")),
+    negative_ttl=float(os.getenv("USERNAME_CACHE_NEGATIVE_TTL", "30")),
+)
+
+# Function to validate required parameters
+def validate_params(event, required_fields):
+    for field in required_fields:
+        if field not in event or not event[field]:
+            return error_response(400, f"Missing required parameter: {field}")
+    return None
+
+def normalize_email(email):
+    return email.strip().lower()
+
+# Function to fetch username from email: container cache, then the email index table, then Cognito.
+# Only an answer from list_users is cached as "not found"; its errors are raised, not cached.
+def get_username_by_email(email):
+    key = normalize_email(email)
+    username = username_cache.get(key)
+    if username is not MISS:
+        return username
+
+    username = lookup_indexed_username(key)
+    if username is None:
+        username = list_username_by_email(email)
+        if username:
+            save_email_mapping(email, username)
+
+    username_cache.set(key, username)
+    return username
+
+# Cognito list_users is slow and has a low request quota, so it is the last resort
+def list_username_by_email(email):
+    cognito_client = get_cognito_client()
+    response = cognito_client.list_users(
+        UserPoolId=USER_POOL_ID,
+        Filter=f'email = "{email}"',
+        Limit=1
+    )
+    if response["Users"]:
+        return response["Users"][0]["Username"]
+    else:
+        return None  # User not found
+
+def lookup_indexed_username(key):
+    if not EMAIL_INDEX_TABLE:
+        return None
+    try:
+        response = get_table(EMAIL_INDEX_TABLE).get_item(Key={"email": key})
+        return response.get("Item", {}).get("username")
+    except ClientError as e:
+        log.error("error_reading_email_index", error=str(e))
+        return None
+
+# Record the mapping in the index table (if configured) and the container cache. An email
+# already mapped to another user keeps that mapping.
+def save_email_mapping(email, username):
+    key = normalize_email(email)
+    if EMAIL_INDEX_TABLE:
+        try:
+            get_table(EMAIL_INDEX_TABLE).put_item(
+                Item={"email": key, "username": username},
+                ConditionExpression="attribute_not_exists(email) OR username = :u",
+                ExpressionAttributeValues={":u": username},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                log.warning("email_mapped_to_another_user", username=username)
+                return
+            log.error("error_writing_email_index", error=str(e))
+    username_cache.set(key, username)
+
+# Drop a mapping that turned out to be stale, unless it has since been taken by another user
+def forget_email_mapping(email, username):
+    key = normalize_email(email)
+    username_cache.delete(key)
+    if not EMAIL_INDEX_TABLE:
+        return
+    try:
+        get_table(EMAIL_INDEX_TABLE).delete_item(
+            Key={"email": key},
+            ConditionExpression="attribute_not_exists(email) OR username = :u",
+            ExpressionAttributeValues={":u": username},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            log.error("error_deleting_from_email_index", error=str(e))
+
+# Function to send forgot password OTP
+def forgot_password(event):
+    cognito_client = get_cognito_client()
+    validation_error = validate_params(event, ["email"])
+    if validation_error:
+        return validation_error
+
+    email = event["email"]
+    try:
+        username = get_username_by_email(email)
+    except ClientError as e:
+        log.error("error_fetching_username_by_email", error=str(e))
+        return error_response(500, "Could not look up the user, please try again.")
+    if not username:
+        return error_response(400, "User not found.")
+
+    try:
+        cognito_client.forgot_password(ClientId=CLIENT_ID, Username=username)
+        return json_response(200, {"message": "Password reset instructions sent."})
+    
+    except cognito_client.exceptions.UserNotFoundException:
+        forget_email_mapping(email, username)
+        return error_response(400, "User not found.")
+    except Exception as e:
+        log.error("error_sending_password_reset_email", error=str(e))
+        return error_response(500, str(e))
+
+# Function to reset password with OTP verification
+def reset_password(event):
+    cognito_client = get_cognito_client()
+    validation_error = validate_params(event, ["email", "otp", "new_password"])
+    if validation_error:
+        return validation_error
+
+    email = event["email"]
+    otp = event["otp"]
+    new_password = event["new_password"]
+    try:
+        username = get_username_by_email(email)
+    except ClientError as e:
+        log.error("error_fetching_username_by_email", error=str(e))
+        return error_response(500, "Could not look up the user, please try again.")
+
+    if not username:
+        return error_response(400, "User not found.")
+
+    try:
+        cognito_client.confirm_forgot_password(
+            ClientId=CLIENT_ID,
+            Username=username,
+            ConfirmationCode=otp,
+            Password=new_password,
+        )
+        return json_response(200, {"message": "Password reset successfully."})
+
+    except cognito_client.exceptions.CodeMismatchException:
+        return error_response(400, "Invalid OTP code.")
+    except cognito_client.exceptions.ExpiredCodeException:
+        return error_response(400, "OTP code has expired.")
+    except cognito_client.exceptions.UserNotFoundException:
+        forget_email_mapping(email, username)
+        return error_response(400, "User not found.")
+    except Exception as e:
+        log.error("error_resetting_password", error=str(e))
+        return error_response(500, str(e))
+
+
+# Function to register user. sign_up creates the user; confirming it and marking the email as
+# verified only need the user to exist, so those steps run concurrently. A retried request that
+# finds its own half-registered user (same email, and the password signs in) resumes the
+# remaining steps, and a user created by this call is deleted again if the later steps fail.
+def register_user(event):
+    cognito_client = get_cognito_client()
+    validation_error = validate_params(event, ["username", "password", "email"])
+    if validation_error:
+        return validation_error
+
+    username = event["username"]
+    email = event["email"]
+    created = False
+
+    try:
+        try:
+            cognito_client.sign_up(
+                ClientId=CLIENT_ID,
+                Username=username,
+                Password=event["password"],
+                UserAttributes=[{"Name": "email", "Value": email}],
+            )
+            created = True
+            needs_confirmation = True
+        except cognito_client.exceptions.UsernameExistsException:
+            pending = get_pending_registration(username, email)
+            if pending is None or not password_matches(username, event["password"]):
+                return error_response(400, "User already exists.")
+            needs_confirmation = pending
+
+        complete_registration(username, email, needs_confirmation)
+        return json_response(200, {"message": "User registration successful"})
+
+    except Exception as e:
+        log.error("error_registering_user", error=str(e))
+        if created:
+            rollback_registration(username, email)
+        return error_response(500, str(e))
+
+# For an existing user with the same email whose registration did not finish, returns whether
+# it still needs confirming; returns None if the user is fully registered or someone else's
+def get_pending_registration(username, email):
+    user = get_cognito_client().admin_get_user(UserPoolId=USER_POOL_ID, Username=username)
+    attributes = {attribute["Name"]: attribute["Value"] for attribute in user.get("UserAttributes", [])}
+
+    if attributes.get("email") != email:
+        return None
+    needs_confirmation = user.get("UserStatus") == "UNCONFIRMED"
+    if not needs_confirmation and attributes.get("email_verified") == "true":
+        return None
+    return needs_confirmation
+
+# Whether the password is the user's, so a request cannot take over someone else's pending
+# registration by knowing their username and email. Cognito checks the password before it
+# refuses an unconfirmed user.
+def password_matches(username, password):
+    cognito_client = get_cognito_client()
+    try:
+        cognito_client.initiate_auth(
+            ClientId=CLIENT_ID,
+            AuthFlow="USER_PASSWORD_AUTH",
+            AuthParameters={"USERNAME": username, "PASSWORD": password},
+        )
+        return True
+    except cognito_client.exceptions.UserNotConfirmedException:
+        return True
+    except cognito_client.exceptions.NotAuthorizedException:
+        return False
+
+# Confirm user & verify email automatically, in parallel
+def complete_registration(username, email, needs_confirmation):
+    cognito_client = get_cognito_client()
+    futures = [
+        registration_executor.submit(
+            cognito_client.admin_update_user_attributes,
+            UserPoolId=USER_POOL_ID,
+            Username=username,
+            UserAttributes=[{"Name": "email_verified", "Value": "true"}],
+        ),
+        registration_executor.submit(save_email_mapping, email, username),
+    ]
+    if needs_confirmation:
+        futures.append(
+            registration_executor.submit(cognito_client.admin_confirm_sign_up, UserPoolId=USER_POOL_ID, Username=username)
+        )
+
+    # Wait for every step, then surface the first failure
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error:
+            raise error
+
+# Compensation for a registration that failed after sign_up
+def rollback_registration(username, email):
+    try:
+        get_cognito_client().admin_delete_user(UserPoolId=USER_POOL_ID, Username=username)
+        forget_email_mapping(email, username)
+    except Exception as e:
+        log.error("error_rolling_back_registration", username=username, error=str(e))
+
+# Function to log in user
+def login_user(event):
+    cognito_client = get_cognito_client()
+    validation_error = validate_params(event, ["username", "password"])
+    if validation_error:
+        return validation_error
+
+    try:
+        response = cognito_client.initiate_auth(
+            ClientId=CLIENT_ID,
+            AuthFlow="USER_PASSWORD_AUTH",
+            AuthParameters={"USERNAME": event["username"], "PASSWORD": event["password"]},
+        )
+        return json_response(200, response["AuthenticationResult"])
+
+    except cognito_client.exceptions.NotAuthorizedException:
+        return error_response(400, "Invalid credentials.")
+    except cognito_client.exceptions.UserNotConfirmedException:
+        return error_response(400, "User is not confirmed.")
+    except Exception as e:
+        log.error("error_logging_in_user", error=str(e))
+        return error_response(500, str(e))
+
+# Function to validate token. By default the token is verified locally against the user pool's
+# cached JWKS; pass "full_attributes": true (or set TOKEN_VALIDATION_MODE=cognito) to call
+# Cognito get_user and return the user's attributes as well.
+def validate_token(event):
+    validation_error = validate_params(event, ["access_token"])
+    if validation_error:
+        return validation_error
+
+    if TOKEN_VALIDATION_MODE == "local" and not event.get("full_attributes"):
+        try:
+            claims = verify_pool_token(event["access_token"])
+            return json_response(200, {"Username": claims.get("username"), "claims": claims})
+
+        except TokenValidationError as e:
+            log.info("token_rejected", error=str(e))
+            return error_response(401, "Invalid token.")
+        except Exception as e:
+            log.error("error_validating_token", error=str(e))
+            return error_response(500, str(e))
+
+    cognito_client = get_cognito_client()
+    try:
+        response = cognito_client.get_user(AccessToken=event["access_token"])
+        return json_response(200, response)
+
+    except cognito_client.exceptions.NotAuthorizedException:
+        return error_response(401, "Invalid token.")
+    except Exception as e:
+        log.error("error_validating_token", error=str(e))
+        return error_response(500, str(e))
+
+# Main Lambda handler
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    # Extract body from API Gateway request
+    try:
+        body = json.loads(event["body"]) if "body" in event else event
+    except Exception as e:
+        return error_response(400, "Invalid JSON format")
+
+    action = body.get("action")
+    log.info("request", action=action)
+    log.debug("body", body=body)
+
+    action_map = {
+        "register": register_user,
+        "login": login_user,
+        "forgot_password": forgot_password,
+        "reset_password": reset_password,
+        "validate": validate_token,
+    }
+
+    if action in action_map:
+        return action_map[action](body)
+    else:
+        return error_response(400, "Invalid action.")
\ No newline at end of file
@@ -0,0 +1,115 @@
+import json
+import os
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from dynamodb_batch import batch_get, batch_write, bulk_delete_policies, parse_bulk_cancel_request
+from http_responses import PREFLIGHT_RESPONSE, error_response, json_response
+from metrics import instrumented
+from retries import with_deadline
+from sharding import delete_policy
+from status_cache import get_status_cache, vehicle_status_key
+from structured_log import get_logger
+
+TABLE_NAME = "VehicleInsuranceData"
+REGISTRATION_LOCK_TABLE = os.getenv("REGISTRATION_LOCK_TABLE", "VehicleRegistrationLocks")
+
+# Bulk cancels: concurrent batch calls per request
+BULK_CANCEL_WORKERS = int(os.getenv("BULK_CANCEL_WORKERS", "4"))
+
+log = get_logger("vehicle_cancel")
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    # Handle preflight request (CORS)
+    if event["httpMethod"] == "OPTIONS":
+        return PREFLIGHT_RESPONSE
+
+    if event["httpMethod"] != "DELETE":
+        return error_response(405, "Method not allowed")
+
+    try:
+        # A JSON body means a bulk cancel
+        if event.get("body"):
+            try:
+                body = json.loads(event["body"])
+            except ValueError:
+                return error_response(400, "Body must be valid JSON")
+            return handle_bulk_cancel(body)
+
+        # Access query parameters from the URL
+        query_params = event.get("queryStringParameters") or {}
+        user_id = query_params.get("userId")
+        insurance_id = query_params.get("insuranceId")
+
+        if not user_id or not insurance_id:
+            return error_response(400, "Missing userId or insuranceId")
+
+        # Delete the policy from DynamoDB, failing if it does not exist
+        response = delete_policy(TABLE_NAME, user_id, insurance_id, ReturnValues="ALL_OLD")
+        if response is None:
+            return error_response(404, "Policy not found")
+
+        # Free the registration number so the vehicle can be insured again
+        registration_number = response.get("Attributes", {}).get("registrationNumber")
+        if registration_number:
+            release_registration_lock(registration_number, insurance_id)
+            get_status_cache().delete(vehicle_status_key(registration_number))
+
+        return json_response(200, {"message": "Policy cancelled successfully"})
+
+    except Exception as e:
+        log.error("cancel_failed", error=str(e))
+        return error_response(500, str(e))
+
+def handle_bulk_cancel(body):
+    try:
+        user_id, insurance_ids = parse_bulk_cancel_request(body)
+    except ValueError as e:
+        return error_response(400, str(e))
+
+    deleted, missing, failed = bulk_delete_policies(
+        TABLE_NAME, user_id, insurance_ids,
+        projection=("registrationNumber",), max_workers=BULK_CANCEL_WORKERS
+    )
+    release_registration_locks(deleted)
+    get_status_cache().delete(*[vehicle_status_key(item["registrationNumber"]) for item in deleted if item.get("registrationNumber")])
+
+    return json_response(200, {
+        "deleted": [item["insuranceId"] for item in deleted],
+        "notFound": missing,
+        "failed": failed
+    })
+
+# Bulk version of release_registration_lock: read the locks and delete only those still
+# pointing at one of the deleted policies
+def release_registration_locks(deleted):
+    owners = {item["registrationNumber"]: item["insuranceId"] for item in deleted if item.get("registrationNumber")}
+    if not owners:
+        return
+
+    locks = batch_get(
+        REGISTRATION_LOCK_TABLE,
+        [{"registrationNumber": registration_number} for registration_number in owners],
+        max_workers=BULK_CANCEL_WORKERS
+    )
+    requests = [
+        {"DeleteRequest": {"Key": {"registrationNumber": lock["registrationNumber"]}}}
+        for lock in locks
+        if lock.get("insuranceId") == owners[lock["registrationNumber"]]
+    ]
+    unprocessed = batch_write(REGISTRATION_LOCK_TABLE, requests, max_workers=BULK_CANCEL_WORKERS)
+    for request in unprocessed:
+        log.error("lock_release_failed", registrationNumber=request["DeleteRequest"]["Key"]["registrationNumber"])
+
+# Only remove the lock if it still belongs to the cancelled policy
+def release_registration_lock(registration_number, insurance_id):
+    try:
+        get_table(REGISTRATION_LOCK_TABLE).delete_item(
+            Key={"registrationNumber": registration_number},
+            ConditionExpression="insuranceId = :insurance_id",
+            ExpressionAttributeValues={":insurance_id": insurance_id}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
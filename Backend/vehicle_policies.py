@@ -0,0 +1,283 @@
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import get_client
+from dynamodb_batch import chunked, unstorable_field
+from http_responses import json_response
+from idempotency import with_idempotency
+from metrics import instrumented
+from pagination import decode_next_token, encode_next_token, parse_limit
+from policy_summary import SUMMARY_READS_ENABLED, get_summary, summary_first_page
+from policy_updates import handle_patch
+from retries import with_deadline
+from sharding import partition_key, query_user_page
+from status_cache import get_status_cache, vehicle_status_key
+from structured_log import get_logger
+
+TABLE_NAME = 'VehicleInsuranceData'
+
+# One item per registration number, written in the same transaction as the policy
+REGISTRATION_LOCK_TABLE = os.getenv('REGISTRATION_LOCK_TABLE', 'VehicleRegistrationLocks')
+
+# Bulk creates: at most this many policies per request, written as transactions of
+# up to 25 policies (50 lock + policy puts)
+MAX_BULK_POLICIES = 500
+BULK_TRANSACTION_POLICIES = 25
+
+# Fields a PATCH may change; registrationNumber is held by a lock and expiryDate by the sweep
+UPDATABLE_FIELDS = ['insuranceType', 'price', 'make', 'model', 'serviceDate']
+
+# Only the fields returned by handle_get are read from DynamoDB
+POLICY_FIELDS = ['insuranceId', 'registrationNumber', 'make', 'model', 'insuranceType', 'price', 'expiryDate', 'policyStatus', 'version']
+
+log = get_logger('vehicle_policies')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    try:
+        log.info('request', method=event.get('httpMethod'), path=event.get('path'))
+        log.debug('event', event=event)
+
+        if 'httpMethod' in event and event['httpMethod'] == 'GET':
+            return handle_get(event)
+
+        if event.get('httpMethod') == 'PATCH':
+            return handle_patch(event, TABLE_NAME, UPDATABLE_FIELDS, on_updated=forget_cached_status)
+
+        # Retries carrying the same Idempotency-Key get the first response back
+        return with_idempotency(event, 'vehicle_policies', handle_create)
+
+    except Exception as e:
+        log.error('request_failed', error=str(e))
+        return json_response(500, {'message': 'Failed to process request', 'error': str(e)})
+
+def handle_create(event):
+    if 'body' not in event or not event['body']:
+        log.warning('missing_body')
+        return json_response(400, {'message': 'Bad Request: Missing body'})
+
+    try:
+        # Prices must reach DynamoDB as Decimal, not float
+        body = json.loads(event['body'], parse_float=Decimal)
+    except ValueError:
+        return json_response(400, {'message': 'Bad Request: Body must be valid JSON'})
+
+    # A JSON array of policies is handled as one bulk request
+    if isinstance(body, list):
+        return handle_bulk_create(body)
+
+    vehicle_data, error = parse_policy(body)
+    if error:
+        return json_response(400, {'message': error})
+
+    # Claim the registration number and insert the policy atomically
+    if not put_policy_with_registration_lock(vehicle_data):
+        return json_response(409, {'message': 'Vehicle registration number already exists. Refresh this page to add a new vehicle'})
+
+    log.info('policy_created', insuranceId=vehicle_data['insuranceId'])
+
+    # Drop any cached "inactive" status for this vehicle
+    get_status_cache().delete(vehicle_status_key(vehicle_data['registrationNumber']))
+
+    return json_response(200, {'message': 'Insurance data saved successfully! Redirecting to Policies in 3 seconds ...'})
+
+# (vehicle_data, None), or (None, why the request body cannot be stored as a policy)
+def parse_policy(body):
+    if not isinstance(body, dict) or not all(isinstance(body.get(field), str) and body[field] for field in ('userId', 'registrationNumber')):
+        return None, 'userId and registrationNumber are required'
+    vehicle_data = build_vehicle_data(body)
+    field = unstorable_field(vehicle_data)
+    if field:
+        return None, f'{field} has a value that cannot be stored'
+    return vehicle_data, None
+
+def build_vehicle_data(body):
+    # Calculate expiry date (Today + 1 Year)
+    expiry_date = (datetime.utcnow() + timedelta(days=365)).strftime('%Y-%m-%d')
+    insurance_id = str(uuid.uuid4())
+
+    # Insert new record with expiryDate
+    return {
+        # Sharded users' policies are spread over several partitions (see sharding.py)
+        'userId': partition_key(body['userId'], insurance_id),
+        'insuranceId': insurance_id,
+        'registrationNumber': body['registrationNumber'],
+        'make': body.get('make', ''),
+        'model': body.get('model', ''),
+        'serviceDate': body.get('serviceDate', ''),
+        'insuranceType': body.get('insuranceType', 'Standard'),
+        'price': body.get('price', 100),
+        'expiryDate': expiry_date,  
+        # Day bucket for the expiry sweep's sparse index (see expiry_sweep.py)
+        'expiryBucket': expiry_date,
+        # Optimistic-locking version, bumped by every PATCH (see policy_updates.py)
+        'version': 1,
+    }
+
+def forget_cached_status(item):
+    get_status_cache().delete(vehicle_status_key(item['registrationNumber']))
+
+# Create many policies in one request and report a result for each, in request order
+def handle_bulk_create(policies):
+    if not policies or len(policies) > MAX_BULK_POLICIES:
+        return json_response(400, {'message': f'Bulk requests must contain between 1 and {MAX_BULK_POLICIES} policies'})
+
+    # Validate everything in one pass before writing anything
+    results = [None] * len(policies)
+    to_write = []
+    seen_registrations = set()
+    for index, body in enumerate(policies):
+        vehicle_data, error = parse_policy(body)
+        if error:
+            results[index] = {'index': index, 'status': 'invalid', 'message': error}
+        elif vehicle_data['registrationNumber'] in seen_registrations:
+            results[index] = {'index': index, 'status': 'duplicate', 'registrationNumber': vehicle_data['registrationNumber']}
+        else:
+            seen_registrations.add(vehicle_data['registrationNumber'])
+            to_write.append((index, vehicle_data))
+
+    for chunk in chunked(to_write, BULK_TRANSACTION_POLICIES):
+        for index, vehicle_data, status, error in put_policies_with_registration_locks(chunk):
+            result = {'index': index, 'status': status, 'registrationNumber': vehicle_data['registrationNumber']}
+            if status == 'created':
+                result['insuranceId'] = vehicle_data['insuranceId']
+            if error:
+                result['message'] = error
+            results[index] = result
+
+    created = [result for result in results if result['status'] == 'created']
+    get_status_cache().delete(*[vehicle_status_key(result['registrationNumber']) for result in created])
+
+    return json_response(200, {'created': len(created), 'total': len(policies), 'results': results})
+
+# Write a chunk of (index, vehicle_data) pairs as one transaction of lock + policy puts.
+# Policies whose registration number is taken are dropped and the rest retried, so one
+# duplicate does not fail the whole chunk. Yields (index, vehicle_data, status, error).
+def put_policies_with_registration_locks(chunk):
+    pending = list(chunk)
+    while pending:
+        actions = []
+        for _, vehicle_data in pending:
+            actions.extend(registration_transaction_items(vehicle_data))
+        try:
+            get_client('dynamodb').transact_write_items(TransactItems=actions)
+        except ClientError as e:
+            reasons = e.response.get('CancellationReasons', [])
+            taken = {
+                position // 2 for position, reason in enumerate(reasons)
+                if reason.get('Code') == 'ConditionalCheckFailed'
+            }
+            if e.response['Error']['Code'] != 'TransactionCanceledException' or not taken:
+                for index, vehicle_data in pending:
+                    yield index, vehicle_data, 'failed', e.response['Error']['Message']
+                return
+            for position in sorted(taken):
+                index, vehicle_data = pending[position]
+                yield index, vehicle_data, 'duplicate', None
+            pending = [entry for position, entry in enumerate(pending) if position not in taken]
+            continue
+
+        for index, vehicle_data in pending:
+            yield index, vehicle_data, 'created', None
+        return
+
+# Returns False if another policy already holds the registration number
+def put_policy_with_registration_lock(vehicle_data):
+    try:
+        get_client('dynamodb').transact_write_items(
+            TransactItems=registration_transaction_items(vehicle_data)
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+            return False
+        raise
+
+# Lock item and policy item, each conditioned on not existing yet
+def registration_transaction_items(vehicle_data):
+    lock_item = {
+        'registrationNumber': vehicle_data['registrationNumber'],
+        'userId': vehicle_data['userId'],
+        'insuranceId': vehicle_data['insuranceId']
+    }
+    return [
+        {
+            'Put': {
+                'TableName': REGISTRATION_LOCK_TABLE,
+                'Item': to_dynamodb_item(lock_item),
+                'ConditionExpression': 'attribute_not_exists(registrationNumber)'
+            }
+        },
+        {
+            'Put': {
+                'TableName': TABLE_NAME,
+                'Item': to_dynamodb_item(vehicle_data),
+                'ConditionExpression': 'attribute_not_exists(insuranceId)'
+            }
+        }
+    ]
+
+def to_dynamodb_item(item):
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    return {key: serializer.serialize(value) for key, value in item.items()}
+
+def handle_get(event):
+    query_params = event.get('queryStringParameters') or {}
+    if 'userId' not in query_params:
+        return json_response(400, {'message': 'Missing userId query parameter'})
+
+    user_id = query_params['userId'].strip()
+
+    try:
+        limit = parse_limit(query_params.get('limit'))
+        start_key = decode_next_token(query_params.get('nextToken'))
+    except ValueError as e:
+        return json_response(400, {'message': str(e)})
+
+    # The first page comes from the precomputed summary when there is one, in the same shape as
+    # a page read from the table
+    if SUMMARY_READS_ENABLED and not start_key:
+        summary = get_summary(user_id, 'vehicle')
+        if summary is not None:
+            policies, last_key = summary_first_page(summary, limit)
+            if not policies:
+                return json_response(404, {'message': 'No records found for userId', 'userId': user_id})
+            return json_response(200, {
+                'policies': [to_policy_response(policy) for policy in policies],
+                'nextToken': encode_next_token(last_key)
+            })
+
+    # userId is the partition key, so one page of a query reads only this user's policies
+    # (for a sharded user, one query per shard)
+    response = query_user_page(TABLE_NAME, user_id, limit, start_key, POLICY_FIELDS)
+
+    if not response['Items'] and not start_key:
+        return json_response(404, {'message': 'No records found for userId', 'userId': user_id})
+
+    return json_response(200, {
+        'policies': [to_policy_response(policy) for policy in response['Items']],
+        'nextToken': encode_next_token(response.get('LastEvaluatedKey'))
+    })
+
+# Fill in defaults for fields missing on older items
+def to_policy_response(policy):
+    return {
+        'insuranceId': policy['insuranceId'],  
+        'registrationNumber': policy.get('registrationNumber', ''),
+        'make': policy.get('make', ''),
+        'model': policy.get('model', ''),
+        'insuranceType': policy.get('insuranceType', ''),
+        'price': policy.get('price', 0),
+        'expiryDate': policy.get('expiryDate', ''),
+        'policyStatus': policy.get('policyStatus', 'active'),
+        'version': policy.get('version', 0)
+    }
@@ -0,0 +1,106 @@
+import os
+from datetime import datetime
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+from http_responses import json_response
+from metrics import instrumented
+from retries import with_deadline
+from status_cache import MISS, get_status_cache, vehicle_status_key
+from structured_log import get_logger
+
+TABLE_NAME = 'VehicleInsuranceData'
+
+# Global secondary index on registrationNumber (created by migrate-vehicle-table.py)
+REGISTRATION_INDEX_NAME = os.getenv('REGISTRATION_INDEX_NAME', 'registrationNumber-index')
+
+# Set to False once the index is found to be missing so warm containers skip the failing query
+registration_index_available = True
+
+log = get_logger('vehicle_status')
+
+@instrumented
+@with_deadline
+def lambda_handler(event, context):
+    # Extract registration number from the event (query parameter)
+    registration_number = (event.get('queryStringParameters') or {}).get('registrationNumber')
+    
+    if not registration_number:
+        return json_response(400, {'error': 'registrationNumber is required'})
+    
+    try:
+        item = get_cached_status(registration_number)
+
+        # Check if the item exists in DynamoDB
+        if item:
+            # Item found, return "active" status with insurance details
+            return json_response(200, {'status': 'active', 'insuranceType': item['insuranceType'], 'expiryDate': item['expiryDate']})
+        else:
+            # Item not found, return "inactive" status
+            return json_response(200, {'status': 'inactive'})
+    except ClientError as e:
+        log.error('lookup_failed', error=e.response['Error']['Message'])
+        return json_response(500, {'error': 'An error occurred while fetching the data'})
+
+# Read-through cache in front of the lookup; "inactive" results are cached too, for a shorter time
+def get_cached_status(registration_number):
+    cache = get_status_cache()
+    cache_key = vehicle_status_key(registration_number)
+
+    status = cache.get(cache_key)
+    if status is MISS:
+        item = find_by_registration_number(registration_number)
+        status = {'insuranceType': item['insuranceType'], 'expiryDate': item['expiryDate']} if item else None
+        cache.set(cache_key, status)
+
+    # A policy past its expiryDate is inactive even before the expiry sweep has marked it
+    if status and status['expiryDate'] < datetime.utcnow().strftime('%Y-%m-%d'):
+        return None
+    return status
+
+# Look up a policy by registration number, using the index when the table has it. Expired
+# policies keep their registration number, so a number can match several policies; the current
+# one is the one with the latest expiryDate (registration locks allow only one unexpired policy).
+def find_by_registration_number(registration_number):
+    global registration_index_available
+    table = get_table(TABLE_NAME)
+
+    if registration_index_available:
+        try:
+            return latest_policy(table.query, {
+                'IndexName': REGISTRATION_INDEX_NAME,
+                'KeyConditionExpression': 'registrationNumber = :reg_num',
+                'ExpressionAttributeValues': {':reg_num': registration_number}
+            })
+        except ClientError as e:
+            if not is_missing_index_error(e):
+                raise
+            log.warning('registration_index_missing', index=REGISTRATION_INDEX_NAME)
+            registration_index_available = False
+
+    return scan_by_registration_number(registration_number)
+
+# Fallback for tables that have not been migrated yet: scan every page until an unexpired match is found
+def scan_by_registration_number(registration_number):
+    return latest_policy(get_table(TABLE_NAME).scan, {
+        'FilterExpression': 'registrationNumber = :reg_num',
+        'ExpressionAttributeValues': {':reg_num': registration_number}
+    })
+
+# The match with the latest expiryDate, reading pages until one that has not expired is found
+def latest_policy(read_page, kwargs):
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    latest = None
+    while True:
+        response = read_page(**kwargs)
+        for item in response['Items']:
+            if latest is None or item.get('expiryDate', '') > latest.get('expiryDate', ''):
+                latest = item
+        if (latest is not None and latest.get('expiryDate', '') >= today) or 'LastEvaluatedKey' not in response:
+            return latest
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def is_missing_index_error(error):
+    return (
+        error.response['Error']['Code'] == 'ValidationException'
+        and 'specified index' in error.response['Error']['Message']
+    )
@@ -22,27 +22,36 @@ const PoliciesPage = () => {
 
     setUserId(storedUserId);
 
-    // Calls API to get vehicle policies for the user
+    // Calls API to get vehicle policies for the user, following nextToken until all pages are loaded
     const fetchPolicies = async () => {
       try {
-        const response = await fetch(
-          `https://jw6w6mqhob.execute-api.us-east-1.amazonaws.com/prod/vehicle?userId=${encodeURIComponent(
+        let allPolicies = [];
+        let nextToken = null;
+
+        do {
+          let url = `https://jw6w6mqhob.execute-api.us-east-1.amazonaws.com/prod/vehicle?userId=${encodeURIComponent(
             storedUserId
-          )}`
-        );
+          )}`;
+          if (nextToken) {
+            url += `&nextToken=${encodeURIComponent(nextToken)}`;
+          }
 
-        if (response.status === 404) {
-          setPolicies([]);
-          setLoading(false);
-          return;
-        }
+          const response = await fetch(url);
 
-        if (!response.ok) {
-          throw new Error("Failed to fetch policies");
-        }
+          if (response.status === 404) {
+            break;
+          }
+
+          if (!response.ok) {
+            throw new Error("Failed to fetch policies");
+          }
+
+          const data = await response.json();
+          allPolicies = allPolicies.concat(data.policies);
+          nextToken = data.nextToken;
+        } while (nextToken);
 
-        const data = await response.json();
-        setPolicies(data);
+        setPolicies(allPolicies);
       } catch (err) {
         setError(err.message || "Something went wrong");
       } finally {
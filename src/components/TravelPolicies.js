@@ -17,11 +17,24 @@ const TravelPolicies = () => {
             return;
         }
 
-        fetch(`https://po7t08ytm8.execute-api.us-east-1.amazonaws.com/prod/travel-policies?userId=${userId}`)
-            .then(response => response.json())
-            .then(data => {
-                if (data.policies && data.policies.length > 0) {
-                    setPolicies(data.policies);
+        // Follows nextToken until every page of policies is loaded
+        const fetchPage = (nextToken, loaded) => {
+            let url = `https://po7t08ytm8.execute-api.us-east-1.amazonaws.com/prod/travel-policies?userId=${userId}`;
+            if (nextToken) {
+                url += `&nextToken=${encodeURIComponent(nextToken)}`;
+            }
+            return fetch(url)
+                .then(response => response.json())
+                .then(data => {
+                    const all = loaded.concat(data.policies || []);
+                    return data.nextToken ? fetchPage(data.nextToken, all) : all;
+                });
+        };
+
+        fetchPage(null, [])
+            .then(allPolicies => {
+                if (allPolicies.length > 0) {
+                    setPolicies(allPolicies);
                 } else {
                     setError('No policies found.');
                 }